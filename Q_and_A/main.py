@@ -1,6 +1,6 @@
 from langchain_core.runnables import ConfigurableField
-from langchain_ollama import ChatOllama
+from llm.client import get_chat_model
 
-model = ChatOllama(model="llama3.1:latest", temperature=0.2).configurable_fields(
+model = get_chat_model().configurable_fields(
     max_tokens=ConfigurableField(id="max_tokens")
 )
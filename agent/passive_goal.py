@@ -1,8 +1,10 @@
 from langchain_core.prompts.chat import ChatPromptTemplate
 
 from langchain_ollama.chat_models import ChatOllama
+from llm.client import get_chat_model, get_embeddings, warm_up
+from llm.semantic_cache import SemanticCache, semantic_cache_path
 from pydantic import BaseModel, Field
-from typing import cast
+from typing import Optional, cast
 
 class Goal(BaseModel):
     description: str = Field(..., description="目標の説明")
@@ -12,10 +14,16 @@ class Goal(BaseModel):
         return f"{self.description}"
 
 class PassiveGoalCreator:
-    def __init__(self, llm: ChatOllama):
+    def __init__(self, llm: ChatOllama, semantic_cache: Optional[SemanticCache] = None):
         self.llm = llm
+        self.semantic_cache = semantic_cache
 
     def run(self, query: str) -> Goal:
+        if self.semantic_cache is not None:
+            return self.semantic_cache.get_or_compute(query, self._generate)
+        return self._generate(query)
+
+    def _generate(self, query: str) -> Goal:
         prompt = ChatPromptTemplate.from_template(
             "ユーザーの入力を分析し、明確で実行可能な目標を生成してください。\n"
             "要件:\n"
@@ -35,10 +43,24 @@ def main():
         description="PassiveGoalCreatorを利用して目標を生成します"
     )
     parser.add_argument("--task", type=str, required=True, help="実行するタスク")
+    parser.add_argument(
+        "--similarity-threshold",
+        type=float,
+        default=0.92,
+        help="キャッシュ済みの目標を再利用するコサイン類似度の閾値",
+    )
     args = parser.parse_args()
 
-    llm = ChatOllama(model="llama3.1:latest", temperature=0.2)
-    goal_creator = PassiveGoalCreator(llm=llm)
+    # 1回の呼び出しが固まっても処理全体が止まらないよう期限を設ける
+    llm = get_chat_model(call_deadline=120.0)
+    # 起動時にモデルをロードしておく
+    warm_up()
+    semantic_cache = SemanticCache(
+        get_embeddings(),
+        threshold=args.similarity_threshold,
+        path=semantic_cache_path("passive_goal"),
+    )
+    goal_creator = PassiveGoalCreator(llm=llm, semantic_cache=semantic_cache)
     result: Goal = goal_creator.run(query=args.task)
 
     print(f"{result.text}")
@@ -1,5 +1,6 @@
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_ollama import ChatOllama
+from llm.client import get_chat_model, warm_up
 from agent.passive_goal import Goal, PassiveGoalCreator
 from pydantic import BaseModel, Field
 from typing import cast
@@ -47,7 +48,10 @@ def main():
     parser.add_argument("--task", type=str, required=True, help="実行するタスク")
     args = parser.parse_args()
 
-    llm = ChatOllama(model="llama3.1:latest", temperature=0.2)
+    # 1回の呼び出しが固まっても処理全体が止まらないよう期限を設ける
+    llm = get_chat_model(call_deadline=120.0)
+    # 起動時にモデルをロードしておく
+    warm_up()
 
     passive_goal_creator = PassiveGoalCreator(llm=llm)
     goal: Goal = passive_goal_creator.run(query=args.task)
@@ -4,6 +4,7 @@ from langchain_ollama import ChatOllama
 
 from agent.passive_goal import Goal, PassiveGoalCreator
 from agent.prompt_optimizer import OptimizedGoal, PromptOptimizer
+from llm.client import get_chat_model, warm_up
 
 class ResponseOptimizer:
     def __init__(self, llm: ChatOllama):
@@ -60,7 +61,10 @@ def main():
 
     args = parser.parse_args()
 
-    llm = ChatOllama(model="llama3.1:latest", temperature=0.2)
+    # 1回の呼び出しが固まっても処理全体が止まらないよう期限を設ける
+    llm = get_chat_model(call_deadline=120.0)
+    # 起動時にモデルをロードしておく
+    warm_up()
 
     passive_goal_creator = PassiveGoalCreator(llm=llm)
     goal: Goal = passive_goal_creator.run(query=args.task)
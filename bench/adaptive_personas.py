@@ -0,0 +1,92 @@
+"""Compare LLM calls per requirements document: fixed persona count vs adaptive.
+
+Usage:
+    python -m bench.adaptive_personas --request "DB that can directly receive open telemetry"
+"""
+
+import argparse
+import time
+from typing import Any, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from llm.client import get_chat_model, get_embeddings
+from requirements.adaptive import AdaptivePersonaCount
+from requirements.state import InterviewState
+from requirements.workflow import DocumentationAgent
+
+
+class CallCounter(BaseCallbackHandler):
+    """Counts chat model calls made through the callback system."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def on_chat_model_start(self, *args: Any, **kwargs: Any) -> None:
+        self.calls += 1
+
+    def on_llm_start(self, *args: Any, **kwargs: Any) -> None:
+        self.calls += 1
+
+
+def run_once(
+    request: str,
+    model: str,
+    k: int,
+    adaptive: Optional[AdaptivePersonaCount],
+) -> dict[str, Any]:
+    counter = CallCounter()
+    llm = get_chat_model(model, callbacks=[counter])
+    agent = DocumentationAgent(llm=llm, k=k, adaptive_personas=adaptive)
+    started = time.perf_counter()
+    state: dict[str, Any] = {}
+    interviews = 0
+    # interviews は直近のラウンド分だけなので、全ラウンドの件数は更新差分から数える
+    for mode, chunk in agent.graph.stream(
+        InterviewState(user_request=request), stream_mode=["updates", "values"]
+    ):
+        if mode == "values":
+            state = chunk
+            continue
+        for update in chunk.values():
+            interviews += len((update or {}).get("interviews", []))
+    return {
+        "calls": counter.calls,
+        "seconds": time.perf_counter() - started,
+        "iterations": state["iteration"],
+        "interviews": interviews,
+        "sufficient": state["is_information_sufficient"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="固定ペルソナ数と適応的ペルソナ数でLLM呼び出し回数を比較します"
+    )
+    parser.add_argument("--request", action="append", required=True, help="ユーザー要求")
+    parser.add_argument("--model", default="llama3.1:latest")
+    parser.add_argument("--embedding-model", default="nomic-embed-text")
+    parser.add_argument("--k", type=int, default=5, help="固定時のペルソナ数")
+    args = parser.parse_args()
+
+    embeddings = get_embeddings(args.embedding_model)
+    totals = {"fixed": 0, "adaptive": 0}
+    for request in args.request:
+        for mode in ("fixed", "adaptive"):
+            adaptive = AdaptivePersonaCount(embeddings) if mode == "adaptive" else None
+            result = run_once(request, args.model, args.k, adaptive)
+            totals[mode] += result["calls"]
+            print(
+                f"{mode:8} calls={result['calls']:3} iterations={result['iterations']} "
+                f"interviews={result['interviews']:2} sufficient={result['sufficient']} "
+                f"seconds={result['seconds']:.1f}  {request[:40]}"
+            )
+    saved = totals["fixed"] - totals["adaptive"]
+    print(
+        f"total calls: fixed={totals['fixed']} adaptive={totals['adaptive']} "
+        f"saved={saved} ({saved / max(totals['fixed'], 1):.0%})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""End-to-end latency of graph.py with and without the small-model cascade.
+
+With the cascade off, ``role_selector`` and ``judge_answer`` always use the
+large model; with it on they use the small model and escalate only on low
+confidence or unparsable output. Both passes run the same queries against
+the same Ollama host, so the difference is the cascade alone.
+
+Usage:
+    python -m bench.cascade_latency
+    python -m bench.cascade_latency --repeat 3 --small-model llama3.2:1b
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+import graph
+from llm.client import DEFAULT_MODEL, warm_up
+
+QUERIES = [
+    "Pythonでファイルを読み込む方法を教えて",
+    "新規事業の収益モデルを考えるときのポイントは？",
+    "猫が主人公の短い物語のアイデアをください",
+    "よく眠るためのコツは？",
+    "Kubernetesでローリングアップデートを行う手順は？",
+    "スタートアップの採用で気をつけることは？",
+]
+
+
+def run_pass(enabled: bool, repeat: int) -> np.ndarray:
+    for cascade in (graph.role_cascade, graph.judge_cascade):
+        cascade.enabled = enabled
+        cascade.stats = type(cascade.stats)()
+    latencies = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            started = time.perf_counter()
+            graph.app.invoke(graph.State(query=query))
+            latencies.append((time.perf_counter() - started) * 1000)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="graph.py の分類・判定ノードを小さいモデルで先に処理した場合のレイテンシ削減を計測します"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="質問セットの繰り返し回数")
+    parser.add_argument("--small-model", help="分類・判定ノードに使う小さいモデル")
+    args = parser.parse_args()
+
+    if args.small_model:
+        for node in ("role_selector", "judge_answer"):
+            graph.NODE_MODELS[node] = args.small_model
+            graph.node_models[node].default.model = args.small_model
+    for name in sorted({DEFAULT_MODEL, *graph.NODE_MODELS.values()}):
+        warm_up(name)
+
+    results = {}
+    for enabled in (False, True):
+        latencies = run_pass(enabled, args.repeat)
+        results[enabled] = latencies
+        print(
+            f"cascade={'on ' if enabled else 'off'} "
+            f"mean={latencies.mean():8.1f}ms "
+            f"p50={np.percentile(latencies, 50):8.1f}ms "
+            f"p95={np.percentile(latencies, 95):8.1f}ms"
+        )
+        for name, cascade in (
+            ("role_selector", graph.role_cascade),
+            ("judge_answer", graph.judge_cascade),
+        ):
+            stats = cascade.stats
+            print(
+                f"  {name:14} calls={stats.calls} accepted={stats.accepted} "
+                f"low_confidence={stats.low_confidence} unparsable={stats.unparsable} "
+                f"small={stats.small_seconds:.1f}s large={stats.large_seconds:.1f}s"
+            )
+    saved = 1 - results[True].mean() / results[False].mean()
+    print(f"mean latency reduction: {saved:.0%}")
+
+
+if __name__ == "__main__":
+    main()
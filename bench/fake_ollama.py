@@ -0,0 +1,358 @@
+"""Deterministic local stand-in for the Ollama HTTP API.
+
+Serves ``/api/chat``, ``/api/generate``, ``/api/embed``, ``/api/embeddings``,
+``/api/ps``, ``/api/tags`` and ``/api/version`` with a configurable time to
+first token and token rate, so pipelines can be benchmarked without a GPU.
+Chat requests with a JSON-schema ``format`` get a response that validates
+against the schema; ``format="json"`` gets an empty object. Responses and
+injected errors are derived from the request and ``seed``, so the same
+workload produces the same output on every run.
+
+Usage:
+    python -m bench.fake_ollama --port 11435 --ttft-ms 80 --tokens-per-sec 40
+    OLLAMA_HOST=http://127.0.0.1:11435 python graph.py
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterator, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+_WORDS = (
+    "system data user model request latency cache query service design "
+    "requirement team answer process result value cost risk plan test"
+).split()
+
+
+class FakeOllamaConfig(BaseModel):
+    """Timing, output and error-injection settings of the fake server."""
+
+    ttft_ms: float = Field(default=50.0, description="Delay before the first response part")
+    tokens_per_sec: float = Field(default=200.0, description="Rate at which tokens are streamed")
+    response_tokens: int = Field(
+        default=48, description="Tokens in a free-text answer, capped by num_predict"
+    )
+    array_items: int = Field(default=3, description="Items generated for JSON-schema arrays")
+    error_rate: float = Field(
+        default=0.0, description="Fraction of chat requests answered with HTTP 500"
+    )
+    embedding_dim: int = Field(default=256, description="Length of returned embeddings")
+    seed: int = Field(default=0, description="Seed for generated text and injected errors")
+
+
+class FakeOllamaStats(BaseModel):
+    """Requests the fake server has handled."""
+
+    requests: dict[str, int] = Field(default_factory=dict, description="Requests per API path")
+    models: dict[str, int] = Field(default_factory=dict, description="Requests per model")
+    tokens: int = Field(default=0, description="Generated tokens")
+    errors: int = Field(default=0, description="Injected errors")
+
+    @property
+    def chat_calls(self) -> int:
+        """Chat and generate requests, i.e. LLM calls."""
+        return self.requests.get("/api/chat", 0) + self.requests.get("/api/generate", 0)
+
+
+def _digest(*parts: Any) -> int:
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return int.from_bytes(hashlib.sha256(payload.encode("utf-8")).digest()[:8], "big")
+
+
+def _resolve(schema: dict[str, Any], root: dict[str, Any]) -> dict[str, Any]:
+    while "$ref" in schema:
+        name = schema["$ref"].rsplit("/", 1)[-1]
+        schema = root.get("$defs", root.get("definitions", {}))[name]
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return _resolve(options[0], root)
+    if "allOf" in schema:
+        merged: dict[str, Any] = {}
+        for part in schema["allOf"]:
+            merged.update(_resolve(part, root))
+        return merged
+    return schema
+
+
+def example_for_schema(
+    schema: dict[str, Any], rng: random.Random, array_items: int = 3, root: Optional[dict] = None
+) -> Any:
+    """A value that validates against a (Pydantic-generated) JSON schema."""
+    root = root or schema
+    schema = _resolve(schema, root)
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    kind = schema.get("type", "object" if "properties" in schema else "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {
+            name: example_for_schema(prop, rng, array_items, root)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        count = max(schema.get("minItems", array_items), 0)
+        count = min(count, schema.get("maxItems", count))
+        items = schema.get("items", {})
+        return [example_for_schema(items, rng, array_items, root) for _ in range(count)]
+    if kind == "boolean":
+        # True ends judge/evaluate loops after one round, like a satisfied model would
+        return True
+    if kind == "integer":
+        return int(schema.get("minimum", 1))
+    if kind == "number":
+        low = schema.get("minimum", 0.0)
+        high = schema.get("maximum", max(low, 1.0))
+        # Confidence-like scores land near the top of their range
+        return round(low + (high - low) * 0.9, 3)
+    if kind == "null":
+        return None
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 8)))
+
+
+def _embedding(text: str, dim: int) -> list[float]:
+    # Bag of hashed words: texts sharing words get similar vectors
+    vector = np.zeros(dim, dtype=np.float32)
+    for word in text.lower().split() or [text]:
+        vector[_digest(word) % dim] += 1.0
+    norm = float(np.linalg.norm(vector)) or 1.0
+    return (vector / norm).tolist()
+
+
+class FakeOllama:
+    """Threaded HTTP server imitating Ollama for benchmarks.
+
+    Use as a context manager or call ``start``/``stop``; ``url`` is the base
+    URL to use as ``OLLAMA_HOST``. ``config`` may be changed between runs.
+    """
+
+    def __init__(
+        self, config: Optional[FakeOllamaConfig] = None, host: str = "127.0.0.1", port: int = 0
+    ):
+        """Initialize the server; port 0 picks a free port."""
+        self.config = config or FakeOllamaConfig()
+        self.stats = FakeOllamaStats()
+        self._lock = threading.Lock()
+        self._errors = random.Random(self.config.seed)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self) -> FakeOllamaStats:
+        """Return the counters so far and start new ones."""
+        with self._lock:
+            stats, self.stats = self.stats, FakeOllamaStats()
+            self._errors = random.Random(self.config.seed)
+        return stats
+
+    def __enter__(self) -> "FakeOllama":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def _count(self, path: str, model: Optional[str] = None) -> None:
+        with self._lock:
+            self.stats.requests[path] = self.stats.requests.get(path, 0) + 1
+            if model:
+                self.stats.models[model] = self.stats.models.get(model, 0) + 1
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            if self.config.error_rate <= 0 or self._errors.random() >= self.config.error_rate:
+                return False
+            self.stats.errors += 1
+            return True
+
+    def _content(self, request: dict[str, Any]) -> str:
+        rng = random.Random(
+            _digest(self.config.seed, request.get("messages"), request.get("prompt"))
+        )
+        fmt = request.get("format")
+        if isinstance(fmt, dict):
+            return json.dumps(
+                example_for_schema(fmt, rng, self.config.array_items), ensure_ascii=False
+            )
+        if fmt == "json":
+            return "{}"
+        limit = (request.get("options") or {}).get("num_predict")
+        count = self.config.response_tokens
+        if isinstance(limit, int) and limit > 0:
+            count = min(count, limit)
+        return " ".join(rng.choice(_WORDS) for _ in range(count))
+
+    def _tokens(self, content: str) -> list[str]:
+        # About four characters per token, like common tokenizers on English text
+        return [content[i : i + 4] for i in range(0, len(content), 4)] or [""]
+
+    def _generate(
+        self, request: dict[str, Any], key: str
+    ) -> Iterator[tuple[dict[str, Any], float]]:
+        tokens = self._tokens(self._content(request))
+        with self._lock:
+            self.stats.tokens += len(tokens)
+        base = {"model": request.get("model", ""), "created_at": "2024-01-01T00:00:00Z"}
+        interval = 1.0 / self.config.tokens_per_sec if self.config.tokens_per_sec > 0 else 0.0
+        for index, token in enumerate(tokens):
+            delay = self.config.ttft_ms / 1000 if index == 0 else interval
+            body = {"role": "assistant", "content": token} if key == "message" else token
+            yield {**base, key: body, "done": False}, delay
+        final = {"role": "assistant", "content": ""} if key == "message" else ""
+        yield {
+            **base,
+            key: final,
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": 1,
+            "eval_count": len(tokens),
+        }, 0.0
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _json(self, payload: Any, status: int = 200) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                server._count(self.path)
+                if self.path == "/api/version":
+                    self._json({"version": "0.0.0-fake"})
+                elif self.path in ("/api/ps", "/api/tags"):
+                    self._json({"models": []})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def do_HEAD(self) -> None:
+                self.send_response(200)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                server._count(self.path, request.get("model"))
+                if self.path in ("/api/embed", "/api/embeddings"):
+                    self._embed(request)
+                elif self.path in ("/api/chat", "/api/generate"):
+                    self._chat(request, "message" if self.path == "/api/chat" else "response")
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def _embed(self, request: dict[str, Any]) -> None:
+                dim = server.config.embedding_dim
+                if self.path == "/api/embeddings":
+                    self._json({"embedding": _embedding(request.get("prompt", ""), dim)})
+                    return
+                inputs = request.get("input", [])
+                if isinstance(inputs, str):
+                    inputs = [inputs]
+                self._json(
+                    {
+                        "model": request.get("model", ""),
+                        "embeddings": [_embedding(text, dim) for text in inputs],
+                    }
+                )
+
+            def _chat(self, request: dict[str, Any], key: str) -> None:
+                if server._should_fail():
+                    time.sleep(server.config.ttft_ms / 1000)
+                    self._json({"error": "injected failure"}, 500)
+                    return
+                parts = server._generate(request, key)
+                if not request.get("stream", True):
+                    text, final = [], {}
+                    for part, delay in parts:
+                        time.sleep(delay)
+                        body = part[key]
+                        text.append(body["content"] if key == "message" else body)
+                        final = part
+                    content = "".join(text)
+                    body = {"role": "assistant", "content": content} if key == "message" else content
+                    self._json({**final, key: body})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for part, delay in parts:
+                        time.sleep(delay)
+                        line = (json.dumps(part, ensure_ascii=False) + "\n").encode("utf-8")
+                        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client cancelled, e.g. a hedge or deadline
+                    self.close_connection = True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="GPUなしで使えるOllama互換の擬似サーバーを起動します"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--ttft-ms", type=float, default=50.0, help="最初のトークンまでの時間")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="生成速度")
+    parser.add_argument("--response-tokens", type=int, default=48, help="自由回答のトークン数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 を返す割合")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        ttft_ms=args.ttft_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    server = FakeOllama(config, host=args.host, port=args.port).start()
+    print(f"fake Ollama listening on {server.url}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Interactive p95 latency under batch load: FIFO vs priority scheduling.
+
+By default the backend is simulated by holding a limiter slot for a fixed
+time, which isolates the scheduler. With ``--model`` real Ollama calls are
+made through the shared client registry instead.
+
+Usage:
+    python -m bench.priority_latency
+    python -m bench.priority_latency --model llama3.1:latest --batch-calls 24
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from llm.client import get_chat_model
+from llm.limiter import AdaptiveConcurrencyLimiter
+from llm.scheduler import Priority, request_context
+
+BATCH_PROMPT = "Write a detailed interview answer about requirement #{index} of an internal wiki."
+INTERACTIVE_PROMPT = "Answer with one word, technical or general: question #{index}?"
+
+
+def simulated_backend(
+    limiter: AdaptiveConcurrencyLimiter, batch_ms: float, interactive_ms: float
+) -> Callable[[Priority, str, int, bool], Awaitable[None]]:
+    async def call(priority: Priority, tenant: str, index: int, interactive: bool) -> None:
+        async with limiter.aslot(priority, tenant):
+            await asyncio.sleep((interactive_ms if interactive else batch_ms) / 1000)
+
+    return call
+
+
+def ollama_backend(
+    model: str, limit: int
+) -> Callable[[Priority, str, int, bool], Awaitable[None]]:
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=limit, min_limit=limit, max_limit=limit)
+    llm = get_chat_model(
+        model, response_cache=None, single_flight=None, concurrency_limiter=limiter
+    )
+
+    async def call(priority: Priority, tenant: str, index: int, interactive: bool) -> None:
+        prompt = INTERACTIVE_PROMPT if interactive else BATCH_PROMPT
+        with request_context(priority, tenant):
+            await llm.ainvoke(prompt.format(index=index))
+
+    return call
+
+
+async def run_load(
+    call: Callable[[Priority, str, int, bool], Awaitable[None]],
+    scheduled: bool,
+    args: argparse.Namespace,
+) -> np.ndarray:
+    # Without scheduling everything shares one class and one tenant, i.e. plain FIFO
+    batch_priority = Priority.BATCH if scheduled else Priority.NORMAL
+    interactive_priority = Priority.INTERACTIVE if scheduled else Priority.NORMAL
+    batch = [
+        asyncio.create_task(
+            call(batch_priority, f"job-{job}" if scheduled else "default", job * 1000 + i, False)
+        )
+        for job in range(args.batch_jobs)
+        for i in range(args.batch_calls)
+    ]
+    latencies = []
+    for i in range(args.interactive_calls):
+        await asyncio.sleep(args.interval_ms / 1000)
+        started = time.perf_counter()
+        await call(interactive_priority, f"user-{i % 3}" if scheduled else "default", i, True)
+        latencies.append((time.perf_counter() - started) * 1000)
+    for task in batch:
+        task.cancel()
+    await asyncio.gather(*batch, return_exceptions=True)
+    return np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="バッチ負荷下での対話リクエストのp95レイテンシをFIFOと優先度スケジューリングで比較します"
+    )
+    parser.add_argument("--model", help="指定するとOllamaを実際に呼び出す")
+    parser.add_argument("--limit", type=int, default=2, help="同時実行数の上限")
+    parser.add_argument("--batch-jobs", type=int, default=2, help="要件定義ジョブの数")
+    parser.add_argument("--batch-calls", type=int, default=40, help="ジョブあたりの呼び出し数")
+    parser.add_argument(
+        "--batch-ms", type=float, default=200.0, help="シミュレーション時のバッチ呼び出し時間"
+    )
+    parser.add_argument("--interactive-calls", type=int, default=20)
+    parser.add_argument(
+        "--interactive-ms", type=float, default=20.0, help="シミュレーション時の対話呼び出し時間"
+    )
+    parser.add_argument("--interval-ms", type=float, default=100.0, help="対話リクエストの間隔")
+    args = parser.parse_args()
+
+    for scheduled in (False, True):
+        if args.model:
+            call = ollama_backend(args.model, args.limit)
+        else:
+            limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=args.limit, min_limit=args.limit, max_limit=args.limit
+            )
+            call = simulated_backend(limiter, args.batch_ms, args.interactive_ms)
+        latencies = asyncio.run(run_load(call, scheduled, args))
+        print(
+            f"{'priority' if scheduled else 'fifo':8} interactive "
+            f"p50={np.percentile(latencies, 50):8.1f}ms "
+            f"p95={np.percentile(latencies, 95):8.1f}ms "
+            f"max={latencies.max():8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
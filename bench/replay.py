@@ -0,0 +1,78 @@
+"""Record a pipeline's LLM traffic once, then replay it offline to profile orchestration.
+
+Recording talks to Ollama (or ``bench.fake_ollama``) as usual and writes
+every request and timed response to a cassette. Replaying needs no model:
+with ``--speed 1`` the original latencies are reproduced, with ``--speed 0``
+responses arrive instantly, so the wall time left is LangGraph, prompt
+building, parsing and the llm layers alone.
+
+Usage:
+    python -m bench.replay record --pipeline graph --cassette runs/graph.jsonl.gz
+    python -m bench.replay replay --pipeline graph --cassette runs/graph.jsonl.gz --speed 0
+    python -m bench.replay replay --pipeline documentation --cassette runs/doc.jsonl.gz --profile
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import time
+
+from bench.suite import PIPELINES, QUERIES
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="LLM通信をカセットに記録し、モデルなしで再生してオーケストレーションのオーバーヘッドを計測します"
+    )
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="graph")
+    parser.add_argument("--cassette", required=True, help="カセットのパス（.gz で圧縮）")
+    parser.add_argument("--query", action="append", help="実行する入力（既定はベンチマーク用の質問）")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="再生速度の倍率。0 で待ち時間なし"
+    )
+    parser.add_argument("--profile", action="store_true", help="cProfile の上位関数を表示する")
+    args = parser.parse_args()
+
+    # パイプラインのモジュールがクライアントを作る前に設定する
+    os.environ["AI_STUDY_CASSETTE"] = args.cassette
+    os.environ["AI_STUDY_CASSETTE_MODE"] = args.mode
+    os.environ["AI_STUDY_CASSETTE_SPEED"] = str(args.speed)
+    os.environ.pop("AI_STUDY_LLM_CACHE", None)
+
+    from llm.client import get_registry
+
+    run = PIPELINES[args.pipeline]()
+    cassette = get_registry().cassette
+    profiler = cProfile.Profile() if args.profile else None
+    started = time.perf_counter()
+    for query in args.query or QUERIES:
+        query_started = time.perf_counter()
+        if profiler is not None:
+            profiler.runcall(run, query)
+        else:
+            run(query)
+        print(f"{(time.perf_counter() - query_started) * 1000:9.1f}ms  {query}")
+    elapsed = time.perf_counter() - started
+    cassette.close()
+
+    stats = cassette.stats
+    if args.mode == "record":
+        print(f"recorded {stats.recorded} interactions in {elapsed:.2f}s to {args.cassette}")
+    else:
+        print(
+            f"replayed {stats.replayed} interactions in {elapsed:.2f}s "
+            f"(originally {stats.recorded_seconds:.2f}s of model time, speed={args.speed:g})"
+        )
+        if args.speed == 0:
+            print(f"orchestration overhead: {elapsed:.3f}s")
+        else:
+            overhead = elapsed - stats.recorded_seconds / args.speed
+            print(f"orchestration overhead (approx.): {overhead:.3f}s")
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""State size and per-step overhead of graph.py's message log over long retry chains.
+
+Runs a one-node LangGraph loop without any LLM, once with nodes that return
+a whole copied ``State`` into an ``operator.add`` list (the old graph.py
+style, where the history doubles every step) and once with nodes that return
+only their new message into ``graph.message_log``. For each chain length it
+reports the messages kept, their size and the mean time per step; with
+deltas both stay flat.
+
+Usage:
+    python -m bench.state_growth
+    python -m bench.state_growth --steps 10 --steps 100 --steps 1000 --legacy-max-steps 14
+"""
+
+import argparse
+import operator
+import sys
+import time
+from typing import Annotated, Callable
+
+from langgraph.graph import END, StateGraph
+from pydantic import BaseModel, Field
+
+from graph import MAX_MESSAGE_CHARS, MAX_MESSAGES, message_log
+
+# 1ステップで追加するメッセージ。回答と同程度の長さにする
+MESSAGE = "回答: " + "あ" * 500
+
+
+class LegacyState(BaseModel):
+    count: int = 0
+    messages: Annotated[list[str], operator.add] = Field(default=[])
+
+
+class DeltaState(BaseModel):
+    count: int = 0
+    messages: Annotated[list[str], message_log(MAX_MESSAGES, MAX_MESSAGE_CHARS)] = Field(
+        default=[]
+    )
+
+
+def legacy_step(state: LegacyState) -> LegacyState:
+    return LegacyState(count=state.count + 1, messages=state.messages + [MESSAGE])
+
+
+def delta_step(state: DeltaState) -> dict:
+    return {"count": state.count + 1, "messages": [MESSAGE]}
+
+
+def build(state: type[BaseModel], step: Callable, steps: int):
+    workflow = StateGraph(state)
+    workflow.add_node("step", step)
+    workflow.set_entry_point("step")
+    workflow.add_conditional_edges(
+        "step", lambda s: "end" if s.count >= steps else "again", {"end": END, "again": "step"}
+    )
+    return workflow.compile()
+
+
+def size_bytes(messages: list[str]) -> int:
+    return sys.getsizeof(messages) + sum(sys.getsizeof(m) for m in messages)
+
+
+def measure(state: type[BaseModel], step: Callable, steps: int) -> tuple[int, int, float]:
+    app = build(state, step, steps)
+    started = time.perf_counter()
+    final = app.invoke(state(), {"recursion_limit": steps + 10})
+    per_step = (time.perf_counter() - started) / steps
+    return len(final["messages"]), size_bytes(final["messages"]), per_step
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="再試行が続いたときの State の大きさと1ステップあたりのオーバーヘッドを計測します"
+    )
+    parser.add_argument("--steps", type=int, action="append", help="ループの長さ（複数指定可）")
+    parser.add_argument(
+        "--legacy-max-steps",
+        type=int,
+        default=14,
+        help="全体コピー方式を計測する最大の長さ（履歴が毎ステップ倍になるため）",
+    )
+    args = parser.parse_args()
+
+    print(f"message_log: max_messages={MAX_MESSAGES} max_chars={MAX_MESSAGE_CHARS}")
+    for steps in args.steps or [4, 8, 14, 100, 1000]:
+        for name, state, step in (
+            ("legacy", LegacyState, legacy_step),
+            ("delta", DeltaState, delta_step),
+        ):
+            if name == "legacy" and steps > args.legacy_max_steps:
+                continue
+            messages, size, per_step = measure(state, step, steps)
+            print(
+                f"steps={steps:5} {name:6} messages={messages:7} "
+                f"size={size / 1024:10.1f}KiB per_step={per_step * 1e6:9.1f}us"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""End-to-end benchmark suite on the fake Ollama server, with saved baselines.
+
+Every pipeline runs a fixed workload against ``bench.fake_ollama``, so the
+numbers reflect this repository's code (prompt building, parsing, graph
+overhead, the shared llm layers and the number of LLM calls) rather than a
+GPU. Results can be saved as a baseline and later runs compared against it;
+a run that is slower or makes more LLM calls than the baseline allows exits
+with status 1.
+
+Usage:
+    python -m bench.suite
+    python -m bench.suite --pipeline graph --pipeline six_hat --requests 20 --concurrency 4
+    python -m bench.suite --save-baseline
+    python -m bench.suite --compare --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from bench.fake_ollama import FakeOllama, FakeOllamaConfig
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "suite.json"
+
+QUERIES = [
+    "Pythonでファイルを読み込む方法を教えて",
+    "新規事業の収益モデルを考えるときのポイントは？",
+    "RAGの今後について",
+    "社内Wikiにセマンティック検索を導入したい",
+]
+
+
+def _graph() -> Callable[[str], Any]:
+    import graph
+
+    return lambda query: graph.app.invoke(graph.State(query=query))
+
+
+def _graph_fan_out() -> Callable[[str], Any]:
+    import graph
+
+    # How many losing candidates had started their calls before being cancelled
+    # depends on timing, so the suite lets every candidate finish
+    graph.CANCEL_LOSING_CANDIDATES = False
+    return lambda query: graph.fan_out_app.invoke(graph.State(query=query))
+
+
+def _six_hat() -> Callable[[str], Any]:
+    import six_hat
+
+    return lambda query: six_hat.parallel_chain.invoke({"input": query})
+
+
+def _chain() -> Callable[[str], Any]:
+    import chain
+
+    return lambda query: chain.full_recipe_pipeline.invoke({"dish": query})
+
+
+def _agent() -> Callable[[str], Any]:
+    from agent.passive_goal import PassiveGoalCreator
+    from agent.prompt_optimizer import PromptOptimizer
+    from agent.response_optimizer import ResponseOptimizer
+    from llm.client import get_chat_model
+
+    llm = get_chat_model()
+    goal_creator = PassiveGoalCreator(llm=llm)
+    prompt_optimizer = PromptOptimizer(llm=llm)
+    response_optimizer = ResponseOptimizer(llm=llm)
+
+    def run(query: str) -> str:
+        goal = goal_creator.run(query=query)
+        return response_optimizer.run(query=prompt_optimizer.run(query=goal.text).text)
+
+    return run
+
+
+def _documentation() -> Callable[[str], Any]:
+    from llm.client import get_chat_model
+    from llm.scheduler import Priority
+    from requirements.workflow import DocumentationAgent
+
+    agent = DocumentationAgent(llm=get_chat_model(priority=Priority.BATCH), k=3)
+    return agent.run
+
+
+# パイプライン名 -> 1リクエストを処理する関数を返すファクトリ（擬似サーバー起動後にimportする）
+PIPELINES: dict[str, Callable[[], Callable[[str], Any]]] = {
+    "graph": _graph,
+    "graph_fan_out": _graph_fan_out,
+    "six_hat": _six_hat,
+    "chain": _chain,
+    "agent": _agent,
+    "documentation": _documentation,
+}
+
+
+class PipelineResult(BaseModel):
+    """Throughput, latency and LLM-call count of one pipeline run."""
+
+    pipeline: str = Field(..., description="Name of the pipeline")
+    requests: int = Field(..., description="Requests sent")
+    concurrency: int = Field(..., description="Requests in flight at once")
+    failures: int = Field(default=0, description="Requests that raised")
+    throughput_rps: float = Field(..., description="Completed requests per second")
+    p50_ms: float = Field(..., description="Median request latency")
+    p95_ms: float = Field(..., description="95th percentile request latency")
+    llm_calls: int = Field(..., description="Chat requests the server received")
+    tokens: int = Field(default=0, description="Tokens the server generated")
+    injected_errors: int = Field(default=0, description="Errors the server injected")
+
+    @property
+    def llm_calls_per_request(self) -> float:
+        """LLM calls per pipeline request."""
+        return self.llm_calls / self.requests if self.requests else 0.0
+
+
+class Baseline(BaseModel):
+    """Saved suite results and the settings they were measured with."""
+
+    server: FakeOllamaConfig = Field(..., description="Fake server settings")
+    results: dict[str, PipelineResult] = Field(default_factory=dict)
+
+
+def run_pipeline(
+    name: str, server: FakeOllama, requests: int, concurrency: int
+) -> PipelineResult:
+    """Run ``requests`` distinct queries through a pipeline and collect its metrics."""
+    run = PIPELINES[name]()
+    # One untimed request so imports, model warm-up and pool setup are not measured
+    try:
+        run(f"{QUERIES[0]} (warm-up)")
+    except Exception:
+        # An injected error; the measured requests still run
+        pass
+    server.reset_stats()
+
+    def timed(index: int) -> Optional[float]:
+        started = time.perf_counter()
+        try:
+            run(f"{QUERIES[index % len(QUERIES)]} #{index}")
+        except Exception as e:
+            print(f"  {name} request {index} failed: {e!r}", file=sys.stderr)
+            return None
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+    stats = server.reset_stats()
+    completed = [o for o in outcomes if o is not None]
+    latencies = np.array(completed or [0.0])
+    return PipelineResult(
+        pipeline=name,
+        requests=requests,
+        concurrency=concurrency,
+        failures=requests - len(completed),
+        throughput_rps=len(completed) / elapsed,
+        p50_ms=float(np.percentile(latencies, 50)),
+        p95_ms=float(np.percentile(latencies, 95)),
+        llm_calls=stats.chat_calls,
+        tokens=stats.tokens,
+        injected_errors=stats.errors,
+    )
+
+
+def compare(
+    result: PipelineResult, baseline: PipelineResult, tolerance: float
+) -> list[str]:
+    """Regressions of ``result`` against ``baseline`` beyond ``tolerance``."""
+    regressions = []
+    if result.throughput_rps < baseline.throughput_rps * (1 - tolerance):
+        regressions.append(
+            f"throughput {baseline.throughput_rps:.2f} -> {result.throughput_rps:.2f} req/s"
+        )
+    if result.p95_ms > baseline.p95_ms * (1 + tolerance):
+        regressions.append(f"p95 {baseline.p95_ms:.0f} -> {result.p95_ms:.0f}ms")
+    # With the response cache and coalescing off (see main) and fan-out candidates
+    # never cancelled, call counts do not depend on timing, so any increase is a regression
+    if result.llm_calls_per_request > baseline.llm_calls_per_request:
+        regressions.append(
+            f"LLM calls/request {baseline.llm_calls_per_request:.2f} "
+            f"-> {result.llm_calls_per_request:.2f}"
+        )
+    if result.failures > baseline.failures:
+        regressions.append(f"failures {baseline.failures} -> {result.failures}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="擬似Ollamaサーバー上で各パイプラインのスループット・レイテンシ・LLM呼び出し数を計測します"
+    )
+    parser.add_argument(
+        "--pipeline", action="append", choices=sorted(PIPELINES), help="計測するパイプライン"
+    )
+    parser.add_argument("--requests", type=int, default=8, help="パイプラインごとのリクエスト数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同時に処理するリクエスト数")
+    parser.add_argument("--ttft-ms", type=float, default=50.0, help="最初のトークンまでの時間")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="生成速度")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 を返す割合")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="ベースラインのパス")
+    parser.add_argument("--save-baseline", action="store_true", help="結果をベースラインとして保存")
+    parser.add_argument("--compare", action="store_true", help="ベースラインと比較する")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="許容する悪化の割合")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        ttft_ms=args.ttft_ms, tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate
+    )
+    server = FakeOllama(config).start()
+    # パイプラインのモジュールが作るクライアントを擬似サーバーに向け、応答キャッシュは使わない。
+    # 同時に届いた同一リクエストの集約はタイミング次第で呼び出し数が揺れるので止める
+    os.environ["OLLAMA_HOST"] = server.url
+    os.environ.pop("AI_STUDY_LLM_CACHE", None)
+    os.environ["AI_STUDY_COALESCE"] = "0"
+    os.environ.pop("AI_STUDY_OLLAMA_HOSTS", None)
+
+    baseline = None
+    if args.compare:
+        baseline = Baseline.model_validate_json(args.baseline.read_text(encoding="utf-8"))
+        if baseline.server != config:
+            print("warning: baseline was measured with different server settings")
+
+    results: dict[str, PipelineResult] = {}
+    regressed = False
+    try:
+        for name in args.pipeline or list(PIPELINES):
+            result = run_pipeline(name, server, args.requests, args.concurrency)
+            results[name] = result
+            print(
+                f"{name:14} {result.throughput_rps:7.2f} req/s "
+                f"p50={result.p50_ms:8.1f}ms p95={result.p95_ms:8.1f}ms "
+                f"llm_calls/req={result.llm_calls_per_request:5.2f} failures={result.failures}"
+            )
+            if baseline is not None and name in baseline.results:
+                for regression in compare(result, baseline.results[name], args.tolerance):
+                    regressed = True
+                    print(f"  REGRESSION {regression}")
+    finally:
+        server.stop()
+
+    if args.save_baseline:
+        saved = (
+            Baseline.model_validate_json(args.baseline.read_text(encoding="utf-8"))
+            if args.baseline.exists()
+            else Baseline(server=config)
+        )
+        saved.server = config
+        saved.results.update(results)
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(
+            json.dumps(saved.model_dump(), indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+        )
+        print(f"baseline saved to {args.baseline}")
+    if regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
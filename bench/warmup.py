@@ -0,0 +1,35 @@
+"""Measure cold vs warm first-token latency through the shared client registry.
+
+Usage:
+    python -m bench.warmup --model llama3.1:latest --force-cold
+"""
+
+import argparse
+
+from llm.client import DEFAULT_MODEL, ClientRegistry
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="モデルのコールドスタートとウォーム時の最初のトークンまでの時間を計測します"
+    )
+    parser.add_argument("--model", action="append", help="計測するモデル")
+    parser.add_argument("--keep-alive", type=int, default=30 * 60, help="モデルの常駐秒数")
+    parser.add_argument(
+        "--force-cold", action="store_true", help="計測前にモデルをアンロードする"
+    )
+    args = parser.parse_args()
+
+    registry = ClientRegistry(keep_alive=args.keep_alive)
+    for model in args.model or [DEFAULT_MODEL]:
+        report = registry.warm_up(model, force_cold=args.force_cold)
+        saved = report.cold_first_token_ms - report.warm_first_token_ms
+        print(
+            f"{model:24} resident={report.was_resident} "
+            f"cold={report.cold_first_token_ms:8.1f}ms "
+            f"warm={report.warm_first_token_ms:8.1f}ms saved={saved:8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
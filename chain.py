@@ -1,9 +1,9 @@
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama.chat_models import ChatOllama
+from llm.client import get_chat_model
 
 # Model configuration
-model = ChatOllama(model="llama3.1:latest", temperature=0.2)
+model = get_chat_model()
 parser = StrOutputParser()
 
 # Recipe generation chain
@@ -30,5 +30,6 @@ def upper(text: str) -> str:
 full_recipe_pipeline = recipe_chain | material_chain | upper
 
 # Execute with streaming
-for chunk in full_recipe_pipeline.stream({"dish": "pasta"}):
-    print(chunk, end="", flush=True)
+if __name__ == "__main__":
+    for chunk in full_recipe_pipeline.stream({"dish": "pasta"}):
+        print(chunk, end="", flush=True)
@@ -1,34 +1,185 @@
+import asyncio
 import operator
-from typing import Annotated
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from typing import Annotated, Callable, Optional
 
 from pydantic import BaseModel, Field
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_ollama import ChatOllama
+from langchain_core.runnables import Runnable, RunnableLambda
+from llm.cascade import ModelCascade, configurable_max_tokens, structured
+from llm.client import DEFAULT_MODEL, DEFAULT_SMALL_MODEL, get_chat_model, get_embeddings, warm_up
+from llm.hedging import with_deadline
+from llm.instrumentation import get_instrumentation
+from llm.role_router import RoleRouter, RouteResult
+from llm.scheduler import Priority
+from llm.semantic_cache import SemanticCache, semantic_cache_path
+from langgraph.constants import TAG_NOSTREAM
 from langgraph.graph import StateGraph, END
+from Q_and_A.role import ROLES as EXPERT_ROLES
+
+
+# メッセージ履歴に残す件数の上限（古いものから捨てる）。None なら無制限
+MAX_MESSAGES: Optional[int] = 100
+# 履歴に残す1メッセージの最大文字数。回答本体は State.answer に全文が残る
+MAX_MESSAGE_CHARS: Optional[int] = 2000
+
+
+def message_log(
+    max_messages: Optional[int] = None, max_chars: Optional[int] = None
+) -> Callable[[list[str], list[str]], list[str]]:
+    """ノードが返した新しいメッセージだけを履歴に追記するリデューサー
+
+    長いメッセージは max_chars で切り詰め、件数が max_messages を超えたら
+    古いものから捨てるので、再試行が続いても履歴の大きさは一定に収まる。
+    """
+
+    def append(left: list[str], right: list[str]) -> list[str]:
+        if max_chars is not None:
+            right = [m if len(m) <= max_chars else m[:max_chars] + "…" for m in right]
+        merged = left + right
+        if max_messages is not None and len(merged) > max_messages:
+            del merged[:-max_messages]
+        return merged
+
+    return append
 
 
 class State(BaseModel):
     query: str = Field(default="", description="Question from user")
     current_role: str = Field(default="", description="Current role of the agent")
-    messages: Annotated[list[str], operator.add] = Field(
+    messages: Annotated[list[str], message_log(MAX_MESSAGES, MAX_MESSAGE_CHARS)] = Field(
         default=[], description="List of messages in the conversation"
     )
+    answer: str = Field(default="", description="Latest generated answer, untruncated")
     current_judge: bool = Field(
         default=False, description="Whether the current judge is correct"
     )
     judgement_reason: str = Field(
         default="", description="Reason for the judgement of the current judge"
     )
+    candidate_roles: list[str] = Field(
+        default=[], description="Roles to try for this query, best first"
+    )
+    tried_roles: Annotated[list[str], operator.add] = Field(
+        default=[], description="Roles that have already produced an answer"
+    )
 
 
-model = ChatOllama(model="llama3.1:latest", temperature=0.2)
+class RoleChoice(BaseModel):
+    role: str = Field(..., description="technical, business, creative or general")
+    confidence: float = Field(..., description="Confidence in the choice from 0 to 1")
 
 
-def role_selector(state: State) -> State:
-    """ユーザーのクエリから適切な役割を選択"""
-    prompt = ChatPromptTemplate.from_template(
-        """
+class Judgement(BaseModel):
+    is_good: bool = Field(..., description="Whether the answer addresses the question")
+    reason: str = Field(..., description="Reason for the judgement")
+    confidence: float = Field(..., description="Confidence in the judgement from 0 to 1")
+
+
+ROLES = ["technical", "business", "creative", "general"]
+
+# ノードごとのモデル。ラベルやはい/いいえを返すだけのノードは小さいモデルで済ませる
+NODE_MODELS = {
+    "role_selector": DEFAULT_SMALL_MODEL,
+    "answer_generator": DEFAULT_MODEL,
+    "judge_answer": DEFAULT_SMALL_MODEL,
+}
+
+# ノードごとの出力トークン上限。Q_and_A/main.py と同じく ConfigurableField(id="max_tokens") で渡す
+NODE_MAX_TOKENS = {
+    "role_selector": 64,
+    "judge_answer": 256,
+}
+
+# 役割ごとの例文。埋め込みの類似度で役割を選び、LLM呼び出しを省く
+ROLE_EXAMPLES = {
+    "technical": [
+        "技術的な質問",
+        "プログラミングやソフトウェア開発、インフラ、データ分析についての質問",
+        *(
+            EXPERT_ROLES[key]["description"]
+            for key in (
+                "backend_engineer",
+                "frontend_engineer",
+                "devops_engineer",
+                "data_scientist",
+                "security_expert",
+                "architect",
+                "qa_engineer",
+            )
+        ),
+    ],
+    "business": [
+        "ビジネス関連の質問",
+        "事業戦略、収益モデル、マーケティング、組織運営、営業についての質問",
+        EXPERT_ROLES["product_manager"]["description"],
+    ],
+    "creative": [
+        "創作関連の質問",
+        "物語、詩、キャッチコピー、企画のアイデア出し、デザインについての相談",
+    ],
+    "general": [
+        "一般的な質問",
+        "日常生活、健康、旅行、学習、雑学についての質問",
+    ],
+}
+
+# 1位と2位の類似度の差がこれ未満なら判別が曖昧とみなし、role_cascade に任せる
+ROUTER_MARGIN = 0.03
+
+# 1つの質問で回答を生成する役割の数の上限。同じ役割は二度試さない
+MAX_ROLE_ATTEMPTS = 3
+
+# fan_out_app で1ラウンドに同時に回答・判定する役割の数。MAX_ROLE_ATTEMPTS より
+# 小さくして、最初のラウンドが全滅したときに残りの役割で再試行できるようにする
+FAN_OUT_ROLES = 2
+
+# 合格した候補が出たら残りの候補を打ち切る。False なら全候補を最後まで回答・判定させ、
+# LLM 呼び出し数がタイミングに左右されなくなる（bench.suite が使う）
+CANCEL_LOSING_CANDIDATES = True
+
+# 小さいモデルの回答を採用する確信度の下限。下回るか解析できなければ model に回す
+CASCADE_CONFIDENCE = 0.7
+
+
+def _interactive_model(name: str):
+    # 対話的な質問応答なので、要件定義などのバッチ処理より優先して実行する
+    return configurable_max_tokens(get_chat_model(name, priority=Priority.INTERACTIVE))
+
+
+model = _interactive_model(DEFAULT_MODEL)
+node_models = {node: _interactive_model(name) for node, name in NODE_MODELS.items()}
+
+role_cascade = ModelCascade(
+    structured(node_models["role_selector"], RoleChoice, NODE_MAX_TOKENS["role_selector"]),
+    structured(model, RoleChoice, NODE_MAX_TOKENS["role_selector"]),
+    accept=lambda c: c.role in ROLES and c.confidence >= CASCADE_CONFIDENCE,
+)
+judge_cascade = ModelCascade(
+    structured(node_models["judge_answer"], Judgement, NODE_MAX_TOKENS["judge_answer"]),
+    structured(model, Judgement, NODE_MAX_TOKENS["judge_answer"]),
+    accept=lambda j: j.confidence >= CASCADE_CONFIDENCE,
+)
+
+role_router = RoleRouter(get_embeddings(), ROLE_EXAMPLES, margin=ROUTER_MARGIN)
+
+# 言い換えられた同じ質問にはキャッシュ済みの最終状態を返す
+semantic_cache = SemanticCache(
+    get_embeddings(),
+    path=semantic_cache_path("graph"),
+)
+
+
+def judged_good(result: dict) -> bool:
+    """判定に合格した最終状態だけをキャッシュする。不合格の回答を言い換えに返さない"""
+    return bool(result.get("current_judge"))
+
+
+_ROLE_PROMPT = ChatPromptTemplate.from_template(
+    """
         以下の質問に最も適した役割を選んでください:
         
         質問: {query}
@@ -39,24 +190,48 @@ def role_selector(state: State) -> State:
         - creative: 創作関連の質問
         - general: 一般的な質問
         
-        役割のみ答えてください。
+        選んだ役割を role に、その選択への確信度（0〜1）を confidence に入れて
+        JSONで答えてください。
         """
-    )
-    
-    chain = prompt | model | StrOutputParser()
-    role = chain.invoke({"query": state.query}).strip()
+)
+
+
+# ノードは変更したフィールドだけを返し、LangGraph がリデューサーで State に反映する
+def _role_update(route: RouteResult, role: str) -> dict:
+    """ルーターまたはLLMが選んだ役割を State の差分にする"""
+    if role not in ROLES:
+        role = route.role
+    # 不合格なら類似度の高い順に次の役割を試す
+    candidates = [role] + [r for r in route.ranking if r != role]
     
-    return State(
-        query=state.query,
-        current_role=role,
-        messages=state.messages + [f"役割を選択しました: {role}"],
-        current_judge=state.current_judge,
-        judgement_reason=state.judgement_reason
-    )
+    return {
+        "current_role": role,
+        "messages": [f"役割を選択しました: {role}"],
+        "candidate_roles": candidates,
+    }
 
 
-def answer_generator(state: State) -> State:
-    """選択された役割に基づいて回答を生成"""
+def role_selector(state: State) -> dict:
+    """ユーザーのクエリから適切な役割を選択"""
+    route = role_router.route(state.query)
+    if route.confident:
+        return _role_update(route, route.role)
+    # 例文との類似度で決めきれない質問だけLLMに選ばせる
+    choice = (_ROLE_PROMPT | role_cascade).invoke({"query": state.query})
+    return _role_update(route, choice.role.strip())
+
+
+async def arole_selector(state: State) -> dict:
+    """role_selector の非同期版"""
+    route = await role_router.aroute(state.query)
+    if route.confident:
+        return _role_update(route, route.role)
+    choice = await (_ROLE_PROMPT | role_cascade).ainvoke({"query": state.query})
+    return _role_update(route, choice.role.strip())
+
+
+def _answer_chain(role: str) -> Runnable:
+    """役割に応じた回答生成チェーン"""
     role_prompts = {
         "technical": "あなたは技術エキスパートです。専門用語を使って詳しく説明してください。",
         "business": "あなたはビジネスコンサルタントです。実用的で具体的なアドバイスをしてください。",
@@ -64,7 +239,7 @@ def answer_generator(state: State) -> State:
         "general": "あなたは親しみやすいアシスタントです。分かりやすく説明してください。"
     }
     
-    role_prompt = role_prompts.get(state.current_role, role_prompts["general"])
+    role_prompt = role_prompts.get(role, role_prompts["general"])
     
     prompt = ChatPromptTemplate.from_template(
         f"""
@@ -76,24 +251,31 @@ def answer_generator(state: State) -> State:
         """
     )
     
-    chain = prompt | model | StrOutputParser()
-    answer = chain.invoke({"query": state.query})
-    
-    return State(
-        query=state.query,
-        current_role=state.current_role,
-        messages=state.messages + [f"回答: {answer}"],
-        current_judge=state.current_judge,
-        judgement_reason=state.judgement_reason
-    )
+    return prompt | node_models["answer_generator"] | StrOutputParser()
 
 
-def judge_answer(state: State) -> State:
-    """生成された回答が適切かどうか判定"""
-    last_answer = state.messages[-1] if state.messages else ""
-    
-    prompt = ChatPromptTemplate.from_template(
-        """
+def answer_generator(state: State) -> dict:
+    """選択された役割に基づいて回答を生成"""
+    answer = _answer_chain(state.current_role).invoke({"query": state.query})
+    return _answer_update(state, answer)
+
+
+async def aanswer_generator(state: State) -> dict:
+    """answer_generator の非同期版。キャンセルされると生成中のストリームも閉じる"""
+    answer = await _answer_chain(state.current_role).ainvoke({"query": state.query})
+    return _answer_update(state, answer)
+
+
+def _answer_update(state: State, answer: str) -> dict:
+    return {
+        "answer": answer,
+        "messages": [f"回答: {answer}"],
+        "tried_roles": [state.current_role],
+    }
+
+
+_JUDGE_PROMPT = ChatPromptTemplate.from_template(
+    """
         以下の質問と回答を評価してください:
         
         質問: {query}
@@ -101,96 +283,320 @@ def judge_answer(state: State) -> State:
         回答: {answer}
         
         この回答は質問に適切に答えていますか？
-        「はい」または「いいえ」で答え、その理由も説明してください。
-        
-        フォーマット:
-        判定: はい/いいえ
-        理由: 理由を説明
+        適切なら is_good を true、そうでなければ false にし、理由を reason に、
+        判定への確信度（0〜1）を confidence に入れてJSONで答えてください。
         """
-    )
-    
-    chain = prompt | model | StrOutputParser()
-    judgment = chain.invoke({
+)
+
+
+def _judgment(result: Judgement) -> str:
+    return f"判定: {'はい' if result.is_good else 'いいえ'}\n理由: {result.reason}"
+
+
+def judge_answer(state: State) -> dict:
+    """生成された回答が適切かどうか判定"""
+    chain = _JUDGE_PROMPT | judge_cascade
+    result = chain.invoke({
         "query": state.query,
         "role": state.current_role,
-        "answer": last_answer
+        "answer": state.answer
     })
+    return _judge_update(result)
+
+
+async def ajudge_answer(state: State) -> dict:
+    """judge_answer の非同期版"""
+    chain = _JUDGE_PROMPT | judge_cascade
+    result = await chain.ainvoke({
+        "query": state.query,
+        "role": state.current_role,
+        "answer": state.answer
+    })
+    return _judge_update(result)
+
+
+def _judge_update(result: Judgement) -> dict:
+    judgment = _judgment(result)
     
-    is_good = "はい" in judgment
-    
-    return State(
-        query=state.query,
-        current_role=state.current_role,
-        messages=state.messages + [f"判定結果: {judgment}"],
-        current_judge=is_good,
-        judgement_reason=judgment
+    return {
+        "messages": [f"判定結果: {judgment}"],
+        "current_judge": result.is_good,
+        "judgement_reason": judgment,
+    }
+
+
+# 候補の判定は構造化出力（JSON）なので、stream_mode="messages" に流さない
+_CANDIDATE_JUDGE_CONFIG = {"tags": [TAG_NOSTREAM]}
+
+
+def _untried_roles(state: State) -> list[str]:
+    """まだ回答を生成していない候補の役割（優先度順）"""
+    return [r for r in state.candidate_roles or ROLES if r not in state.tried_roles]
+
+
+def _candidate(
+    query: str, role: str, stop: threading.Event
+) -> Optional[tuple[str, Judgement]]:
+    """1つの役割で回答を生成して判定する。stop が立てば途中で打ち切って None を返す"""
+    chunks = []
+    parts = _answer_chain(role).stream({"query": query}, {"metadata": {"candidate_role": role}})
+    try:
+        for chunk in parts:
+            if stop.is_set():
+                return None
+            chunks.append(chunk)
+    finally:
+        # 打ち切った場合はストリームを閉じてサーバー側の生成も止める
+        parts.close()
+    if stop.is_set():
+        return None
+    answer = "".join(chunks)
+    return answer, (_JUDGE_PROMPT | judge_cascade).invoke(
+        {"query": query, "role": role, "answer": answer}, _CANDIDATE_JUDGE_CONFIG
+    )
+
+
+async def _acandidate(query: str, role: str) -> tuple[str, Judgement]:
+    # 候補ごとのトークンをストリーム側で区別できるよう役割をメタデータに載せる
+    answer = await _answer_chain(role).ainvoke(
+        {"query": query}, {"metadata": {"candidate_role": role}}
     )
+    return answer, await (_JUDGE_PROMPT | judge_cascade).ainvoke(
+        {"query": query, "role": role, "answer": answer}, _CANDIDATE_JUDGE_CONFIG
+    )
+
+
+def _fan_out_roles(state: State) -> list[str]:
+    """次のラウンドで並列に試す役割"""
+    return _untried_roles(state)[:min(FAN_OUT_ROLES, MAX_ROLE_ATTEMPTS - len(state.tried_roles))]
+
+
+def _no_roles_left() -> dict:
+    # 回答・判定は変えないので、should_continue がこれまでの回答で終える
+    return {"messages": ["試す役割が残っていないため、これまでの回答で終了"]}
+
+
+def _candidates_state(
+    state: State,
+    roles: list[str],
+    outcome: Optional[tuple[str, str, Judgement]],
+    error: Optional[Exception],
+) -> dict:
+    if outcome is None:
+        # すべての候補が失敗した
+        raise error
+    role, answer, result = outcome
+    judgment = _judgment(result)
+    return {
+        "current_role": role,
+        "answer": answer,
+        "messages": [
+            f"並列に試した役割: {', '.join(roles)}",
+            f"回答: {answer}",
+            f"判定結果: {judgment}",
+        ],
+        "current_judge": result.is_good,
+        "judgement_reason": judgment,
+        "tried_roles": roles,
+    }
+
+
+def answer_candidates(state: State) -> dict:
+    """上位の候補の役割で同時に回答・判定し、最初に合格した回答を採用して残りを打ち切る"""
+    roles = _fan_out_roles(state)
+    if not roles:
+        return _no_roles_left()
+    stop = threading.Event()
+    pool = ThreadPoolExecutor(max_workers=len(roles))
+    # 優先度・期限などのコンテキストを各スレッドに引き継ぐ
+    futures = {
+        pool.submit(copy_context().run, _candidate, state.query, role, stop): role
+        for role in roles
+    }
+    outcome, error = None, None
+    try:
+        for future in as_completed(futures):
+            try:
+                answer, result = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            if not (outcome and outcome[2].is_good):
+                outcome = (futures[future], answer, result)
+            if result.is_good and CANCEL_LOSING_CANDIDATES:
+                break
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    return _candidates_state(state, roles, outcome, error)
+
+
+async def aanswer_candidates(state: State) -> dict:
+    """answer_candidates の非同期版。合格が出た時点で残りのタスクをキャンセルする"""
+    roles = _fan_out_roles(state)
+    if not roles:
+        return _no_roles_left()
+    tasks = {asyncio.create_task(_acandidate(state.query, role)): role for role in roles}
+    pending = set(tasks)
+    outcome, error = None, None
+    try:
+        while pending and not (CANCEL_LOSING_CANDIDATES and outcome and outcome[2].is_good):
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    answer, result = task.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                if not (outcome and outcome[2].is_good):
+                    outcome = (tasks[task], answer, result)
+    finally:
+        for task in pending:
+            task.cancel()
+    return _candidates_state(state, roles, outcome, error)
 
 
 def should_continue(state: State) -> str:
     """判定結果に基づいて次のステップを決定"""
     if state.current_judge:
         return "end"
-    else:
-        return "retry"
+    # 試行回数の上限に達したか、試す役割が残っていなければ最後の回答で終える
+    if len(state.tried_roles) >= MAX_ROLE_ATTEMPTS or not _untried_roles(state):
+        return "end"
+    return "retry"
 
 
-def retry_with_different_role(state: State) -> State:
-    """異なる役割で再試行"""
-    roles = ["technical", "business", "creative", "general"]
-    current_role = state.current_role
+def retry_with_different_role(state: State) -> dict:
+    """まだ試していない役割で再試行"""
+    new_role = _untried_roles(state)[0]
     
-    # 現在の役割以外をランダム選択
-    available_roles = [r for r in roles if r != current_role]
-    new_role = available_roles[0] if available_roles else "general"
-    
-    return State(
-        query=state.query,
-        current_role=new_role,
-        messages=state.messages + [f"別の役割で再試行: {new_role}"],
-        current_judge=False,
-        judgement_reason=""
+    return {
+        "current_role": new_role,
+        "messages": [f"別の役割で再試行: {new_role}"],
+        "current_judge": False,
+        "judgement_reason": "",
+    }
+
+
+# ノードごとのLLM呼び出しの期限（秒）。超えると DeadlineExceeded で打ち切る
+NODE_DEADLINES = {
+    "role_selector": 30.0,
+    "answer_generator": 120.0,
+    "judge_answer": 60.0,
+    "answer_candidates": 180.0,
+}
+
+
+def _node(name: str, func: Callable, afunc: Callable) -> RunnableLambda:
+    """期限付きのノード。ainvoke/astream では afunc を使うのでキャンセルがLLM呼び出しまで届く"""
+    seconds = NODE_DEADLINES[name]
+    return RunnableLambda(
+        with_deadline(seconds)(func), afunc=with_deadline(seconds)(afunc), name=name
     )
 
 
-# グラフの構築
-workflow = StateGraph(State)
-
-# ノードを追加
-workflow.add_node("role_selector", role_selector)
-workflow.add_node("answer_generator", answer_generator)
-workflow.add_node("judge_answer", judge_answer)
-workflow.add_node("retry", retry_with_different_role)
-
-# エッジを追加
-workflow.set_entry_point("role_selector")
-workflow.add_edge("role_selector", "answer_generator")
-workflow.add_edge("answer_generator", "judge_answer")
-workflow.add_conditional_edges(
-    "judge_answer",
-    should_continue,
-    {
-        "end": END,
-        "retry": "retry"
-    }
+def build_workflow(fan_out: bool = False) -> StateGraph:
+    """Q&Aグラフを構築する。fan_out なら候補の役割を1ラウンドで並列に試す"""
+    workflow = StateGraph(State)
+    workflow.add_node("role_selector", _node("role_selector", role_selector, arole_selector))
+    workflow.set_entry_point("role_selector")
+
+    if fan_out:
+        workflow.add_node(
+            "answer_candidates",
+            _node("answer_candidates", answer_candidates, aanswer_candidates),
+        )
+        workflow.add_edge("role_selector", "answer_candidates")
+        workflow.add_conditional_edges(
+            "answer_candidates",
+            should_continue,
+            {
+                "end": END,
+                "retry": "answer_candidates"
+            }
+        )
+        return workflow
+
+    workflow.add_node(
+        "answer_generator", _node("answer_generator", answer_generator, aanswer_generator)
+    )
+    workflow.add_node("judge_answer", _node("judge_answer", judge_answer, ajudge_answer))
+    workflow.add_node("retry", retry_with_different_role)
+
+    workflow.add_edge("role_selector", "answer_generator")
+    workflow.add_edge("answer_generator", "judge_answer")
+    workflow.add_conditional_edges(
+        "judge_answer",
+        should_continue,
+        {
+            "end": END,
+            "retry": "retry"
+        }
+    )
+    workflow.add_edge("retry", "answer_generator")
+    return workflow
+
+
+# グラフをコンパイル。ノードとLLM呼び出しごとの所要時間・トークン数を計測する
+app = build_workflow().compile().with_config(callbacks=[get_instrumentation().handler])
+# 候補の役割を順番ではなく並列に試すグラフ。最悪でも回答・判定1ラウンド分の時間で済む
+fan_out_app = build_workflow(fan_out=True).compile().with_config(
+    callbacks=[get_instrumentation().handler]
 )
-workflow.add_edge("retry", "answer_generator")
 
-# グラフをコンパイル
-app = workflow.compile()
 
-# 実行例
-if __name__ == "__main__":
-    initial_state = State(query="Pythonでファイルを読み込む方法を教えて")
-    
-    for output in app.stream(initial_state):
+def answer(query: str) -> dict:
+    """意味的に近い質問がキャッシュにあればその結果を返し、なければグラフを実行"""
+    return semantic_cache.get_or_compute(
+        query, lambda q: app.invoke(State(query=q)), cacheable=judged_good
+    )
+
+
+def _stream_with_trace(query: str) -> dict:
+    """各ノードの出力を表示しながらグラフを実行し、最終状態を返す"""
+    final: dict = {}
+    # updates は各ノードが返した差分、values は反映後の State 全体
+    for mode, output in app.stream(State(query=query), stream_mode=["updates", "values"]):
+        if mode == "values":
+            final = output
+            continue
         for key, value in output.items():
             print(f"ノード '{key}':")
-            # LangGraphはdict形式で返すので辞書アクセス
-            print(f"  現在の役割: {value.get('current_role', '')}")
-            print(f"  判定: {value.get('current_judge', False)}")
-            print(f"  メッセージ数: {len(value.get('messages', []))}")
+            print(f"  現在の役割: {value.get('current_role', final.get('current_role', ''))}")
+            print(f"  判定: {value.get('current_judge', final.get('current_judge', False))}")
             messages = value.get('messages', [])
+            print(f"  追加メッセージ数: {len(messages)}")
             if messages:
                 print(f"  最新メッセージ: {messages[-1][:100]}...")
-            print("---")
\ No newline at end of file
+            print("---")
+    return final
+
+
+# 実行例
+if __name__ == "__main__":
+    for name in sorted(set(NODE_MODELS.values())):
+        report = warm_up(name)
+        print(
+            f"ウォームアップ {name}: cold={report.cold_first_token_ms:.0f}ms "
+            f"warm={report.warm_first_token_ms:.0f}ms"
+        )
+    role_router.warm()
+    for query in ["Pythonでファイルを読み込む方法を教えて", "Pythonでファイルを読むにはどうすればいい？"]:
+        result = semantic_cache.get_or_compute(query, _stream_with_trace, cacheable=judged_good)
+        print(f"質問: {query}")
+        print(f"  最終的な役割: {result.get('current_role', '')}")
+    stats = semantic_cache.stats
+    print(
+        f"キャッシュ: hits={stats.hits} misses={stats.misses} "
+        f"p50={stats.latency_ms(50):.1f}ms p95={stats.latency_ms(95):.1f}ms"
+    )
+    routed = role_router.stats
+    print(
+        f"ルーター: routed={routed.routed} ambiguous_rate={routed.ambiguous_rate:.0%} "
+        f"classify={routed.classify_seconds / max(routed.routed, 1) * 1e6:.0f}us/query"
+    )
+    for name, cascade in [("role_selector", role_cascade), ("judge_answer", judge_cascade)]:
+        print(
+            f"カスケード {name}: calls={cascade.stats.calls} "
+            f"escalation_rate={cascade.stats.escalation_rate:.0%}"
+        )
@@ -0,0 +1,323 @@
+"""HTTP/SSE service for the Q&A graph in graph.py.
+
+Endpoints:
+    POST /ask         {"query": ..., "session_id": ..., "fan_out": false} -> final state as JSON
+    POST /ask/stream  same body -> text/event-stream of token, update, done and error events
+    GET  /healthz     running/queued request counts, for the load balancer
+    GET  /metrics     Prometheus metrics of the graph nodes and LLM calls
+
+The graph runs asynchronously on the event loop. At most --max-concurrency
+requests run at once. Up to --max-queue more wait for a slot; beyond that,
+requests are rejected with 429. A session, named by ``session_id`` in the
+body or the X-Session-ID header, may have --max-per-session requests in
+flight; more are also rejected with 429. Requests without a session are
+only subject to the global limits: behind a load balancer the peer
+address is the balancer's, so it cannot stand in for a session. When a client
+disconnects, its graph run is cancelled, and the cancellation reaches the
+Ollama stream of the running node.
+
+Usage:
+    python graph_server.py --port 8000 --max-concurrency 8 --max-queue 32
+    curl -N -X POST localhost:8000/ask/stream -H 'Content-Type: application/json' \\
+        -d '{"query": "Pythonでファイルを読み込む方法を教えて"}'
+"""
+
+import argparse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Optional
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+import graph
+from llm.instrumentation import get_instrumentation
+from llm.scheduler import request_context
+
+# トークンをクライアントに流すノード。分類・判定ノードの構造化出力（JSON）は流さない
+STREAMED_NODES = ("answer_generator", "answer_candidates")
+# 候補ノードでは候補の役割が付いた回答のトークンだけを流す
+ROLE_TAGGED_NODES = ("answer_candidates",)
+
+# 非ストリームの /ask でクライアントの切断を確認する間隔（秒）
+DISCONNECT_POLL_SECONDS = 0.5
+
+
+class Overloaded(Exception):
+    """The server or the session has no room for another request."""
+
+
+class ServerConfig(BaseModel):
+    """Concurrency and queue limits of the service."""
+
+    max_concurrency: int = Field(default=8, description="Graph runs executing at once")
+    max_queue: int = Field(default=32, description="Requests waiting for a run slot")
+    max_per_session: int = Field(default=1, description="Requests in flight per session")
+
+
+class AskRequest(BaseModel):
+    """Body of /ask and /ask/stream."""
+
+    query: str = Field(..., description="Question from user")
+    session_id: Optional[str] = Field(
+        default=None, description="Session the request belongs to; overrides X-Session-ID"
+    )
+    fan_out: bool = Field(default=False, description="Try the top candidate roles in parallel")
+
+
+class Reservation:
+    """A request's place in the queue, and later its run slot, until ``release``."""
+
+    def __init__(self, admission: "Admission", session: Optional[str]):
+        self._admission = admission
+        self._session = session
+        self._running = False
+        self._released = False
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait in the queue for a run slot and hold it for the block."""
+        admission = self._admission
+        await admission._slots.acquire()
+        admission.waiting -= 1
+        admission.running += 1
+        self._running = True
+        try:
+            yield
+        except asyncio.CancelledError:
+            admission.cancelled += 1
+            raise
+        finally:
+            admission.running -= 1
+            admission._slots.release()
+
+    def release(self) -> None:
+        """Give up the reservation; safe to call more than once."""
+        if self._released:
+            return
+        self._released = True
+        admission = self._admission
+        if not self._running:
+            admission.waiting -= 1
+        if self._session is None:
+            return
+        admission._sessions[self._session] -= 1
+        if not admission._sessions[self._session]:
+            del admission._sessions[self._session]
+
+
+class Admission:
+    """Run slots with a bounded wait queue and a per-session in-flight limit.
+
+    ``reserve`` decides synchronously, so a rejected request gets its 429
+    before any response starts. Only used from the event loop, so the
+    counters need no lock.
+    """
+
+    def __init__(self, config: ServerConfig):
+        """Initialize the admission control with the limits in ``config``."""
+        self.config = config
+        self.running = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self._slots = asyncio.Semaphore(config.max_concurrency)
+        self._sessions: dict[str, int] = {}
+
+    def reserve(self, session: Optional[str]) -> Reservation:
+        """Queue a request from ``session`` (None: no per-session limit), or raise ``Overloaded``."""
+        if session is not None and self._sessions.get(session, 0) >= self.config.max_per_session:
+            self.rejected += 1
+            raise Overloaded(f"session {session!r} already has a request in flight")
+        if self.running + self.waiting >= self.config.max_concurrency + self.config.max_queue:
+            self.rejected += 1
+            raise Overloaded("request queue is full")
+        if session is not None:
+            self._sessions[session] = self._sessions.get(session, 0) + 1
+        self.waiting += 1
+        return Reservation(self, session)
+
+
+class _ReservedStream(StreamingResponse):
+    """Streaming response that releases its reservation however the response ends.
+
+    The body generator may never start if the client disconnects first, so
+    the release cannot live in the generator alone.
+    """
+
+    def __init__(self, content: AsyncIterator[str], reservation: Reservation, **kwargs: Any):
+        super().__init__(content, **kwargs)
+        self._reservation = reservation
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._reservation.release()
+
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _app_for(body: AskRequest):
+    return graph.fan_out_app if body.fan_out else graph.app
+
+
+def _session(body: AskRequest, x_session_id: Optional[str]) -> Optional[str]:
+    return body.session_id or x_session_id or None
+
+
+async def _until_disconnected(request: Request, work: Awaitable[Any]) -> Any:
+    """Await ``work``, cancelling it if the client goes away first."""
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                # 499: nginx の慣例に合わせ、クライアントが先に切断したことを示す
+                raise HTTPException(status_code=499, detail="client disconnected")
+    finally:
+        task.cancel()
+
+
+def create_app(config: Optional[ServerConfig] = None) -> FastAPI:
+    """FastAPI application serving graph.app and graph.fan_out_app."""
+    config = config or ServerConfig()
+    admission = Admission(config)
+    api = FastAPI(title="Q&A graph")
+
+    def overloaded(e: Overloaded) -> HTTPException:
+        return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    @api.post("/ask")
+    async def ask(
+        body: AskRequest,
+        request: Request,
+        x_tenant: Optional[str] = Header(default=None),
+        x_session_id: Optional[str] = Header(default=None),
+    ) -> dict:
+        session = _session(body, x_session_id)
+
+        async def run(query: str) -> dict:
+            return await _app_for(body).ainvoke(graph.State(query=query))
+
+        async def admitted() -> dict:
+            async with reservation.slot():
+                with request_context(tenant=x_tenant):
+                    if body.fan_out:
+                        return await run(body.query)
+                    # 言い換えられた同じ質問はキャッシュ済みの最終状態を返す
+                    return await graph.semantic_cache.aget_or_compute(
+                        body.query, run, cacheable=graph.judged_good
+                    )
+
+        try:
+            reservation = admission.reserve(session)
+        except Overloaded as e:
+            raise overloaded(e) from None
+        try:
+            return await _until_disconnected(request, admitted())
+        finally:
+            reservation.release()
+
+    @api.post("/ask/stream")
+    async def ask_stream(
+        body: AskRequest,
+        request: Request,
+        x_tenant: Optional[str] = Header(default=None),
+        x_session_id: Optional[str] = Header(default=None),
+    ) -> StreamingResponse:
+        session = _session(body, x_session_id)
+        # ストリームを始める前に 429 で断る
+        try:
+            reservation = admission.reserve(session)
+        except Overloaded as e:
+            raise overloaded(e) from None
+
+        async def events() -> AsyncIterator[str]:
+            # 切断されると Starlette がこのジェネレーターをキャンセルし、実行中のノードまで伝わる
+            try:
+                async with reservation.slot():
+                    with request_context(tenant=x_tenant):
+                        final: dict = {}
+                        async for mode, chunk in _app_for(body).astream(
+                            graph.State(query=body.query),
+                            stream_mode=["messages", "updates", "values"],
+                        ):
+                            if mode == "messages":
+                                message, metadata = chunk
+                                node = metadata.get("langgraph_node")
+                                role = metadata.get("candidate_role")
+                                if node in ROLE_TAGGED_NODES and not role:
+                                    continue
+                                if node in STREAMED_NODES and message.content:
+                                    token = {"node": node, "text": message.content}
+                                    # fan_out では候補の役割ごとのトークンが混ざって届く
+                                    if role:
+                                        token["role"] = role
+                                    yield _sse("token", token)
+                            elif mode == "updates":
+                                for node, update in chunk.items():
+                                    yield _sse("update", {"node": node, "update": update})
+                            else:
+                                final = chunk
+                        yield _sse("done", final)
+            except Exception as e:
+                yield _sse("error", {"status": 500, "detail": repr(e)})
+
+        return _ReservedStream(
+            events(),
+            reservation,
+            media_type="text/event-stream",
+            # プロキシにバッファリングさせない
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @api.get("/healthz")
+    async def healthz() -> dict:
+        return {
+            "status": "ok",
+            "running": admission.running,
+            "waiting": admission.waiting,
+            "rejected": admission.rejected,
+            "cancelled": admission.cancelled,
+        }
+
+    @api.get("/metrics")
+    async def metrics() -> PlainTextResponse:
+        return PlainTextResponse(
+            get_instrumentation().render(), media_type="text/plain; version=0.0.4"
+        )
+
+    return api
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Q&Aグラフを HTTP/SSE で提供します")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-concurrency", type=int, default=8, help="同時に実行するグラフの数")
+    parser.add_argument("--max-queue", type=int, default=32, help="実行待ちにできるリクエスト数")
+    parser.add_argument(
+        "--max-per-session", type=int, default=1, help="セッションごとの同時リクエスト数"
+    )
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = ServerConfig(
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        max_per_session=args.max_per_session,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Disk-backed response cache for Ollama chat calls."""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Mapping, Optional
+
+from pydantic import BaseModel, Field
+
+# Request fields that do not change the generated output
+_NON_SEMANTIC_PARAMS = ("stream", "keep_alive")
+
+
+class CacheStats(BaseModel):
+    """Counters for the response cache."""
+
+    hits: int = Field(default=0, description="Lookups served from the cache")
+    misses: int = Field(default=0, description="Lookups that went to the backend")
+    evictions: int = Field(default=0, description="Entries removed by size or TTL")
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def cache_key(params: Mapping[str, Any]) -> str:
+    """Key a chat request on its model, sampling options, format, tools and messages."""
+    semantic = {k: v for k, v in params.items() if k not in _NON_SEMANTIC_PARAMS}
+    encoded = json.dumps(semantic, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def to_part(part: Any) -> dict[str, Any]:
+    """Convert a raw Ollama stream part into a plain JSON-compatible dict."""
+    if hasattr(part, "model_dump"):
+        return part.model_dump(mode="json", exclude_none=True)
+    return json.loads(json.dumps(dict(part), default=str))
+
+
+class ResponseCache:
+    """SQLite-backed cache of complete chat responses, stored as their stream parts.
+
+    Each entry keeps every raw stream part of a finished response, so cached
+    streams replay chunk by chunk. Entries older than ``ttl_seconds`` are
+    treated as misses, and the least recently used entries are evicted once
+    the stored payloads exceed ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        path: str = os.path.join(os.path.expanduser("~"), ".cache", "ai-study", "llm.sqlite"),
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+    ):
+        """Open (or create) the cache database at ``path``."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, parts BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, key: str) -> Optional[list[dict[str, Any]]]:
+        """Return the cached stream parts for ``key``, or None."""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT parts, size, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            parts, size, created = row
+            if self.ttl_seconds is not None and created + self.ttl_seconds < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                self.stats.evictions += 1
+                self.stats.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self.stats.hits += 1
+        return json.loads(zlib.decompress(parts))
+
+    def update(self, key: str, parts: list[dict[str, Any]]) -> None:
+        """Store the stream parts of a finished response."""
+        blob = zlib.compress(json.dumps(parts, ensure_ascii=False).encode("utf-8"), 1)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._size += len(blob) - (previous[0] if previous else 0)
+            self._evict()
+
+    def _evict(self) -> None:
+        # Drop least recently used entries until the payloads fit again
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._size = 0
+                return
+            for key, size in rows:
+                if self._size <= self.max_bytes:
+                    return
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._size = 0
+
+    async def alookup(self, key: str) -> Optional[list[dict[str, Any]]]:
+        return await asyncio.to_thread(self.lookup, key)
+
+    async def aupdate(self, key: str, parts: list[dict[str, Any]]) -> None:
+        await asyncio.to_thread(self.update, key, parts)
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+
+def shared_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache at ``$AI_STUDY_LLM_CACHE``, or None when the variable is unset."""
+    global _shared_cache
+    path = os.environ.get("AI_STUDY_LLM_CACHE")
+    if not path:
+        return None
+    with _shared_lock:
+        if _shared_cache is None or _shared_cache.path != path:
+            _shared_cache = ResponseCache(path)
+        return _shared_cache
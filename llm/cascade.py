@@ -0,0 +1,153 @@
+"""Small-model-first cascades for classification and judging calls."""
+
+import threading
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.runnables import ConfigurableField, Runnable, RunnableConfig
+from pydantic import BaseModel, Field, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+# What a small model's output can fail with when it does not match the schema
+_UNPARSABLE = (OutputParserException, ValidationError, ValueError)
+
+
+def structured(
+    model: Runnable, schema: type[T], max_tokens: Optional[int] = None
+) -> Runnable[Any, T]:
+    """``model`` constrained to ``schema`` via Ollama's JSON-schema ``format``.
+
+    Unlike ``with_structured_output`` this keeps ``model`` itself in the
+    chain, so a ``ConfigurableField(id="max_tokens")`` on it still applies;
+    ``max_tokens`` sets that field for this chain only.
+    """
+    chain = model.bind(format=schema.model_json_schema()) | PydanticOutputParser(
+        pydantic_object=schema
+    )
+    if max_tokens is None:
+        return chain
+    return chain.with_config(configurable={"max_tokens": max_tokens})
+
+
+def configurable_max_tokens(model: BaseChatModel) -> Runnable:
+    """``model`` with its output token cap exposed as ``configurable["max_tokens"]``.
+
+    The cap is ``ManagedChatOllama.max_tokens`` or, for a plain
+    ``ChatOllama``, ``num_predict``; a model with neither is returned uncapped.
+    """
+    for field in ("max_tokens", "num_predict"):
+        if field in type(model).model_fields:
+            return model.configurable_fields(**{field: ConfigurableField(id="max_tokens")})
+    return model
+
+
+class CascadeStats(BaseModel):
+    """Counters for one model cascade."""
+
+    calls: int = Field(default=0, description="Calls made through the cascade")
+    accepted: int = Field(default=0, description="Calls answered by the small model")
+    low_confidence: int = Field(
+        default=0, description="Calls escalated because the small answer was not accepted"
+    )
+    unparsable: int = Field(
+        default=0, description="Calls escalated because the small output did not parse"
+    )
+    small_seconds: float = Field(default=0.0, description="Time spent in small-model calls")
+    large_seconds: float = Field(default=0.0, description="Time spent in large-model calls")
+
+    @property
+    def escalated(self) -> int:
+        """Calls that ended up on the large model."""
+        return self.low_confidence + self.unparsable
+
+    @property
+    def escalation_rate(self) -> float:
+        """Fraction of calls that ended up on the large model."""
+        return self.escalated / self.calls if self.calls else 0.0
+
+
+class ModelCascade(Runnable[Any, Any]):
+    """Answers with a small model and escalates to a large one only when unsure.
+
+    ``small`` and ``large`` are runnables over the same input, normally
+    ``structured`` chains of a small and a large chat model. The small answer
+    is returned when it parses and ``accept`` approves it (e.g. a confidence
+    threshold); otherwise the same input goes to ``large``, whose answer is
+    returned as is. With ``enabled=False`` every call goes to ``large``.
+    """
+
+    def __init__(
+        self,
+        small: Runnable,
+        large: Runnable,
+        accept: Callable[[Any], bool] = lambda _: True,
+        enabled: bool = True,
+    ):
+        """Initialize the cascade over its two models and acceptance check."""
+        self.small = small
+        self.large = large
+        self.accept = accept
+        self.enabled = enabled
+        self.stats = CascadeStats()
+        self._lock = threading.Lock()
+
+    def _judge(self, started: float, result: Any, error: Optional[Exception]) -> bool:
+        accepted = error is None and self.accept(result)
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.small_seconds += time.perf_counter() - started
+            if accepted:
+                self.stats.accepted += 1
+            elif error is None:
+                self.stats.low_confidence += 1
+            else:
+                self.stats.unparsable += 1
+        return accepted
+
+    def _record_large(self, started: float) -> None:
+        with self._lock:
+            if not self.enabled:
+                self.stats.calls += 1
+            self.stats.large_seconds += time.perf_counter() - started
+
+    def invoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        """Run the small model, falling back to the large one when unsure."""
+        if self.enabled:
+            started = time.perf_counter()
+            result, error = None, None
+            try:
+                result = self.small.invoke(input, config, **kwargs)
+            except _UNPARSABLE as e:
+                error = e
+            if self._judge(started, result, error):
+                return result
+        started = time.perf_counter()
+        try:
+            return self.large.invoke(input, config, **kwargs)
+        finally:
+            self._record_large(started)
+
+    async def ainvoke(
+        self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any
+    ) -> Any:
+        """Asynchronously run the small model, falling back to the large one when unsure."""
+        if self.enabled:
+            started = time.perf_counter()
+            result, error = None, None
+            try:
+                result = await self.small.ainvoke(input, config, **kwargs)
+            except _UNPARSABLE as e:
+                error = e
+            if self._judge(started, result, error):
+                return result
+        started = time.perf_counter()
+        try:
+            return await self.large.ainvoke(input, config, **kwargs)
+        finally:
+            self._record_large(started)
@@ -0,0 +1,327 @@
+"""Record and replay Ollama HTTP traffic, including stream timing."""
+
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncIterator, Iterator, Optional
+
+import httpx
+from pydantic import BaseModel, Field
+
+# Request fields that do not change the response
+_NON_SEMANTIC_FIELDS = ("keep_alive",)
+
+
+class CassetteMiss(LookupError):
+    """A replayed request was not found in the cassette."""
+
+
+class CassetteStats(BaseModel):
+    """Counters for one cassette."""
+
+    recorded: int = Field(default=0, description="Interactions written to the cassette")
+    replayed: int = Field(default=0, description="Requests answered from the cassette")
+    misses: int = Field(default=0, description="Replayed requests with no recording")
+    recorded_seconds: float = Field(
+        default=0.0, description="Original duration of the replayed interactions"
+    )
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """Key a request on its method, path and JSON body, ignoring the host."""
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        payload = body.decode("utf-8", "replace")
+    if isinstance(payload, dict):
+        payload = {k: v for k, v in payload.items() if k not in _NON_SEMANTIC_FIELDS}
+    encoded = json.dumps([method, path, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class _Lines:
+    """Splits a byte stream into lines stamped with their arrival time."""
+
+    def __init__(self, started: float):
+        self.started = started
+        self.lines: list[tuple[float, str]] = []
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        *complete, self._buffer = self._buffer.split(b"\n")
+        at = time.monotonic() - self.started
+        for line in complete:
+            self.lines.append((round(at, 4), line.decode("utf-8") + "\n"))
+
+    def finish(self) -> list[tuple[float, str]]:
+        if self._buffer:
+            at = time.monotonic() - self.started
+            self.lines.append((round(at, 4), self._buffer.decode("utf-8")))
+            self._buffer = b""
+        return self.lines
+
+
+class Cassette:
+    """JSONL (gzip) recording of Ollama requests and their timed responses.
+
+    In ``record`` mode every request is sent to Ollama and the response is
+    written as one line: the request, the status and each response line with
+    its offset from the start of the request, so stream chunks keep their
+    time to first token and token rate. In ``replay`` mode nothing leaves
+    the process: requests are matched on method, path and body (not host or
+    ``keep_alive``), identical requests are answered in recorded order, and
+    the response lines are released at their original offsets divided by
+    ``speed``; ``speed=0`` replays as fast as possible.
+
+    The cassette plugs in as the ``httpx`` transport of the ``ollama``
+    clients (see ``ClientRegistry``), so chat, embedding and warm-up calls
+    of any pipeline are covered.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", speed: float = 1.0):
+        """Open ``path`` for ``record`` (appending) or ``replay``."""
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown cassette mode: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.stats = CassetteStats()
+        self._lock = threading.Lock()
+        self._file: Optional[Any] = None
+        self._entries: dict[str, deque[dict[str, Any]]] = defaultdict(deque)
+        if mode == "replay":
+            self._load()
+            return
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # The gzip trailer is only written on close
+        atexit.register(self.close)
+
+    def _open(self, path: str, mode: str) -> Any:
+        if path.endswith(".gz"):
+            return gzip.open(path, mode, encoding="utf-8")
+        return open(path, mode, encoding="utf-8")
+
+    def _load(self) -> None:
+        with self._open(self.path, "rt") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+            except EOFError:
+                # A recording process killed before closing leaves the gzip trailer out
+                pass
+
+    def close(self) -> None:
+        """Flush and close a recording."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, entry: dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = self._open(self.path, "at")
+            self._file.write(line)
+            self._file.flush()
+            self.stats.recorded += 1
+
+    def _take(self, key: str, method: str, path: str) -> dict[str, Any]:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.stats.misses += 1
+                raise CassetteMiss(f"no recording for {method} {path} in {self.path}")
+            entry = entries[0]
+            # The last recording of a request answers any further repeats
+            if len(entries) > 1:
+                entries.popleft()
+            self.stats.replayed += 1
+            self.stats.recorded_seconds += entry["lines"][-1][0] if entry["lines"] else 0.0
+        return entry
+
+    def _entry(
+        self, request: httpx.Request, response: httpx.Response, lines: list[tuple[float, str]]
+    ) -> dict[str, Any]:
+        body = request.content
+        return {
+            "key": request_key(request.method, request.url.path, body),
+            "method": request.method,
+            "path": request.url.path,
+            "request": json.loads(body) if body else None,
+            "status": response.status_code,
+            "content_type": response.headers.get("content-type", "application/json"),
+            "lines": lines,
+        }
+
+    def _delay(self, offset: float, started: float) -> float:
+        if self.speed <= 0:
+            return 0.0
+        return max(started + offset / self.speed - time.monotonic(), 0.0)
+
+    def transport(self, limits: httpx.Limits) -> httpx.BaseTransport:
+        """Transport for a synchronous ``ollama.Client``."""
+        inner = httpx.HTTPTransport(limits=limits) if self.mode == "record" else None
+        return _Transport(self, inner)
+
+    def async_transport(self, limits: httpx.Limits) -> httpx.AsyncBaseTransport:
+        """Transport for an ``ollama.AsyncClient``."""
+        inner = httpx.AsyncHTTPTransport(limits=limits) if self.mode == "record" else None
+        return _AsyncTransport(self, inner)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(
+        self,
+        cassette: Cassette,
+        request: httpx.Request,
+        response: httpx.Response,
+        started: float,
+    ):
+        self._cassette = cassette
+        self._request = request
+        self._response = response
+        self._lines = _Lines(started)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._response.stream:
+            self._lines.feed(chunk)
+            yield chunk
+        # Only complete responses are recorded; an abandoned stream is not
+        self._cassette._write(
+            self._cassette._entry(self._request, self._response, self._lines.finish())
+        )
+
+    def close(self) -> None:
+        self._response.close()
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(
+        self,
+        cassette: Cassette,
+        request: httpx.Request,
+        response: httpx.Response,
+        started: float,
+    ):
+        self._cassette = cassette
+        self._request = request
+        self._response = response
+        self._lines = _Lines(started)
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._response.stream:
+            self._lines.feed(chunk)
+            yield chunk
+        entry = self._cassette._entry(self._request, self._response, self._lines.finish())
+        await asyncio.to_thread(self._cassette._write, entry)
+
+    async def aclose(self) -> None:
+        await self._response.aclose()
+
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, cassette: Cassette, entry: dict[str, Any], started: float):
+        self._cassette = cassette
+        self._entry = entry
+        self._started = started
+
+    def __iter__(self) -> Iterator[bytes]:
+        for offset, line in self._entry["lines"]:
+            time.sleep(self._cassette._delay(offset, self._started))
+            yield line.encode("utf-8")
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, cassette: Cassette, entry: dict[str, Any], started: float):
+        self._cassette = cassette
+        self._entry = entry
+        self._started = started
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for offset, line in self._entry["lines"]:
+            await asyncio.sleep(self._cassette._delay(offset, self._started))
+            yield line.encode("utf-8")
+
+
+def _replay_response(entry: dict[str, Any], stream: Any) -> httpx.Response:
+    return httpx.Response(
+        entry["status"], headers={"content-type": entry["content_type"]}, stream=stream
+    )
+
+
+class _Transport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, inner: Optional[httpx.BaseTransport]):
+        self._cassette = cassette
+        self._inner = inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        request.read()
+        if self._inner is None:
+            key = request_key(request.method, request.url.path, request.content)
+            entry = self._cassette._take(key, request.method, request.url.path)
+            return _replay_response(entry, _ReplayStream(self._cassette, entry, started))
+        response = self._inner.handle_request(request)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(self._cassette, request, response, started),
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        if self._inner is not None:
+            self._inner.close()
+
+
+class _AsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, inner: Optional[httpx.AsyncBaseTransport]):
+        self._cassette = cassette
+        self._inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.monotonic()
+        await request.aread()
+        if self._inner is None:
+            key = request_key(request.method, request.url.path, request.content)
+            entry = self._cassette._take(key, request.method, request.url.path)
+            return _replay_response(entry, _AsyncReplayStream(self._cassette, entry, started))
+        response = await self._inner.handle_async_request(request)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncRecordingStream(self._cassette, request, response, started),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        if self._inner is not None:
+            await self._inner.aclose()
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """Cassette configured by ``$AI_STUDY_CASSETTE``, or None when unset.
+
+    ``$AI_STUDY_CASSETTE_MODE`` is ``record`` or ``replay`` (the default)
+    and ``$AI_STUDY_CASSETTE_SPEED`` scales replayed timings, ``0`` meaning
+    as fast as possible.
+    """
+    path = os.environ.get("AI_STUDY_CASSETTE")
+    if not path:
+        return None
+    return Cassette(
+        path,
+        mode=os.environ.get("AI_STUDY_CASSETTE_MODE", "replay"),
+        speed=float(os.environ.get("AI_STUDY_CASSETTE_SPEED", "1")),
+    )
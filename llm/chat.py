@@ -0,0 +1,291 @@
+"""ChatOllama with pluggable layers around the raw Ollama chat call."""
+
+import functools
+import time
+from contextlib import nullcontext
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    ContextManager,
+    Iterator,
+    Mapping,
+    Optional,
+)
+
+import httpx
+from langchain_core.messages import BaseMessage
+from langchain_ollama import ChatOllama
+from pydantic import ConfigDict
+
+from .cache import ResponseCache, cache_key, to_part
+from .coalesce import SingleFlight
+from .hedging import Hedger, current_deadline
+from .instrumentation import Instrumentation
+from .limiter import AdaptiveConcurrencyLimiter, Slot
+from .router import BackendRouter, affinity_key
+from .scheduler import Priority, current_priority, current_tenant
+
+# Enforces deadlines for models without a hedger
+_DEADLINE_ONLY = Hedger(enabled=False)
+
+
+class ManagedChatOllama(ChatOllama):
+    """Drop-in ``ChatOllama`` that routes every call through shared layers.
+
+    ``invoke``, ``batch``, ``stream`` and their async variants all reach
+    Ollama through ``_create_chat_stream``/``_acreate_chat_stream``, so the
+    layers here apply to every call path, including structured output.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    response_cache: Optional[ResponseCache] = None
+    """Cache of finished responses; cached streams replay part by part."""
+
+    client_factory: Optional[Callable[[], Any]] = None
+    """Returns the ``Client`` to use, e.g. a shared pooled one.
+
+    A factory rather than an assigned client, so copies made by
+    ``configurable_fields`` keep using the same pool.
+    """
+
+    async_client_factory: Optional[Callable[[], Any]] = None
+    """Returns the ``AsyncClient`` to use on the running loop, e.g. a shared pooled one."""
+
+    single_flight: Optional[SingleFlight] = None
+    """Coalesces identical concurrent requests into one backend call."""
+
+    concurrency_limiter: Optional[AdaptiveConcurrencyLimiter] = None
+    """Bounds concurrent backend calls; shared process-wide by the client registry."""
+
+    priority: Priority = Priority.NORMAL
+    """Scheduling class of this model's calls unless ``request_context`` overrides it."""
+
+    call_deadline: Optional[float] = None
+    """Seconds each backend call may take; a node ``deadline`` can only shorten it."""
+
+    hedger: Optional[Hedger] = None
+    """Sends a duplicate request when the first part is late; the loser is cancelled."""
+
+    hedge_client: Optional[Any] = None
+    """Client of a second backend for hedged requests; defaults to the primary one."""
+
+    hedge_async_client_factory: Optional[Callable[[], Any]] = None
+    """Async counterpart of ``hedge_client``."""
+
+    router: Optional[BackendRouter] = None
+    """Spreads calls over several Ollama hosts; replaces the single client when set."""
+
+    instrumentation: Optional[Instrumentation] = None
+    """Receives the time each call waited for a concurrency slot."""
+
+    max_tokens: Optional[int] = None
+    """Cap on generated tokens, sent as ``num_predict`` unless that is set explicitly.
+
+    Exposed so ``configurable_fields(max_tokens=ConfigurableField(id="max_tokens"))``
+    works the same way as for other chat models.
+    """
+
+    def _chat_params(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        params = super()._chat_params(messages, stop, **kwargs)
+        options = params.get("options")
+        if self.max_tokens is not None and isinstance(options, dict):
+            params["options"] = {"num_predict": self.max_tokens, **options}
+        return params
+
+    def _create_chat_stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> Iterator[Mapping[str, Any] | str]:
+        params = self._chat_params(messages, stop, **kwargs)
+        if self.response_cache is None and self.single_flight is None:
+            yield from self._send(params)
+            return
+        key = cache_key(params)
+        if self.response_cache is not None and (
+            cached := self.response_cache.lookup(key)
+        ) is not None:
+            yield from cached
+            return
+        if self.single_flight is None:
+            yield from self._fetch(key, params)
+        else:
+            yield from self.single_flight.stream(key, lambda: self._fetch(key, params))
+
+    async def _acreate_chat_stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[Mapping[str, Any] | str]:
+        params = self._chat_params(messages, stop, **kwargs)
+        if self.response_cache is None and self.single_flight is None:
+            async for part in self._asend(params):
+                yield part
+            return
+        key = cache_key(params)
+        if self.response_cache is not None and (
+            cached := await self.response_cache.alookup(key)
+        ) is not None:
+            for part in cached:
+                yield part
+            return
+        if self.single_flight is None:
+            parts = self._afetch(key, params)
+        else:
+            parts = self.single_flight.astream(key, lambda: self._afetch(key, params))
+        async for part in parts:
+            yield part
+
+    def _fetch(self, key: str, params: dict[str, Any]) -> Iterator[Mapping[str, Any]]:
+        if self.response_cache is None:
+            yield from self._send(params)
+            return
+        parts = []
+        for part in self._send(params):
+            parts.append(to_part(part))
+            yield part
+        # Only complete responses are stored; an abandoned stream never reaches here
+        self.response_cache.update(key, parts)
+
+    async def _afetch(self, key: str, params: dict[str, Any]) -> AsyncIterator[Mapping[str, Any]]:
+        if self.response_cache is None:
+            async for part in self._asend(params):
+                yield part
+            return
+        parts = []
+        async for part in self._asend(params):
+            parts.append(to_part(part))
+            yield part
+        await self.response_cache.aupdate(key, parts)
+
+    def _slot(self) -> ContextManager[Slot]:
+        if self.concurrency_limiter is None:
+            return nullcontext(Slot())
+        return self.concurrency_limiter.slot(current_priority(self.priority), current_tenant())
+
+    def _aslot(self) -> AsyncContextManager[Slot]:
+        if self.concurrency_limiter is None:
+            return nullcontext(Slot())
+        return self.concurrency_limiter.aslot(
+            current_priority(self.priority), current_tenant()
+        )
+
+    def _can_hedge(self) -> bool:
+        # A duplicate request only adds load when calls are already queueing
+        return self.concurrency_limiter is None or self.concurrency_limiter.queue_depth == 0
+
+    def _send(self, params: dict[str, Any]) -> Iterator[Mapping[str, Any]]:
+        at = current_deadline(self.call_deadline)
+        attempt = functools.partial(self._send_routed, params)
+        if self.hedger is None and at is None:
+            yield from attempt(0)
+            return
+        yield from (self.hedger or _DEADLINE_ONLY).stream(attempt, at, self._can_hedge)
+
+    def _send_routed(self, params: dict[str, Any], index: int) -> Iterator[Mapping[str, Any]]:
+        if self.router is None:
+            client = self.hedge_client if index and self.hedge_client else self._get_client()
+            yield from self._send_once(params, client)
+            return
+        # A hedge skips prefix affinity so it lands on the least loaded host instead
+        key = None if index else affinity_key(params)
+        attempts = len(self.router.backends)
+        for attempt in range(attempts):
+            started = False
+            try:
+                with self.router.lease(key) as backend:
+                    for part in self._send_once(params, backend.client()):
+                        started = True
+                        yield part
+                return
+            except (ConnectionError, httpx.ConnectError):
+                # The host is now marked unhealthy; fail over unless output already started
+                if started or attempt == attempts - 1:
+                    raise
+
+    def _queued(self, since: float) -> None:
+        if self.instrumentation is not None:
+            self.instrumentation.observe_queue(
+                time.perf_counter() - since, current_priority(self.priority).name.lower()
+            )
+
+    def _send_once(self, params: dict[str, Any], client: Any) -> Iterator[Mapping[str, Any]]:
+        since = time.perf_counter()
+        with self._slot() as slot:
+            self._queued(since)
+            if params["stream"]:
+                for part in client.chat(**params):
+                    slot.first_token()
+                    yield part
+            else:
+                part = client.chat(**params)
+                slot.first_token()
+                yield part
+
+    def _get_client(self) -> Any:
+        if self.client_factory is not None:
+            return self.client_factory()
+        return self._client
+
+    def _get_async_client(self, hedge: bool = False) -> Any:
+        if hedge and self.hedge_async_client_factory is not None:
+            return self.hedge_async_client_factory()
+        if self.async_client_factory is not None:
+            return self.async_client_factory()
+        return self._async_client
+
+    async def _asend(self, params: dict[str, Any]) -> AsyncIterator[Mapping[str, Any]]:
+        at = current_deadline(self.call_deadline)
+        attempt = functools.partial(self._asend_routed, params)
+        if self.hedger is None and at is None:
+            parts = attempt(0)
+        else:
+            parts = (self.hedger or _DEADLINE_ONLY).astream(attempt, at, self._can_hedge)
+        async for part in parts:
+            yield part
+
+    async def _asend_routed(
+        self, params: dict[str, Any], index: int
+    ) -> AsyncIterator[Mapping[str, Any]]:
+        if self.router is None:
+            async for part in self._asend_once(params, self._get_async_client(bool(index))):
+                yield part
+            return
+        key = None if index else affinity_key(params)
+        attempts = len(self.router.backends)
+        for attempt in range(attempts):
+            started = False
+            try:
+                async with self.router.alease(key) as backend:
+                    async for part in self._asend_once(params, backend.async_client()):
+                        started = True
+                        yield part
+                return
+            except (ConnectionError, httpx.ConnectError):
+                if started or attempt == attempts - 1:
+                    raise
+
+    async def _asend_once(
+        self, params: dict[str, Any], client: Any
+    ) -> AsyncIterator[Mapping[str, Any]]:
+        since = time.perf_counter()
+        async with self._aslot() as slot:
+            self._queued(since)
+            if params["stream"]:
+                async for part in await client.chat(**params):
+                    slot.first_token()
+                    yield part
+            else:
+                part = await client.chat(**params)
+                slot.first_token()
+                yield part
@@ -0,0 +1,298 @@
+"""Shared Ollama client registry: pooled HTTP sessions, model residency and warm-up."""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import Any, Callable, Optional
+
+import httpx
+from langchain_ollama.embeddings import OllamaEmbeddings
+from ollama import AsyncClient, Client
+from pydantic import BaseModel, Field
+
+from .cache import shared_response_cache
+from .cassette import Cassette, cassette_from_env
+from .chat import ManagedChatOllama
+from .coalesce import SingleFlight
+from .hedging import Hedger, sync_event_hooks
+from .instrumentation import get_instrumentation
+from .limiter import AdaptiveConcurrencyLimiter
+from .router import BackendRouter
+
+DEFAULT_MODEL = "llama3.1:latest"
+# Used first for label and yes/no outputs; see llm.cascade
+DEFAULT_SMALL_MODEL = "llama3.2:3b"
+DEFAULT_EMBEDDING_MODEL = "nomic-embed-text"
+# Seconds a model stays loaded after its last request; -1 keeps it resident
+DEFAULT_KEEP_ALIVE = 30 * 60
+
+
+class WarmupReport(BaseModel):
+    """First-token latency of a model before and after it was loaded."""
+
+    model: str = Field(..., description="Model that was warmed up")
+    was_resident: bool = Field(
+        ..., description="Whether the model was already loaded before the warm-up call"
+    )
+    cold_first_token_ms: float = Field(..., description="First-token latency of the first call")
+    warm_first_token_ms: float = Field(..., description="First-token latency once loaded")
+
+
+class PooledOllamaEmbeddings(OllamaEmbeddings):
+    """``OllamaEmbeddings`` whose async calls use the registry's client for the running loop.
+
+    ``OllamaEmbeddings`` builds one ``AsyncClient`` at construction, which
+    stays bound to the first event loop that uses it.
+    """
+
+    async_client_factory: Optional[Callable[[], Any]] = None
+    """Returns the ``AsyncClient`` to use on the running loop, e.g. a shared pooled one."""
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed search docs."""
+        if self.async_client_factory is None:
+            return await super().aembed_documents(texts)
+        response = await self.async_client_factory().embed(
+            self.model,
+            texts,
+            dimensions=self.dimensions,
+            options=self._default_params,
+            keep_alive=self.keep_alive,
+        )
+        return response["embeddings"]
+
+
+class ClientRegistry:
+    """Hands out chat and embedding models that share one HTTP connection pool.
+
+    ``ChatOllama`` and ``OllamaEmbeddings`` each open their own ``httpx``
+    client, so every module paid its own connection setup. Models built here
+    share a single keep-alive pooled ``Client``, plus one ``AsyncClient`` per
+    event loop (``httpx`` async connections cannot cross loops), and request
+    the same ``keep_alive`` so Ollama keeps the model resident between calls.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        keep_alive: int = DEFAULT_KEEP_ALIVE,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        keepalive_expiry: float = 60.0,
+        timeout: Optional[float] = None,
+        hedging: bool = False,
+        hedge_host: Optional[str] = None,
+        hosts: Optional[list[str]] = None,
+        cassette: Optional[Cassette] = None,
+        coalesce: bool = True,
+    ):
+        """Initialize the registry for one Ollama host.
+
+        With ``hedging`` (implied by ``hedge_host``), chat models send a
+        duplicate request when the first part is late, to ``hedge_host`` if
+        given or to the same host otherwise. With several ``hosts``, chat calls
+        are spread over them by a ``BackendRouter``; ``host`` then defaults to
+        the first one for embeddings and warm-up. With a ``cassette`` every
+        client records its traffic to it or replays from it. With
+        ``coalesce=False`` identical concurrent chat calls are not merged.
+        """
+        self.host = host or (hosts[0] if hosts else os.environ.get("OLLAMA_HOST"))
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.cassette = cassette
+        self.warmups: dict[str, WarmupReport] = {}
+        # Identical concurrent requests from any model built here share one call
+        self.single_flight = SingleFlight() if coalesce else None
+        # Backend calls from every model built here share one adaptive limit
+        self.concurrency_limiter = AdaptiveConcurrencyLimiter()
+        self.router = (
+            BackendRouter(
+                hosts,
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                timeout=timeout,
+                cassette=cassette,
+            )
+            if hosts and len(hosts) > 1
+            else None
+        )
+        self.hedger = Hedger() if hedging or hedge_host else None
+        self.hedge_registry = (
+            ClientRegistry(hedge_host, keep_alive, timeout=timeout, cassette=cassette)
+            if hedge_host
+            else None
+        )
+        self._lock = threading.Lock()
+        self._client: Optional[Client] = None
+        self._async_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, AsyncClient
+        ] = weakref.WeakKeyDictionary()
+
+    def _transport(self, asynchronous: bool = False) -> dict[str, Any]:
+        if self.cassette is None:
+            return {"limits": self.limits}
+        if asynchronous:
+            return {"transport": self.cassette.async_transport(self.limits)}
+        return {"transport": self.cassette.transport(self.limits)}
+
+    def client(self) -> Client:
+        """The shared synchronous client."""
+        with self._lock:
+            if self._client is None:
+                self._client = Client(
+                    self.host,
+                    timeout=self.timeout,
+                    event_hooks=sync_event_hooks(),
+                    **self._transport(),
+                )
+            return self._client
+
+    def async_client(self) -> AsyncClient:
+        """The shared asynchronous client of the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if (client := self._async_clients.get(loop)) is None:
+                client = AsyncClient(
+                    self.host, timeout=self.timeout, **self._transport(asynchronous=True)
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def chat_model(
+        self, model: str = DEFAULT_MODEL, temperature: float = 0.2, **kwargs: Any
+    ) -> ManagedChatOllama:
+        """A chat model bound to the shared clients."""
+        kwargs.setdefault("response_cache", shared_response_cache())
+        kwargs.setdefault("keep_alive", self.keep_alive)
+        kwargs.setdefault("single_flight", self.single_flight)
+        kwargs.setdefault("concurrency_limiter", self.concurrency_limiter)
+        kwargs.setdefault("hedger", self.hedger)
+        kwargs.setdefault("router", self.router)
+        kwargs.setdefault("instrumentation", get_instrumentation())
+        if self.hedge_registry is not None:
+            kwargs.setdefault("hedge_client", self.hedge_registry.client())
+            kwargs.setdefault("hedge_async_client_factory", self.hedge_registry.async_client)
+        if self.host:
+            kwargs.setdefault("base_url", self.host)
+        return ManagedChatOllama(
+            model=model,
+            temperature=temperature,
+            client_factory=self.client,
+            async_client_factory=self.async_client,
+            **kwargs,
+        )
+
+    def embeddings(self, model: str = DEFAULT_EMBEDDING_MODEL, **kwargs: Any) -> OllamaEmbeddings:
+        """An embedding model bound to the shared synchronous and per-loop async clients."""
+        kwargs.setdefault("keep_alive", self.keep_alive)
+        kwargs.setdefault("async_client_factory", self.async_client)
+        if self.host:
+            kwargs.setdefault("base_url", self.host)
+        embeddings = PooledOllamaEmbeddings(model=model, **kwargs)
+        embeddings._client = self.client()
+        return embeddings
+
+    def llama_index_llm(self, model: str, **kwargs: Any) -> Any:
+        """A llama-index ``Ollama`` LLM bound to the shared synchronous client."""
+        from llama_index.llms.ollama import Ollama
+
+        kwargs.setdefault("keep_alive", f"{self.keep_alive}s")
+        if self.host:
+            kwargs.setdefault("base_url", self.host)
+        llm = Ollama(model=model, **kwargs)
+        llm._client = self.client()
+        return llm
+
+    def _first_token_ms(self, model: str) -> float:
+        started = time.perf_counter()
+        stream = self.client().chat(
+            model=model,
+            messages=[{"role": "user", "content": "hi"}],
+            stream=True,
+            options={"num_predict": 1},
+            keep_alive=self.keep_alive,
+        )
+        next(iter(stream))
+        elapsed = (time.perf_counter() - started) * 1000
+        # Drain the rest so the pooled connection can be reused
+        for _ in stream:
+            pass
+        return elapsed
+
+    def warm_up(self, model: str = DEFAULT_MODEL, force_cold: bool = False) -> WarmupReport:
+        """Load the model and measure its cold and warm first-token latency.
+
+        Runs once per model per process. With ``force_cold`` the model is
+        unloaded first, so the cold figure includes the load time even when
+        another process had already loaded it.
+        """
+        if model in self.warmups and not force_cold:
+            return self.warmups[model]
+        client = self.client()
+        resident = any(m.model == model for m in client.ps().models)
+        if force_cold and resident:
+            client.generate(model=model, prompt="", keep_alive=0)
+            resident = False
+        report = WarmupReport(
+            model=model,
+            was_resident=resident,
+            cold_first_token_ms=self._first_token_ms(model),
+            warm_first_token_ms=self._first_token_ms(model),
+        )
+        self.warmups[model] = report
+        return report
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ClientRegistry:
+    """Process-wide registry configured from the environment.
+
+    ``$AI_STUDY_KEEP_ALIVE`` overrides the residency in seconds.
+    ``$AI_STUDY_HEDGE`` enables hedging: ``1`` hedges on the same host, a
+    URL hedges to that second backend. ``$AI_STUDY_OLLAMA_HOSTS`` is a
+    comma-separated list of hosts to route chat calls over.
+    ``$AI_STUDY_CASSETTE`` records or replays all traffic, see ``cassette_from_env``.
+    ``$AI_STUDY_COALESCE=0`` stops merging identical concurrent chat calls.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            keep_alive = int(os.environ.get("AI_STUDY_KEEP_ALIVE", DEFAULT_KEEP_ALIVE))
+            hedge = os.environ.get("AI_STUDY_HEDGE", "")
+            hosts = os.environ.get("AI_STUDY_OLLAMA_HOSTS", "")
+            _registry = ClientRegistry(
+                keep_alive=keep_alive,
+                hosts=[h.strip() for h in hosts.split(",") if h.strip()] or None,
+                hedging=bool(hedge),
+                hedge_host=hedge if "://" in hedge else None,
+                cassette=cassette_from_env(),
+                coalesce=os.environ.get("AI_STUDY_COALESCE", "1") != "0",
+            )
+        return _registry
+
+
+def get_chat_model(
+    model: str = DEFAULT_MODEL, temperature: float = 0.2, **kwargs: Any
+) -> ManagedChatOllama:
+    """Chat model from the process-wide registry."""
+    return get_registry().chat_model(model, temperature, **kwargs)
+
+
+def get_embeddings(model: str = DEFAULT_EMBEDDING_MODEL, **kwargs: Any) -> OllamaEmbeddings:
+    """Embedding model from the process-wide registry."""
+    return get_registry().embeddings(model, **kwargs)
+
+
+def warm_up(model: str = DEFAULT_MODEL, force_cold: bool = False) -> WarmupReport:
+    """Warm up a model through the process-wide registry."""
+    return get_registry().warm_up(model, force_cold)
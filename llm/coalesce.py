@@ -0,0 +1,187 @@
+"""Single-flight coalescing of identical in-flight chat calls."""
+
+import asyncio
+import contextvars
+import threading
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+from pydantic import BaseModel, Field
+
+
+class CoalesceStats(BaseModel):
+    """Counters for request coalescing."""
+
+    flights: int = Field(default=0, description="Backend calls actually made")
+    collapsed: int = Field(
+        default=0, description="Calls that joined an identical in-flight call instead"
+    )
+    abandoned: int = Field(
+        default=0, description="Backend calls stopped because every subscriber left"
+    )
+
+    @property
+    def collapse_rate(self) -> float:
+        """Fraction of calls served by another call's backend request."""
+        total = self.flights + self.collapsed
+        return self.collapsed / total if total else 0.0
+
+
+class _Flight:
+    """Buffered parts of one backend call, shared by all of its subscribers."""
+
+    def __init__(self):
+        self.parts: list[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+
+
+class _SyncFlight(_Flight):
+    def __init__(self):
+        super().__init__()
+        self.condition = threading.Condition()
+
+
+class _AsyncFlight(_Flight):
+    def __init__(self):
+        super().__init__()
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        # Wake current waiters and re-arm for the next part
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class SingleFlight:
+    """Shares one backend call among concurrent callers with the same key.
+
+    The first caller for a key starts the backend call; callers arriving
+    while it runs subscribe to the same part stream instead. Parts are
+    buffered for the lifetime of the call, so late subscribers replay from
+    the first part and every subscriber sees an identical stream. The call
+    runs in its own thread (sync) or task (async), so a subscriber leaving
+    early does not cut off the others; once all subscribers have left, the
+    backend call is abandoned. Finished calls are forgotten immediately:
+    reuse across time is the response cache's job.
+    """
+
+    def __init__(self):
+        """Initialize an empty flight table."""
+        self.stats = CoalesceStats()
+        self._lock = threading.Lock()
+        self._flights: dict[str, _SyncFlight] = {}
+        self._aflights: dict[tuple[int, str], _AsyncFlight] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Backend calls currently running."""
+        return len(self._flights) + len(self._aflights)
+
+    def _join(self, table: dict, key: Any, factory: Callable[[], _Flight]) -> tuple[Any, bool]:
+        with self._lock:
+            flight = table.get(key)
+            leader = flight is None
+            if leader:
+                flight = table[key] = factory()
+                self.stats.flights += 1
+            else:
+                self.stats.collapsed += 1
+            flight.subscribers += 1
+            return flight, leader
+
+    def _finish(self, table: dict, key: Any, flight: _Flight) -> None:
+        with self._lock:
+            if table.get(key) is flight:
+                del table[key]
+
+    def stream(self, key: str, fetch: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """Yield the parts of ``fetch()``, sharing it with concurrent callers of ``key``."""
+        flight, leader = self._join(self._flights, key, _SyncFlight)
+        if leader:
+            # Run in the caller's context so priority and tenant tags carry over
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._produce, key, flight, fetch), daemon=True
+            ).start()
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    flight.condition.wait_for(lambda: index < len(flight.parts) or flight.done)
+                    if index < len(flight.parts):
+                        part = flight.parts[index]
+                    elif flight.error is not None:
+                        raise flight.error
+                    else:
+                        return
+                index += 1
+                yield part
+        finally:
+            with flight.condition:
+                flight.subscribers -= 1
+
+    def _produce(self, key: str, flight: _SyncFlight, fetch: Callable[[], Iterator[Any]]) -> None:
+        parts = fetch()
+        try:
+            for part in parts:
+                with flight.condition:
+                    if flight.subscribers == 0:
+                        self.stats.abandoned += 1
+                        break
+                    flight.parts.append(part)
+                    flight.condition.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            # Closing an abandoned generator skips whatever follows it, e.g. caching
+            if hasattr(parts, "close"):
+                parts.close()
+            self._finish(self._flights, key, flight)
+            with flight.condition:
+                flight.done = True
+                flight.condition.notify_all()
+
+    async def astream(
+        self, key: str, fetch: Callable[[], AsyncIterator[Any]]
+    ) -> AsyncIterator[Any]:
+        """Asynchronously yield the parts of ``fetch()``, shared per event loop."""
+        table_key = (id(asyncio.get_running_loop()), key)
+        flight, leader = self._join(self._aflights, table_key, _AsyncFlight)
+        if leader:
+            flight.task = asyncio.create_task(self._aproduce(table_key, flight, fetch))
+        index = 0
+        try:
+            while True:
+                if index < len(flight.parts):
+                    index += 1
+                    yield flight.parts[index - 1]
+                elif flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                else:
+                    await flight.changed.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done and flight.task is not None:
+                flight.task.cancel()
+
+    async def _aproduce(
+        self, key: tuple[int, str], flight: _AsyncFlight, fetch: Callable[[], AsyncIterator[Any]]
+    ) -> None:
+        parts = fetch()
+        try:
+            async for part in parts:
+                flight.parts.append(part)
+                flight.notify()
+        except asyncio.CancelledError:
+            self.stats.abandoned += 1
+        except Exception as e:
+            flight.error = e
+        finally:
+            await parts.aclose()
+            self._finish(self._aflights, key, flight)
+            flight.done = True
+            flight.notify()
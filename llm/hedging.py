@@ -0,0 +1,416 @@
+"""Per-call deadlines and hedged requests for tail-latency control."""
+
+import asyncio
+import functools
+import inspect
+import queue
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+
+import httpx
+import numpy as np
+from pydantic import BaseModel, Field
+
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """An LLM call did not finish before its deadline."""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Give every LLM call inside the block until ``seconds`` from now to finish.
+
+    Nested deadlines never extend an outer one.
+    """
+    if seconds is None:
+        yield
+        return
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(at if outer is None else min(outer, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline(default_seconds: Optional[float] = None) -> Optional[float]:
+    """Absolute ``time.monotonic()`` deadline for a call starting now, if any."""
+    at = _deadline.get()
+    if default_seconds is not None:
+        own = time.monotonic() + default_seconds
+        at = own if at is None else min(at, own)
+    return at
+
+
+class _Attempt:
+    """One synchronous attempt running on its own thread.
+
+    A thread blocked in a read cannot be interrupted, so whatever the
+    attempt holds (a limiter slot, a router lease, its HTTP response) is
+    registered here and released by ``abandon`` from the hedger's thread.
+    An attempt that ran to its end (``finish``) has released everything
+    itself, and abandoning it afterwards does nothing.
+    """
+
+    def __init__(self):
+        self.abandoned = threading.Event()
+        self._finished = False
+        self._lock = threading.Lock()
+        self._cleanups: list[Callable[[], None]] = []
+
+    def on_abandon(self, cleanup: Callable[[], None]) -> None:
+        with self._lock:
+            if not self.abandoned.is_set():
+                self._cleanups.append(cleanup)
+                return
+        cleanup()
+
+    def finish(self) -> None:
+        with self._lock:
+            self._finished = True
+            self._cleanups = []
+
+    def abandon(self) -> None:
+        with self._lock:
+            if self._finished or self.abandoned.is_set():
+                return
+            self.abandoned.set()
+            cleanups, self._cleanups = self._cleanups, []
+        for cleanup in cleanups:
+            try:
+                cleanup()
+            except Exception:
+                # Releasing one resource must not keep the others held
+                pass
+
+
+_attempt: ContextVar[Optional[_Attempt]] = ContextVar("llm_attempt", default=None)
+
+
+def release_on_abandon(release: Callable[[], None]) -> Callable[[], None]:
+    """Make ``release`` idempotent and run it early if the current attempt is abandoned.
+
+    Outside a hedged or deadline-bound synchronous attempt it is only made
+    idempotent. Call the returned function where ``release`` would be called.
+    """
+    lock = threading.Lock()
+    released = False
+
+    def once() -> None:
+        nonlocal released
+        with lock:
+            if released:
+                return
+            released = True
+        release()
+
+    if (attempt := _attempt.get()) is not None:
+        attempt.on_abandon(once)
+    return once
+
+
+def _bound_by_deadline(request: httpx.Request) -> None:
+    at = _deadline.get()
+    if at is None:
+        return
+    remaining = max(at - time.monotonic(), 0.001)
+    timeout = dict(request.extensions.get("timeout") or {})
+    for name in ("connect", "read", "write", "pool"):
+        current = timeout.get(name)
+        timeout[name] = remaining if current is None else min(current, remaining)
+    request.extensions["timeout"] = timeout
+
+
+def _close_on_abandon(response: httpx.Response) -> None:
+    if (attempt := _attempt.get()) is None:
+        return
+
+    def close() -> None:
+        # A finished response's connection is back in the pool, maybe serving another request
+        if response.is_closed:
+            return
+        # Closing alone does not wake a thread blocked reading the socket; shutting it down does
+        stream = response.extensions.get("network_stream")
+        sock = stream.get_extra_info("socket") if stream is not None else None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        response.close()
+
+    attempt.on_abandon(close)
+
+
+def sync_event_hooks() -> dict[str, list[Callable]]:
+    """``httpx.Client`` event hooks that let deadlines and hedging stop a sync call.
+
+    Every request gets at most the remaining deadline as its timeouts, and
+    the response of an attempt is closed as soon as the attempt is abandoned.
+    """
+    return {"request": [_bound_by_deadline], "response": [_close_on_abandon]}
+
+
+def with_deadline(seconds: Optional[float]) -> Callable[[Callable], Callable]:
+    """Decorate a graph node (sync or async) so its LLM calls share one deadline."""
+
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with deadline(seconds):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with deadline(seconds):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class HedgeStats(BaseModel):
+    """Counters for hedged requests and deadlines."""
+
+    calls: int = Field(default=0, description="Calls that went through the hedger")
+    hedged: int = Field(default=0, description="Calls for which a duplicate request was sent")
+    hedge_wins: int = Field(
+        default=0, description="Hedged calls where the duplicate answered first"
+    )
+    deadline_exceeded: int = Field(default=0, description="Calls aborted at their deadline")
+
+    @property
+    def hedge_rate(self) -> float:
+        """Fraction of calls that fired a hedge."""
+        return self.hedged / self.calls if self.calls else 0.0
+
+    @property
+    def win_rate(self) -> float:
+        """Fraction of fired hedges that beat the original request."""
+        return self.hedge_wins / self.hedged if self.hedged else 0.0
+
+
+class Hedger:
+    """Races a backup request against a slow one and enforces call deadlines.
+
+    The race is decided by the first response part: when the original has
+    produced nothing after the ``percentile`` of recent times to first part,
+    a duplicate is sent (``attempt(1)``, which may target a second backend),
+    the first attempt to respond wins and the other is cancelled. Until
+    ``min_samples`` calls have been observed the delay is ``initial_delay``.
+    Hedges are skipped while ``can_hedge`` says the backend is saturated,
+    since a duplicate would only add load. With ``enabled=False`` only the
+    deadline is enforced.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95,
+        initial_delay: float = 5.0,
+        min_delay: float = 0.2,
+        max_delay: float = 30.0,
+        min_samples: int = 20,
+        window: int = 200,
+        enabled: bool = True,
+    ):
+        """Initialize the hedger with its delay percentile and bounds."""
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.enabled = enabled
+        self.stats = HedgeStats()
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        """Seconds without a first part after which a hedge is sent."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return self.initial_delay
+            value = float(np.percentile(np.fromiter(self._samples, dtype=float), self.percentile))
+        return min(max(value, self.min_delay), self.max_delay)
+
+    def _record(self, winner: int, first_part_after: float) -> None:
+        with self._lock:
+            self.stats.calls += 1
+            if winner > 0:
+                self.stats.hedge_wins += 1
+            self._samples.append(first_part_after)
+
+    def _expire(self) -> DeadlineExceeded:
+        with self._lock:
+            self.stats.deadline_exceeded += 1
+        return DeadlineExceeded("LLM call exceeded its deadline")
+
+    def _hedge_fired(self) -> None:
+        with self._lock:
+            self.stats.hedged += 1
+
+    def _timeout(self, deadline: Optional[float], hedge_at: Optional[float]) -> Optional[float]:
+        ends = [t for t in (deadline, hedge_at) if t is not None]
+        return max(min(ends) - time.monotonic(), 0.0) if ends else None
+
+    def stream(
+        self,
+        attempt: Callable[[int], Iterator[Any]],
+        deadline: Optional[float] = None,
+        can_hedge: Callable[[], bool] = lambda: True,
+    ) -> Iterator[Any]:
+        """Yield the parts of the winning attempt, raising ``DeadlineExceeded`` on expiry.
+
+        Losers and attempts cut off by the deadline are abandoned: their
+        slot, lease and response are released at once, see ``_Attempt``.
+        """
+        events: queue.Queue = queue.Queue()
+        attempts: list[_Attempt] = []
+
+        def run(index: int, current: _Attempt) -> None:
+            _attempt.set(current)
+            if deadline is not None:
+                # Includes the model's own call deadline, for sync_event_hooks
+                _deadline.set(deadline)
+            parts = attempt(index)
+            try:
+                for part in parts:
+                    if current.abandoned.is_set():
+                        break
+                    events.put((index, "part", part))
+                else:
+                    # The response was read to its end and the slot and lease released
+                    current.finish()
+                events.put((index, "done", None))
+            except BaseException as e:
+                current.finish()
+                events.put((index, "error", e))
+            finally:
+                parts.close()
+
+        def start(index: int) -> None:
+            current = _Attempt()
+            attempts.append(current)
+            # Carry priority, tenant and deadline tags into the attempt thread
+            threading.Thread(
+                target=copy_context().run, args=(run, index, current), daemon=True
+            ).start()
+
+        started = time.monotonic()
+        hedge_at = started + self.delay() if self.enabled else None
+        winner: Optional[int] = None
+        running = 1
+        start(0)
+        try:
+            while True:
+                try:
+                    index, kind, payload = events.get(timeout=self._timeout(deadline, hedge_at))
+                except queue.Empty:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise self._expire() from None
+                    hedge_at = None
+                    if can_hedge():
+                        self._hedge_fired()
+                        running += 1
+                        start(1)
+                    continue
+                if kind == "error" and deadline is not None and time.monotonic() >= deadline:
+                    # The attempt's own timeouts come from the deadline, see sync_event_hooks
+                    raise self._expire() from payload
+                if winner is None:
+                    if kind == "error":
+                        running -= 1
+                        if running:
+                            continue
+                        raise payload
+                    winner = index
+                    hedge_at = None
+                    self._record(winner, time.monotonic() - started)
+                    for i, loser in enumerate(attempts):
+                        if i != winner:
+                            loser.abandon()
+                if index != winner:
+                    continue
+                if kind == "part":
+                    yield payload
+                elif kind == "done":
+                    return
+                else:
+                    raise payload
+        finally:
+            for current in attempts:
+                current.abandon()
+
+    async def astream(
+        self,
+        attempt: Callable[[int], AsyncIterator[Any]],
+        deadline: Optional[float] = None,
+        can_hedge: Callable[[], bool] = lambda: True,
+    ) -> AsyncIterator[Any]:
+        """Asynchronously yield the parts of the winning attempt; losers are cancelled."""
+        events: asyncio.Queue = asyncio.Queue()
+        tasks: list[asyncio.Task] = []
+
+        async def run(index: int) -> None:
+            try:
+                async for part in attempt(index):
+                    await events.put((index, "part", part))
+                await events.put((index, "done", None))
+            except Exception as e:
+                await events.put((index, "error", e))
+
+        started = time.monotonic()
+        hedge_at = started + self.delay() if self.enabled else None
+        winner: Optional[int] = None
+        running = 1
+        tasks.append(asyncio.create_task(run(0)))
+        try:
+            while True:
+                try:
+                    index, kind, payload = await asyncio.wait_for(
+                        events.get(), self._timeout(deadline, hedge_at)
+                    )
+                except asyncio.TimeoutError:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise self._expire() from None
+                    hedge_at = None
+                    if can_hedge():
+                        self._hedge_fired()
+                        running += 1
+                        tasks.append(asyncio.create_task(run(1)))
+                    continue
+                if winner is None:
+                    if kind == "error":
+                        running -= 1
+                        if running:
+                            continue
+                        raise payload
+                    winner = index
+                    hedge_at = None
+                    self._record(winner, time.monotonic() - started)
+                    for i, task in enumerate(tasks):
+                        if i != winner:
+                            task.cancel()
+                if index != winner:
+                    continue
+                if kind == "part":
+                    yield payload
+                elif kind == "done":
+                    return
+                else:
+                    raise payload
+        finally:
+            for task in tasks:
+                task.cancel()
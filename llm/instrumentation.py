@@ -0,0 +1,351 @@
+"""Per-node and per-LLM-call latency, token and TTFT metrics with Prometheus export."""
+
+import atexit
+import bisect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Iterable, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables.config import var_child_runnable_config
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (1, 4, 16, 64, 256, 1024, 4096, 16384)
+RATE_BUCKETS = (1, 2.5, 5, 10, 20, 40, 80, 160, 320)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Iterable[tuple[str, str]]) -> str:
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return f"{{{body}}}" if body else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed label set."""
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]
+    ):
+        """Initialize an empty histogram."""
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., +Inf count, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Record one observation."""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def expose(self) -> Iterable[str]:
+        """Sample lines of this histogram in the text exposition format."""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labelvalues, series in sorted(snapshot.items()):
+            pairs = list(zip(self.labelnames, labelvalues))
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, float("inf")), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket{_format_labels([*pairs, ('le', le)])} {int(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(pairs)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(pairs)} {int(cumulative)}"
+
+
+class MetricsRegistry:
+    """A set of histograms rendered together."""
+
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._metrics: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        """Register a histogram, or return the one already registered under ``name``."""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, documentation, labelnames, buckets)
+            return self._metrics[name]
+
+    def render(self, openmetrics: bool = False) -> str:
+        """All metrics in the Prometheus text format, or OpenMetrics with ``openmetrics``."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = [line for metric in metrics for line in metric.expose()]
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write an OpenMetrics snapshot to ``path`` atomically."""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render(openmetrics=True))
+        os.replace(tmp, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve ``/metrics`` on a background thread; OpenMetrics when the scraper asks for it."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = registry.render(openmetrics).encode("utf-8")
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type",
+                    OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE,
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def current_node() -> str:
+    """LangGraph node the current call runs in, or ``""`` outside a graph."""
+    config = var_child_runnable_config.get()
+    if not config:
+        return ""
+    return str((config.get("metadata") or {}).get("langgraph_node", ""))
+
+
+class Instrumentation:
+    """Latency, queue time, TTFT and token histograms for graphs and LLM calls.
+
+    Node and LLM timings come from ``handler``, a callback handler to pass in
+    the ``callbacks`` of a graph's config; queue time comes from the chat
+    models, which report how long each call waited for a concurrency slot.
+    Observations are a dict update and a bisect, cheap enough to leave on.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        """Register the histograms in ``registry`` (a new one by default)."""
+        self.registry = registry or MetricsRegistry()
+        self.node_seconds = self.registry.histogram(
+            "ai_study_node_duration_seconds",
+            "Wall time of a LangGraph node",
+            ("node", "status"),
+        )
+        self.llm_seconds = self.registry.histogram(
+            "ai_study_llm_duration_seconds",
+            "Wall time of an LLM call, including queueing",
+            ("node", "model", "status"),
+        )
+        self.queue_seconds = self.registry.histogram(
+            "ai_study_llm_queue_seconds",
+            "Time an LLM call waited for a concurrency slot",
+            ("node", "priority"),
+        )
+        self.ttft_seconds = self.registry.histogram(
+            "ai_study_llm_time_to_first_token_seconds",
+            "Time from the start of an LLM call to its first token",
+            ("node", "model"),
+        )
+        self.prompt_tokens = self.registry.histogram(
+            "ai_study_llm_prompt_tokens",
+            "Prompt tokens of an LLM call",
+            ("node", "model"),
+            TOKEN_BUCKETS,
+        )
+        self.completion_tokens = self.registry.histogram(
+            "ai_study_llm_completion_tokens",
+            "Completion tokens of an LLM call",
+            ("node", "model"),
+            TOKEN_BUCKETS,
+        )
+        self.tokens_per_second = self.registry.histogram(
+            "ai_study_llm_tokens_per_second",
+            "Generation speed of an LLM call",
+            ("node", "model"),
+            RATE_BUCKETS,
+        )
+        self.handler = InstrumentationHandler(self)
+
+    def observe_queue(self, seconds: float, priority: str) -> None:
+        """Record how long a call waited for a concurrency slot."""
+        self.queue_seconds.observe(seconds, current_node(), priority)
+
+    def render(self, openmetrics: bool = False) -> str:
+        """All metrics in the Prometheus text format, or OpenMetrics."""
+        return self.registry.render(openmetrics)
+
+
+class _LLMRun:
+    __slots__ = ("node", "model", "started", "first_token")
+
+    def __init__(self, node: str, model: str):
+        self.node = node
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token: Optional[float] = None
+
+
+class InstrumentationHandler(BaseCallbackHandler):
+    """Callback handler feeding an ``Instrumentation``.
+
+    A node run is a chain run whose name equals its ``langgraph_node``
+    metadata; every chat model run is an LLM call, labelled with the node it
+    ran in. Runs inline so async graphs do not pay for an executor hop.
+    """
+
+    run_inline = True
+
+    def __init__(self, instrumentation: Instrumentation):
+        """Initialize the handler for ``instrumentation``."""
+        self.instrumentation = instrumentation
+        self._nodes: dict[UUID, tuple[str, float]] = {}
+        self._llms: dict[UUID, _LLMRun] = {}
+
+    def on_chain_start(
+        self,
+        serialized: Optional[dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if node is not None and kwargs.get("name") == node:
+            self._nodes[run_id] = (node, time.perf_counter())
+
+    def _end_node(self, run_id: UUID, status: str) -> None:
+        started = self._nodes.pop(run_id, None)
+        if started is not None:
+            node, at = started
+            self.instrumentation.node_seconds.observe(time.perf_counter() - at, node, status)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_node(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        # LangGraph signals interrupts and control flow with exceptions too
+        self._end_node(run_id, "error")
+
+    def _start_llm(self, run_id: UUID, metadata: Optional[dict[str, Any]]) -> None:
+        metadata = metadata or {}
+        self._llms[run_id] = _LLMRun(
+            str(metadata.get("langgraph_node", "")), str(metadata.get("ls_model_name", ""))
+        )
+
+    def on_chat_model_start(
+        self,
+        serialized: Optional[dict[str, Any]],
+        messages: Any,
+        *,
+        run_id: UUID,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, metadata)
+
+    def on_llm_start(
+        self,
+        serialized: Optional[dict[str, Any]],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start_llm(run_id, metadata)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._llms.get(run_id)
+        if run is not None and run.first_token is None:
+            run.first_token = time.perf_counter()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._llms.pop(run_id, None)
+        if run is None:
+            return
+        ended = time.perf_counter()
+        metrics = self.instrumentation
+        labels = (run.node, run.model)
+        metrics.llm_seconds.observe(ended - run.started, *labels, "ok")
+        if run.first_token is not None:
+            metrics.ttft_seconds.observe(run.first_token - run.started, *labels)
+        generation = response.generations[0][0] if response.generations else None
+        info = (generation.generation_info if generation is not None else None) or {}
+        prompt = info.get("prompt_eval_count")
+        completion = info.get("eval_count")
+        if prompt is None and generation is not None:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt, completion = usage.get("input_tokens"), usage.get("output_tokens")
+        if prompt is not None:
+            metrics.prompt_tokens.observe(prompt, *labels)
+        if completion is not None:
+            metrics.completion_tokens.observe(completion, *labels)
+            # Ollama reports the pure generation time; fall back to time after the first token
+            duration = (info.get("eval_duration") or 0) / 1e9 or (
+                ended - run.first_token if run.first_token is not None else 0.0
+            )
+            if duration > 0:
+                metrics.tokens_per_second.observe(completion / duration, *labels)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self._llms.pop(run_id, None)
+        if run is not None:
+            self.instrumentation.llm_seconds.observe(
+                time.perf_counter() - run.started, run.node, run.model, "error"
+            )
+
+
+_instrumentation: Optional[Instrumentation] = None
+_instrumentation_lock = threading.Lock()
+
+
+def get_instrumentation() -> Instrumentation:
+    """Process-wide instrumentation, exported as configured by the environment.
+
+    ``$AI_STUDY_METRICS_PORT`` serves ``/metrics`` on that port and
+    ``$AI_STUDY_METRICS_FILE`` writes an OpenMetrics snapshot there at exit.
+    """
+    global _instrumentation
+    with _instrumentation_lock:
+        if _instrumentation is None:
+            _instrumentation = Instrumentation()
+            if port := os.environ.get("AI_STUDY_METRICS_PORT"):
+                _instrumentation.registry.serve(int(port))
+            if path := os.environ.get("AI_STUDY_METRICS_FILE"):
+                atexit.register(_instrumentation.registry.write, path)
+        return _instrumentation
@@ -0,0 +1,235 @@
+"""AIMD adaptive concurrency limit for Ollama backend calls."""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
+
+from pydantic import BaseModel, Field
+
+from .hedging import release_on_abandon
+from .scheduler import DEFAULT_TENANT, FairQueue, Priority
+
+
+class LimiterMetrics(BaseModel):
+    """Point-in-time view of an adaptive concurrency limiter."""
+
+    limit: float = Field(..., description="Current in-flight limit")
+    in_flight: int = Field(..., description="Backend calls currently running")
+    queue_depth: int = Field(..., description="Callers waiting for a slot")
+    queue_depth_by_priority: dict[str, int] = Field(
+        default_factory=dict, description="Callers waiting per priority class"
+    )
+    increases: int = Field(default=0, description="Additive increases so far")
+    decreases: int = Field(default=0, description="Multiplicative decreases so far")
+    errors: int = Field(default=0, description="Calls that failed")
+
+
+class Slot:
+    """One acquired call slot; records when the first response part arrived."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latency: Optional[float] = None
+
+    def first_token(self) -> None:
+        """Mark the arrival of the first response part."""
+        if self.latency is None:
+            self.latency = time.perf_counter() - self.started
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limits concurrent backend calls with additive-increase/multiplicative-decrease.
+
+    The latency signal is time to first response part, which grows with
+    queueing inside Ollama but not with answer length. The limit shrinks by
+    ``backoff`` on an error or when that latency exceeds ``tolerance`` times
+    the observed baseline, at most once per ``cooldown`` seconds, and grows
+    by about one per round trip while calls complete fast and the limit is
+    actually in use. Sync callers block their thread and async callers await
+    a future, in one shared ``FairQueue``, so threads from ``batch`` and
+    coroutines from ``abatch`` compete for the same slots, and a freed slot
+    goes to the highest-priority class first and fairly across tenants.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 32,
+        tolerance: float = 2.0,
+        backoff: float = 0.7,
+        cooldown: float = 1.0,
+        baseline_drift: float = 0.01,
+        tenant_weights: Optional[dict[str, float]] = None,
+    ):
+        """Initialize the limiter with its bounds and AIMD parameters."""
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.cooldown = cooldown
+        # How fast the baseline creeps up towards slower samples
+        self.baseline_drift = baseline_drift
+        self.baseline: Optional[float] = None
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiters = FairQueue(tenant_weights)
+        self._lock = threading.Lock()
+        self._last_decrease = 0.0
+        self._increases = 0
+        self._decreases = 0
+        self._errors = 0
+
+    @property
+    def limit(self) -> float:
+        """Current in-flight limit."""
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        """Backend calls currently running."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Callers waiting for a slot."""
+        return len(self._waiters)
+
+    def metrics(self) -> LimiterMetrics:
+        """Current limit, in-flight count, queue depth and adjustment counters."""
+        with self._lock:
+            return LimiterMetrics(
+                limit=self._limit,
+                in_flight=self._in_flight,
+                queue_depth=len(self._waiters),
+                queue_depth_by_priority=self._waiters.depth(),
+                increases=self._increases,
+                decreases=self._decreases,
+                errors=self._errors,
+            )
+
+    def _has_capacity(self) -> bool:
+        return self._in_flight < max(int(self._limit), 1)
+
+    def acquire(
+        self, priority: Priority = Priority.NORMAL, tenant: str = DEFAULT_TENANT
+    ) -> None:
+        """Block the calling thread until a slot is free."""
+        with self._lock:
+            if not self._waiters and self._has_capacity():
+                self._in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.push(event, priority, tenant)
+        # The releasing side counts the slot as ours before setting the event
+        event.wait()
+
+    async def aacquire(
+        self, priority: Priority = Priority.NORMAL, tenant: str = DEFAULT_TENANT
+    ) -> None:
+        """Wait without blocking the event loop until a slot is free."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._has_capacity():
+                self._in_flight += 1
+                return
+            future = loop.create_future()
+            self._waiters.push(future, priority, tenant)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if self._waiters.remove(future):
+                    raise
+            # Granted just before the cancellation: hand the slot back
+            if not future.cancelled():
+                self.release()
+            raise
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.done():
+            # Cancelled before the hand-over arrived
+            self.release()
+        else:
+            future.set_result(None)
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_capacity():
+            waiter = self._waiters.pop()
+            self._in_flight += 1
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+
+    def release(self, latency: Optional[float] = None, error: bool = False) -> None:
+        """Free a slot and adjust the limit from the call's outcome."""
+        with self._lock:
+            saturated = self._in_flight >= max(int(self._limit), 1)
+            self._in_flight -= 1
+            self._adjust(latency, error, saturated)
+            self._wake()
+
+    def _adjust(self, latency: Optional[float], error: bool, saturated: bool) -> None:
+        if error:
+            self._errors += 1
+            self._decrease()
+            return
+        if latency is None:
+            return
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * self.baseline_drift
+        if latency > self.baseline * self.tolerance:
+            self._decrease()
+        elif saturated and self._limit < self.max_limit:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._increases += 1
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.backoff)
+        self._decreases += 1
+
+    @contextmanager
+    def slot(
+        self, priority: Priority = Priority.NORMAL, tenant: str = DEFAULT_TENANT
+    ) -> Iterator[Slot]:
+        """Hold a slot for the duration of a synchronous call.
+
+        In a hedged attempt the slot is freed as soon as the attempt is
+        abandoned, even while its thread is still blocked on the backend.
+        """
+        self.acquire(priority, tenant)
+        slot = Slot()
+        error = False
+        release = release_on_abandon(lambda: self.release(slot.latency, error))
+        try:
+            yield slot
+        except Exception:
+            error = True
+            raise
+        finally:
+            release()
+
+    @asynccontextmanager
+    async def aslot(
+        self, priority: Priority = Priority.NORMAL, tenant: str = DEFAULT_TENANT
+    ) -> AsyncIterator[Slot]:
+        """Hold a slot for the duration of an asynchronous call."""
+        await self.aacquire(priority, tenant)
+        slot = Slot()
+        error = False
+        try:
+            yield slot
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.release(slot.latency, error)
@@ -0,0 +1,138 @@
+"""Embedding-similarity routing of queries to roles, without an LLM call."""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import Mapping, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel, Field
+
+DEFAULT_ROLE_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "ai-study", "roles")
+
+
+class RouteResult(BaseModel):
+    """Outcome of routing one query."""
+
+    role: str = Field(..., description="Best matching role")
+    score: float = Field(..., description="Cosine similarity of the best role")
+    margin: float = Field(..., description="Lead of the best role over the runner-up")
+    confident: bool = Field(..., description="Whether the margin is large enough to skip the LLM")
+    ranking: list[str] = Field(default_factory=list, description="All roles, best first")
+
+
+class RoleRouterStats(BaseModel):
+    """Counters for a role router."""
+
+    routed: int = Field(default=0, description="Queries classified")
+    ambiguous: int = Field(default=0, description="Queries whose margin was below the threshold")
+    classify_seconds: float = Field(
+        default=0.0, description="Time spent in similarity search, excluding the query embedding"
+    )
+
+    @property
+    def ambiguous_rate(self) -> float:
+        """Fraction of queries left to the LLM."""
+        return self.ambiguous / self.routed if self.routed else 0.0
+
+
+class RoleRouter:
+    """Picks a role for a query by cosine similarity to example texts.
+
+    Each role has one or more example texts (descriptions, sample questions).
+    Their embeddings are computed once and stored under ``cache_dir``, keyed
+    by the embedding model and the texts, so later processes load them from
+    disk. A query is embedded, compared with every example in one
+    matrix-vector product, and scored per role by its best example. When the
+    best role leads the runner-up by less than ``margin`` the result is
+    marked not ``confident`` and the caller should ask an LLM instead.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        roles: Mapping[str, Sequence[str]],
+        margin: float = 0.03,
+        cache_dir: Optional[str] = DEFAULT_ROLE_CACHE_DIR,
+    ):
+        """Initialize the router over ``roles`` (role -> example texts)."""
+        if len(roles) < 2:
+            raise ValueError("RoleRouter needs at least two roles")
+        self.embeddings = embeddings
+        self.roles = list(roles)
+        self.margin = margin
+        self.cache_dir = cache_dir
+        self.stats = RoleRouterStats()
+        self._texts = [text for role in self.roles for text in roles[role]]
+        counts = [len(roles[role]) for role in self.roles]
+        # Start offset of each role's block of examples, for np.maximum.reduceat
+        self._offsets = np.cumsum([0, *counts[:-1]])
+        self._matrix: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _cache_path(self) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        model = getattr(self.embeddings, "model", type(self.embeddings).__name__)
+        digest = hashlib.sha256("\0".join([str(model), *self._texts]).encode("utf-8"))
+        return os.path.join(self.cache_dir, f"{digest.hexdigest()[:32]}.npy")
+
+    def _normalized(self, vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _example_matrix(self) -> np.ndarray:
+        with self._lock:
+            if self._matrix is not None:
+                return self._matrix
+            path = self._cache_path()
+            if path is not None and os.path.exists(path):
+                self._matrix = np.load(path)
+                return self._matrix
+            vectors = np.asarray(self.embeddings.embed_documents(self._texts), dtype=np.float32)
+            self._matrix = self._normalized(vectors)
+            if path is not None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                np.save(path, self._matrix)
+            return self._matrix
+
+    def warm(self) -> None:
+        """Load or compute the example embeddings now rather than on the first query."""
+        self._example_matrix()
+
+    def classify(self, vector: Sequence[float]) -> RouteResult:
+        """Route an already embedded query."""
+        matrix = self._example_matrix()
+        started = time.perf_counter()
+        query = self._normalized(np.asarray(vector, dtype=np.float32))
+        scores = np.maximum.reduceat(matrix @ query, self._offsets)
+        order = np.argsort(-scores)
+        best, runner_up = scores[order[0]], scores[order[1]]
+        margin = float(best - runner_up)
+        confident = margin >= self.margin
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.stats.routed += 1
+            self.stats.classify_seconds += elapsed
+            if not confident:
+                self.stats.ambiguous += 1
+        return RouteResult(
+            role=self.roles[order[0]],
+            score=float(best),
+            margin=margin,
+            confident=confident,
+            ranking=[self.roles[i] for i in order],
+        )
+
+    def route(self, query: str) -> RouteResult:
+        """Embed ``query`` and route it."""
+        return self.classify(self.embeddings.embed_query(query))
+
+    async def aroute(self, query: str) -> RouteResult:
+        """Asynchronously embed ``query`` and route it."""
+        if self._matrix is None:
+            await asyncio.to_thread(self._example_matrix)
+        return self.classify(await self.embeddings.aembed_query(query))
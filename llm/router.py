@@ -0,0 +1,277 @@
+"""Routing of chat calls over several Ollama hosts."""
+
+import asyncio
+import bisect
+import hashlib
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator, Mapping, Optional
+
+import httpx
+from ollama import AsyncClient, Client
+from pydantic import BaseModel, Field
+
+from .cassette import Cassette
+from .hedging import release_on_abandon, sync_event_hooks
+
+# Characters of the first message used as the affinity key when there is no system prompt
+_PREFIX_CHARS = 512
+
+
+def affinity_key(params: Mapping[str, Any]) -> Optional[str]:
+    """Routing key for a chat request: its system prompt(s), else the start of the first message."""
+    messages = params.get("messages") or []
+    system = [m.get("content", "") for m in messages if m.get("role") == "system"]
+    if system:
+        return "\n".join(system)
+    if messages:
+        return str(messages[0].get("content", ""))[:_PREFIX_CHARS] or None
+    return None
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+
+
+class BackendStats(BaseModel):
+    """Counters for one Ollama host."""
+
+    host: str = Field(..., description="Base URL of the host")
+    healthy: bool = Field(..., description="Whether the host currently receives traffic")
+    outstanding: int = Field(..., description="Requests currently in flight")
+    requests: int = Field(default=0, description="Requests routed to the host")
+    failures: int = Field(default=0, description="Requests that failed to reach the host")
+    affinity_hits: int = Field(
+        default=0, description="Requests routed here by their prompt prefix"
+    )
+
+
+class Backend:
+    """One Ollama host with its pooled clients and load counters."""
+
+    def __init__(
+        self,
+        host: str,
+        limits: httpx.Limits,
+        timeout: Optional[float],
+        cassette: Optional[Cassette] = None,
+    ):
+        self.host = host
+        self.healthy = True
+        self.outstanding = 0
+        self.checked_at = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.affinity_hits = 0
+        self._limits = limits
+        self._timeout = timeout
+        self._cassette = cassette
+        self._client: Optional[Client] = None
+        self._async_clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, AsyncClient
+        ] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _transport(self, asynchronous: bool = False) -> dict[str, Any]:
+        if self._cassette is None:
+            return {"limits": self._limits}
+        if asynchronous:
+            return {"transport": self._cassette.async_transport(self._limits)}
+        return {"transport": self._cassette.transport(self._limits)}
+
+    def client(self) -> Client:
+        """Pooled synchronous client for this host."""
+        with self._lock:
+            if self._client is None:
+                self._client = Client(
+                    self.host,
+                    timeout=self._timeout,
+                    event_hooks=sync_event_hooks(),
+                    **self._transport(),
+                )
+            return self._client
+
+    def async_client(self) -> AsyncClient:
+        """Pooled asynchronous client for this host on the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if (client := self._async_clients.get(loop)) is None:
+                client = AsyncClient(
+                    self.host, timeout=self._timeout, **self._transport(asynchronous=True)
+                )
+                self._async_clients[loop] = client
+            return client
+
+    def stats(self) -> BackendStats:
+        """Current counters of this host."""
+        return BackendStats(
+            host=self.host,
+            healthy=self.healthy,
+            outstanding=self.outstanding,
+            requests=self.requests,
+            failures=self.failures,
+            affinity_hits=self.affinity_hits,
+        )
+
+
+class BackendRouter:
+    """Spreads chat calls over several Ollama hosts.
+
+    Requests with an affinity key (the system prompt) go to the key's owner
+    on a consistent-hash ring, so a repeated prompt keeps hitting the host
+    that already holds its KV cache, and adding or losing a host only moves
+    the keys it owned. A host is skipped when it is unhealthy or when it
+    already has more than ``load_factor`` times the average outstanding
+    requests, in which case the ring is walked to the next host (bounded-load
+    consistent hashing). Requests without a key go to the host with the
+    fewest outstanding requests.
+
+    A host is marked unhealthy when a request cannot reach it and is probed
+    again at most every ``health_interval`` seconds; ``check_health`` probes
+    every host immediately.
+    """
+
+    def __init__(
+        self,
+        hosts: list[str],
+        virtual_nodes: int = 64,
+        load_factor: float = 1.25,
+        health_interval: float = 10.0,
+        health_timeout: float = 2.0,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        timeout: Optional[float] = None,
+        cassette: Optional[Cassette] = None,
+    ):
+        """Initialize the router over the given base URLs."""
+        if not hosts:
+            raise ValueError("BackendRouter needs at least one host")
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.backends = [Backend(host, limits, timeout, cassette) for host in hosts]
+        self.load_factor = load_factor
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._ring = sorted(
+            (_hash(f"{backend.host}#{i}"), index)
+            for index, backend in enumerate(self.backends)
+            for i in range(virtual_nodes)
+        )
+        self._ring_hashes = [h for h, _ in self._ring]
+        self._lock = threading.Lock()
+
+    def stats(self) -> list[BackendStats]:
+        """Counters of every host."""
+        with self._lock:
+            return [backend.stats() for backend in self.backends]
+
+    def _probe(self, backend: Backend) -> bool:
+        try:
+            response = httpx.get(
+                f"{backend.host.rstrip('/')}/api/version", timeout=self.health_timeout
+            )
+            healthy = response.status_code == 200
+        except httpx.HTTPError:
+            healthy = False
+        with self._lock:
+            backend.healthy = healthy
+            backend.checked_at = time.monotonic()
+        return healthy
+
+    def check_health(self) -> list[BackendStats]:
+        """Probe every host now and return the updated counters."""
+        for backend in self.backends:
+            self._probe(backend)
+        return self.stats()
+
+    def _recheck_due(self) -> list[Backend]:
+        now = time.monotonic()
+        with self._lock:
+            due = [
+                b
+                for b in self.backends
+                if not b.healthy and now - b.checked_at >= self.health_interval
+            ]
+            # Claim the probe so concurrent callers do not all re-probe the same host
+            for backend in due:
+                backend.checked_at = now
+        return due
+
+    def _choose(self, key: Optional[str]) -> Backend:
+        healthy = [b for b in self.backends if b.healthy]
+        # With every host down, try them anyway rather than failing outright
+        candidates = healthy or self.backends
+        if key is not None:
+            total = sum(b.outstanding for b in candidates)
+            bound = self.load_factor * (total + 1) / len(candidates)
+            start = bisect.bisect(self._ring_hashes, _hash(key)) % len(self._ring)
+            for offset in range(len(self._ring)):
+                backend = self.backends[self._ring[(start + offset) % len(self._ring)][1]]
+                if backend in candidates and backend.outstanding < bound:
+                    backend.affinity_hits += 1
+                    return backend
+        return min(candidates, key=lambda b: b.outstanding)
+
+    def _take(self, key: Optional[str]) -> Backend:
+        with self._lock:
+            backend = self._choose(key)
+            backend.outstanding += 1
+            backend.requests += 1
+            return backend
+
+    def pick(self, key: Optional[str] = None) -> Backend:
+        """Choose a host for a request and count it as outstanding."""
+        for backend in self._recheck_due():
+            self._probe(backend)
+        return self._take(key)
+
+    async def apick(self, key: Optional[str] = None) -> Backend:
+        """Like ``pick``, but probes recovering hosts without blocking the event loop."""
+        due = self._recheck_due()
+        if due:
+            await asyncio.gather(*(asyncio.to_thread(self._probe, b) for b in due))
+        return self._take(key)
+
+    def done(self, backend: Backend, error: Optional[BaseException] = None) -> None:
+        """Finish a request picked with ``pick``; transport errors mark the host unhealthy."""
+        with self._lock:
+            backend.outstanding -= 1
+            if isinstance(error, (httpx.TransportError, ConnectionError)):
+                backend.failures += 1
+                backend.healthy = False
+                backend.checked_at = time.monotonic()
+
+    @contextmanager
+    def lease(self, key: Optional[str] = None) -> Iterator[Backend]:
+        """Hold a host for the duration of one request.
+
+        In a hedged attempt the host is handed back as soon as the attempt is
+        abandoned; the abandoned request's later errors do not count against it.
+        """
+        backend = self.pick(key)
+        error: Optional[BaseException] = None
+        release = release_on_abandon(lambda: self.done(backend, error))
+        try:
+            yield backend
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            release()
+
+    @asynccontextmanager
+    async def alease(self, key: Optional[str] = None) -> AsyncIterator[Backend]:
+        """Hold a host for the duration of one asynchronous request."""
+        backend = await self.apick(key)
+        error: Optional[BaseException] = None
+        try:
+            yield backend
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.done(backend, error)
@@ -0,0 +1,119 @@
+"""Priority classes and weighted-fair queueing for LLM requests."""
+
+import heapq
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Iterator, Optional
+
+
+class Priority(IntEnum):
+    """Scheduling class of a request; lower values are served first."""
+
+    INTERACTIVE = 0
+    NORMAL = 1
+    BATCH = 2
+
+
+_priority: ContextVar[Optional[Priority]] = ContextVar("llm_priority", default=None)
+_tenant: ContextVar[Optional[str]] = ContextVar("llm_tenant", default=None)
+
+DEFAULT_TENANT = "default"
+
+
+@contextmanager
+def request_context(
+    priority: Optional[Priority] = None, tenant: Optional[str] = None
+) -> Iterator[None]:
+    """Tag LLM calls made inside the block (and tasks/threads it spawns) with a class and tenant."""
+    priority_token = _priority.set(priority) if priority is not None else None
+    tenant_token = _tenant.set(tenant) if tenant is not None else None
+    try:
+        yield
+    finally:
+        if tenant_token is not None:
+            _tenant.reset(tenant_token)
+        if priority_token is not None:
+            _priority.reset(priority_token)
+
+
+def current_priority(default: Priority = Priority.NORMAL) -> Priority:
+    """Priority set by the innermost ``request_context``, or ``default``."""
+    priority = _priority.get()
+    return default if priority is None else priority
+
+
+def current_tenant() -> str:
+    """Tenant set by the innermost ``request_context``."""
+    return _tenant.get() or DEFAULT_TENANT
+
+
+class FairQueue:
+    """Waiters ordered by priority class, then by weighted-fair finish tag.
+
+    Within a class each tenant (a session, a user, an agent run) gets a
+    share of the slots proportional to its weight: every request is tagged
+    with a virtual finish time ``max(now, tenant's last tag) + 1 / weight``
+    and the smallest tag is served first, so a tenant that queued hundreds
+    of interview calls cannot push another tenant's call to the back. Across
+    classes the order is strict: a queued ``INTERACTIVE`` call always
+    overtakes queued ``BATCH`` work.
+    """
+
+    def __init__(self, weights: Optional[dict[str, float]] = None, max_tenants: int = 1024):
+        """Initialize an empty queue with optional per-tenant weights (default 1)."""
+        self.weights = weights or {}
+        self.max_tenants = max_tenants
+        self._heap: list[list[Any]] = []
+        self._entries: dict[int, list[Any]] = {}
+        self._finish: dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._sequence = itertools.count()
+        self._depth = {priority: 0 for priority in Priority}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def depth(self) -> dict[str, int]:
+        """Queued waiters per priority class."""
+        return {priority.name.lower(): count for priority, count in self._depth.items()}
+
+    def push(
+        self, waiter: Any, priority: Priority = Priority.NORMAL, tenant: str = DEFAULT_TENANT
+    ) -> None:
+        """Queue a waiter under a priority class and tenant."""
+        start = max(self._virtual_time, self._finish.get(tenant, 0.0))
+        finish = start + 1.0 / self.weights.get(tenant, 1.0)
+        self._finish[tenant] = finish
+        entry = [int(priority), finish, next(self._sequence), waiter]
+        self._entries[id(waiter)] = entry
+        self._depth[priority] += 1
+        heapq.heappush(self._heap, entry)
+
+    def pop(self) -> Any:
+        """Remove and return the next waiter to serve."""
+        while self._heap:
+            priority, finish, _, waiter = heapq.heappop(self._heap)
+            if waiter is None:
+                continue
+            del self._entries[id(waiter)]
+            self._depth[Priority(priority)] -= 1
+            self._virtual_time = max(self._virtual_time, finish)
+            if len(self._finish) > self.max_tenants:
+                # Tenants whose tags are behind the clock restart from it anyway
+                self._finish = {
+                    t: f for t, f in self._finish.items() if f > self._virtual_time
+                }
+            return waiter
+        raise IndexError("pop from an empty FairQueue")
+
+    def remove(self, waiter: Any) -> bool:
+        """Drop a queued waiter; False if it was not queued."""
+        entry = self._entries.pop(id(waiter), None)
+        if entry is None:
+            return False
+        self._depth[Priority(entry[0])] -= 1
+        # Lazy deletion: the heap slot is skipped when popped
+        entry[-1] = None
+        return True
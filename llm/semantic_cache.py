@@ -0,0 +1,197 @@
+"""Embedding-similarity cache for answers to user-facing queries."""
+
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from pydantic import BaseModel, Field
+
+T = TypeVar("T")
+
+
+class SemanticCacheStats(BaseModel):
+    """Hit/miss counters and lookup latency of a semantic cache."""
+
+    hits: int = Field(default=0, description="Queries answered from the cache")
+    misses: int = Field(default=0, description="Queries that had to be computed")
+    evictions: int = Field(default=0, description="Entries dropped to stay within max_entries")
+    latencies_ms: deque = Field(
+        default_factory=lambda: deque(maxlen=1000),
+        description="Recent lookup latencies (embedding + search) in milliseconds",
+    )
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def latency_ms(self, percentile: float = 50) -> float:
+        """Percentile of the recent lookup latencies."""
+        if not self.latencies_ms:
+            return 0.0
+        return float(np.percentile(np.fromiter(self.latencies_ms, dtype=float), percentile))
+
+
+def semantic_cache_path(name: str) -> Optional[str]:
+    """Path for a named cache under ``$AI_STUDY_SEMANTIC_CACHE``, or None to keep it in memory."""
+    directory = os.environ.get("AI_STUDY_SEMANTIC_CACHE")
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}.sqlite")
+
+
+class SemanticCache:
+    """Serves a stored answer when a new query is close enough to a cached one.
+
+    Query vectors live in one preallocated, normalized ``float32`` matrix, so
+    a lookup is a single matrix-vector product plus ``argmax``. When full, the
+    least recently used entry is overwritten. With ``path`` set, entries are
+    also kept in a local SQLite file and reloaded on start-up; answers are
+    pickled, so only point it at a trusted local file.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.92,
+        max_entries: int = 1024,
+        path: Optional[str] = None,
+    ):
+        """Initialize the cache with an embedding model and a similarity threshold."""
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = path
+        self.stats = SemanticCacheStats()
+        self._lock = threading.Lock()
+        self._matrix: Optional[np.ndarray] = None
+        self._queries: list[Optional[str]] = [None] * max_entries
+        self._answers: list[Any] = [None] * max_entries
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._used = np.zeros(max_entries, dtype=bool)
+        self._conn: Optional[sqlite3.Connection] = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "query TEXT PRIMARY KEY, vector BLOB NOT NULL, answer BLOB NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+            self._load()
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT query, vector, answer, last_used FROM entries "
+            "ORDER BY last_used DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for query, vector, answer, last_used in rows:
+            self._store(
+                query, np.frombuffer(vector, dtype=np.float32), pickle.loads(answer), last_used
+            )
+
+    def _normalize(self, vector: list[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        return array / (np.linalg.norm(array) or 1.0)
+
+    def _search(self, vector: np.ndarray) -> Optional[int]:
+        if self._matrix is None or not self._used.any():
+            return None
+        scores = np.where(self._used, self._matrix @ vector, -np.inf)
+        best = int(np.argmax(scores))
+        return best if scores[best] >= self.threshold else None
+
+    def _lookup(self, query: str, vector: np.ndarray, started: float) -> tuple[bool, Any]:
+        with self._lock:
+            index = self._search(vector)
+            self.stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+            if index is None:
+                self.stats.misses += 1
+                return False, None
+            self.stats.hits += 1
+            self._last_used[index] = time.time()
+            return True, self._answers[index]
+
+    def _store(
+        self, query: str, vector: np.ndarray, answer: Any, last_used: Optional[float] = None
+    ) -> Optional[str]:
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+        if query in self._queries:
+            index = self._queries.index(query)
+        elif not self._used.all():
+            index = int(np.argmin(self._used))
+        else:
+            # Overwrite the least recently used entry
+            index = int(np.argmin(self._last_used))
+            self.stats.evictions += 1
+        evicted = self._queries[index] if self._queries[index] != query else None
+        self._matrix[index] = vector
+        self._queries[index] = query
+        self._answers[index] = answer
+        self._last_used[index] = last_used or time.time()
+        self._used[index] = True
+        return evicted
+
+    def _persist(self, query: str, vector: np.ndarray, answer: Any, evicted: Optional[str]) -> None:
+        if self._conn is None:
+            return
+        with self._conn:
+            if evicted is not None:
+                self._conn.execute("DELETE FROM entries WHERE query = ?", (evicted,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (query, vector.tobytes(), pickle.dumps(answer), time.time()),
+            )
+
+    def _update(self, query: str, vector: np.ndarray, answer: Any) -> None:
+        with self._lock:
+            evicted = self._store(query, vector, answer)
+            self._persist(query, vector, answer, evicted)
+
+    def get_or_compute(
+        self,
+        query: str,
+        compute: Callable[[str], T],
+        cacheable: Optional[Callable[[T], bool]] = None,
+    ) -> T:
+        """Return the cached answer for a similar query, or compute and store a new one.
+
+        A computed answer for which ``cacheable`` returns False is returned
+        but not stored, so a failed result is not served to later queries.
+        """
+        started = time.perf_counter()
+        vector = self._normalize(self.embeddings.embed_query(query))
+        hit, answer = self._lookup(query, vector, started)
+        if hit:
+            return answer
+        answer = compute(query)
+        if cacheable is None or cacheable(answer):
+            self._update(query, vector, answer)
+        return answer
+
+    async def aget_or_compute(
+        self,
+        query: str,
+        compute: Callable[[str], Awaitable[T]],
+        cacheable: Optional[Callable[[T], bool]] = None,
+    ) -> T:
+        """Asynchronously return a cached answer, or compute and store a new one."""
+        started = time.perf_counter()
+        vector = self._normalize(await self.embeddings.aembed_query(query))
+        hit, answer = self._lookup(query, vector, started)
+        if hit:
+            return answer
+        answer = await compute(query)
+        if cacheable is None or cacheable(answer):
+            await asyncio.to_thread(self._update, query, vector, answer)
+        return answer
@@ -4,9 +4,10 @@ from typing import List, cast  # ←追加
 
 from llama_index.core.agent.workflow import ReActAgent
 from llama_index.core.tools.types import BaseTool
-from llama_index.llms.ollama import Ollama
 from llama_index.tools.mcp import BasicMCPClient, McpToolSpec
 
+from llm.client import get_registry
+
 
 async def run_mcp_task(prompt: str):
     try:
@@ -18,7 +19,7 @@ async def run_mcp_task(prompt: str):
 
         tools = cast(List[BaseTool], tools_raw)
 
-        llm = Ollama(model="llama3:instruct", request_timeout=60)
+        llm = get_registry().llama_index_llm("llama3:instruct", request_timeout=60)
 
         # ReActAgentの初期化（新しいworkflow版）
         agent = ReActAgent(
@@ -0,0 +1,72 @@
+"""Adaptive persona count driven by the marginal information gain of each round."""
+
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .concurrency import ConcurrencyLimiter
+from .memory import EmbeddingCache
+from .persona import Interview
+
+
+class AdaptivePersonaCount:
+    """Grows, shrinks or stops persona generation based on how novel new answers are.
+
+    The novelty of an answer is one minus its highest cosine similarity to any
+    earlier answer in the session (including answers from the same round).
+    The round's gain is the mean novelty of its answers.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        min_k: int = 2,
+        max_k: int = 8,
+        grow_threshold: float = 0.35,
+        shrink_threshold: float = 0.15,
+        stop_threshold: float = 0.08,
+        limiter: Optional[ConcurrencyLimiter] = None,
+    ):
+        """Initialize the policy with a local embedding model and gain thresholds."""
+        self.cache = EmbeddingCache(embeddings, limiter=limiter)
+        self.min_k = min_k
+        self.max_k = max_k
+        self.grow_threshold = grow_threshold
+        self.shrink_threshold = shrink_threshold
+        self.stop_threshold = stop_threshold
+
+    def measure(self, new: list[Interview], previous: list[Interview]) -> float:
+        """Return the mean novelty of the new answers against the session corpus."""
+        if not new:
+            return 0.0
+        answers = [i.answer for i in previous] + [i.answer for i in new]
+        return self._gain(self.cache.embed_documents(answers), len(previous))
+
+    async def ameasure(self, new: list[Interview], previous: list[Interview]) -> float:
+        """Asynchronously return the mean novelty of the new answers."""
+        if not new:
+            return 0.0
+        answers = [i.answer for i in previous] + [i.answer for i in new]
+        return self._gain(await self.cache.aembed_documents(answers), len(previous))
+
+    def _gain(self, matrix: np.ndarray, num_previous: int) -> float:
+        similarity = matrix[num_previous:] @ matrix.T
+        # Each new answer is only compared with the answers that came before it
+        rows = np.arange(similarity.shape[0])[:, None] + num_previous
+        earlier = np.arange(matrix.shape[0])[None, :] < rows
+        closest = np.where(earlier, similarity, -1.0).max(axis=1)
+        novelty = 1.0 - np.clip(closest, 0.0, 1.0)
+        return float(novelty.mean())
+
+    def next_k(self, k: int, gain: float) -> int:
+        """Return the persona count for the next round."""
+        if gain >= self.grow_threshold:
+            k += 1
+        elif gain < self.shrink_threshold:
+            k -= 1
+        return max(self.min_k, min(self.max_k, k))
+
+    def should_stop(self, gain: float) -> bool:
+        """Whether the last round added too little to justify another one."""
+        return gain < self.stop_threshold
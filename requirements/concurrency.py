@@ -0,0 +1,34 @@
+"""Shared concurrency limit for LLM calls."""
+
+import asyncio
+
+
+class ConcurrencyLimiter:
+    """Bounds the number of in-flight LLM calls shared across components.
+
+    One limiter can be handed to several agents so that every session in
+    the process competes for the same backend slots. It must be used from
+    a single event loop.
+    """
+
+    def __init__(self, max_concurrency: int = 4):
+        """Initialize the limiter with the maximum number of in-flight calls."""
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of calls currently holding a slot."""
+        return self._in_flight
+
+    async def __aenter__(self) -> "ConcurrencyLimiter":
+        await self._semaphore.acquire()
+        self._in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._in_flight -= 1
+        self._semaphore.release()
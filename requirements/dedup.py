@@ -0,0 +1,105 @@
+"""MinHash-based persona deduplication across evaluation loop iterations."""
+
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from .persona import Persona
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Each accepted persona costs one question call and one answer call
+_CALLS_PER_INTERVIEW = 2
+
+
+class PersonaDedupStats(BaseModel):
+    """Counters for persona deduplication."""
+
+    checked: int = Field(default=0, description="Personas checked against the index")
+    rejected: int = Field(default=0, description="Personas rejected as near-duplicates")
+    regenerations: int = Field(
+        default=0, description="Extra persona generation calls made to replace duplicates"
+    )
+
+    @property
+    def interview_calls_saved(self) -> int:
+        """Question and answer calls avoided by not interviewing duplicates."""
+        return self.rejected * _CALLS_PER_INTERVIEW
+
+
+class PersonaDeduplicator:
+    """Rejects personas whose name and background nearly match an earlier one.
+
+    Similarity is the MinHash estimate of the Jaccard similarity between the
+    character shingles of ``name`` + ``background``. Signatures are cached by
+    content, so a session's earlier personas are not re-hashed every round.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.6,
+        num_perm: int = 64,
+        shingle_size: int = 3,
+        max_regenerations: int = 1,
+        max_cached: int = 10_000,
+        seed: int = 1,
+    ):
+        """Initialize the deduplicator with a similarity threshold and MinHash size."""
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        # Persona generation calls allowed per round to replace rejected personas
+        self.max_regenerations = max_regenerations
+        self.max_cached = max_cached
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._signatures: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = PersonaDedupStats()
+
+    def _text(self, persona: Persona) -> str:
+        return re.sub(r"\s+", " ", f"{persona.name} {persona.background}".lower()).strip()
+
+    def _signature(self, persona: Persona) -> np.ndarray:
+        text = self._text(persona)
+        with self._lock:
+            if (signature := self._signatures.get(text)) is not None:
+                self._signatures.move_to_end(text)
+                return signature
+        size = self.shingle_size
+        shingles = {text[i : i + size] for i in range(max(len(text) - size + 1, 1))}
+        hashes = np.array(
+            [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles],
+            dtype=np.uint64,
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        signature = permuted.min(axis=0)
+        with self._lock:
+            self._signatures[text] = signature
+            while len(self._signatures) > self.max_cached:
+                self._signatures.popitem(last=False)
+        return signature
+
+    def similarity(self, first: Persona, second: Persona) -> float:
+        """Estimated Jaccard similarity between two personas."""
+        return float(np.mean(self._signature(first) == self._signature(second)))
+
+    def filter(self, candidates: list[Persona], existing: list[Persona]) -> list[Persona]:
+        """Return the candidates that are not near-duplicates of existing or earlier candidates."""
+        accepted: list[Persona] = []
+        signatures = [self._signature(persona) for persona in existing]
+        for persona in candidates:
+            signature = self._signature(persona)
+            self.stats.checked += 1
+            if signatures and (
+                (np.stack(signatures) == signature).mean(axis=1).max() >= self.threshold
+            ):
+                self.stats.rejected += 1
+                continue
+            accepted.append(persona)
+            signatures.append(signature)
+        return accepted
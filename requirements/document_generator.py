@@ -1,23 +1,48 @@
 """Requirements document generator module."""
 
+import asyncio
+from typing import AsyncIterator, Iterator, Optional
+
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_ollama import ChatOllama
 
+from .concurrency import ConcurrencyLimiter
+from .memory import InterviewStore
 from .persona import Interview
 
 
+SECTIONS = [
+    "Project Overview",
+    "Key Features",
+    "Non-functional Requirements",
+    "Constraints",
+    "Target Users",
+    "Priorities",
+    "Risks and Mitigation Strategies",
+]
+
+
 class RequirementsDocumentGenerator:
     """Generates requirements documents based on interview results."""
 
-    def __init__(self, llm: ChatOllama):
+    def __init__(
+        self,
+        llm: ChatOllama,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        parallel_sections: bool = False,
+        store: Optional[InterviewStore] = None,
+    ):
         """Initialize the document generator with an LLM."""
         self.llm = llm
+        self.limiter = limiter or ConcurrencyLimiter()
+        # When enabled, run/arun generate each section with its own concurrent call
+        self.parallel_sections = parallel_sections
+        # When set, each prompt only gets the interviews the store packs into its budget
+        self.store = store
 
-    def run(self, user_request: str, interviews: list[Interview]) -> str:
-        """Generate a requirements document from user request and interviews."""
-        # Define prompt
-        prompt = ChatPromptTemplate.from_messages(
+    def _create_prompt(self) -> ChatPromptTemplate:
+        return ChatPromptTemplate.from_messages(
             [
                 (
                     "system",
@@ -29,35 +54,17 @@ class RequirementsDocumentGenerator:
                     "User Request: {user_request}\n\n"
                     "Interview Results:\n{interview_results}\n"
                     "Please include the following sections in the requirements document:\n"
-                    "1. Project Overview\n"
-                    "2. Key Features\n"
-                    "3. Non-functional Requirements\n"
-                    "4. Constraints\n"
-                    "5. Target Users\n"
-                    "6. Priorities\n"
-                    "7. Risks and Mitigation Strategies\n\n"
-                    "Please output in English.\n\nRequirements Document:",
+                    + "".join(
+                        f"{number}. {section}\n"
+                        for number, section in enumerate(SECTIONS, start=1)
+                    )
+                    + "\nPlease output in English.\n\nRequirements Document:",
                 ),
             ]
         )
-        # Create chain to generate requirements document
-        chain = prompt | self.llm | StrOutputParser()
-        # Generate requirements document
-        return chain.invoke(
-            {
-                "user_request": user_request,
-                "interview_results": "\n".join(
-                    f"Persona: {i.persona.name} - {i.persona.background}\n"
-                    f"Question: {i.question}\nAnswer: {i.answer}\n"
-                    for i in interviews
-                ),
-            }
-        )
 
-    def stream(self, user_request: str, interviews: list[Interview]):
-        """Stream the requirements document generation."""
-        # Define prompt
-        prompt = ChatPromptTemplate.from_messages(
+    def _create_section_prompt(self) -> ChatPromptTemplate:
+        return ChatPromptTemplate.from_messages(
             [
                 (
                     "system",
@@ -65,36 +72,141 @@ class RequirementsDocumentGenerator:
                 ),
                 (
                     "human",
-                    "Please create a requirements document based on the following user request and interview results from multiple personas.\n\n"
+                    "Please write one section of a requirements document based on the following user request and interview results from multiple personas.\n\n"
                     "User Request: {user_request}\n\n"
                     "Interview Results:\n{interview_results}\n"
-                    "Please include the following sections in the requirements document:\n"
-                    "1. Project Overview\n"
-                    "2. Key Features\n"
-                    "3. Non-functional Requirements\n"
-                    "4. Constraints\n"
-                    "5. Target Users\n"
-                    "6. Priorities\n"
-                    "7. Risks and Mitigation Strategies\n\n"
-                    "Please output in English.\n\nRequirements Document:",
+                    "The full document has these sections: {all_sections}.\n"
+                    "Write only the body of the section \"{section}\" without repeating its heading "
+                    "and without covering the other sections.\n\n"
+                    "Please output in English.\n\n{section}:",
                 ),
             ]
         )
-        # Create chain for streaming
-        chain = prompt | self.llm
 
+    def _select(self, query: str, interviews: list[Interview]) -> list[Interview]:
+        if self.store is None:
+            return interviews
+        return self.store.select(query, interviews)
+
+    async def _aselect(self, query: str, interviews: list[Interview]) -> list[Interview]:
+        if self.store is None:
+            return interviews
+        return await self.store.aselect(query, interviews)
+
+    def _create_section_input(
+        self, user_request: str, interviews: list[Interview], section: str
+    ) -> dict[str, str]:
+        return {
+            **self._create_inputs(user_request, interviews),
+            "all_sections": ", ".join(SECTIONS),
+            "section": section,
+        }
+
+    def _create_section_inputs(
+        self, user_request: str, interviews: list[Interview]
+    ) -> list[dict[str, str]]:
+        # Each section gets the interviews most relevant to that section
+        return [
+            self._create_section_input(
+                user_request,
+                self._select(f"{section}: {user_request}", interviews),
+                section,
+            )
+            for section in SECTIONS
+        ]
+
+    def _format_section(self, index: int, body: str) -> str:
+        return f"## {index + 1}. {SECTIONS[index]}\n\n{body.strip()}\n\n"
+
+    def _create_inputs(
+        self, user_request: str, interviews: list[Interview]
+    ) -> dict[str, str]:
+        return {
+            "user_request": user_request,
+            "interview_results": "\n".join(i.text for i in interviews),
+        }
+
+    def run(self, user_request: str, interviews: list[Interview]) -> str:
+        """Generate a requirements document from user request and interviews."""
+        if self.parallel_sections:
+            return "".join(self.stream_sections(user_request, interviews))
+        interviews = self._select(user_request, interviews)
+        # Create chain to generate requirements document
+        chain = self._create_prompt() | self.llm | StrOutputParser()
+        # Generate requirements document
+        return chain.invoke(self._create_inputs(user_request, interviews))
+
+    async def arun(self, user_request: str, interviews: list[Interview]) -> str:
+        """Asynchronously generate a requirements document."""
+        if self.parallel_sections:
+            return "".join(
+                [
+                    section
+                    async for section in self.astream_sections(user_request, interviews)
+                ]
+            )
+        interviews = await self._aselect(user_request, interviews)
+        chain = self._create_prompt() | self.llm | StrOutputParser()
+        async with self.limiter:
+            return await chain.ainvoke(self._create_inputs(user_request, interviews))
+
+    def stream(self, user_request: str, interviews: list[Interview]) -> Iterator[str]:
+        """Stream the requirements document generation."""
+        interviews = self._select(user_request, interviews)
+        # Create chain for streaming
+        chain = self._create_prompt() | self.llm | StrOutputParser()
         # Stream the generation
-        for chunk in chain.stream(
-            {
-                "user_request": user_request,
-                "interview_results": "\n".join(
-                    f"Persona: {i.persona.name} - {i.persona.background}\n"
-                    f"Question: {i.question}\nAnswer: {i.answer}\n"
-                    for i in interviews
-                ),
-            }
+        yield from chain.stream(self._create_inputs(user_request, interviews))
+
+    async def astream(
+        self, user_request: str, interviews: list[Interview]
+    ) -> AsyncIterator[str]:
+        """Asynchronously stream the requirements document generation."""
+        interviews = await self._aselect(user_request, interviews)
+        chain = self._create_prompt() | self.llm | StrOutputParser()
+        # The slot is held for the whole stream since the backend is busy until it ends
+        async with self.limiter:
+            async for chunk in chain.astream(
+                self._create_inputs(user_request, interviews)
+            ):
+                yield chunk
+
+    def stream_sections(
+        self, user_request: str, interviews: list[Interview]
+    ) -> Iterator[str]:
+        """Generate all sections concurrently and yield them in document order."""
+        chain = self._create_section_prompt() | self.llm | StrOutputParser()
+        done: dict[int, str] = {}
+        next_index = 0
+        # Emit each section as soon as it and every section before it are finished
+        for index, body in chain.batch_as_completed(
+            self._create_section_inputs(user_request, interviews)
         ):
-            if hasattr(chunk, "content"):
-                yield chunk.content
-            else:
-                yield str(chunk)
+            done[index] = body
+            while next_index in done:
+                yield self._format_section(next_index, done.pop(next_index))
+                next_index += 1
+
+    async def astream_sections(
+        self, user_request: str, interviews: list[Interview]
+    ) -> AsyncIterator[str]:
+        """Asynchronously generate all sections concurrently, yielding them in order."""
+        chain = self._create_section_prompt() | self.llm | StrOutputParser()
+
+        async def generate(section: str) -> str:
+            section_input = self._create_section_input(
+                user_request,
+                await self._aselect(f"{section}: {user_request}", interviews),
+                section,
+            )
+            async with self.limiter:
+                return await chain.ainvoke(section_input)
+
+        tasks = [asyncio.create_task(generate(section)) for section in SECTIONS]
+        try:
+            # Awaiting in order yields each prefix as soon as it is ready
+            for index, task in enumerate(tasks):
+                yield self._format_section(index, await task)
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -1,22 +1,42 @@
 """Persona generator module for creating diverse personas."""
 
+from typing import Any, AsyncIterator, Iterator, Optional, cast
+
+from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_ollama import ChatOllama
 
-from .persona import Personas
+from .concurrency import ConcurrencyLimiter
+from .persona import Persona, Personas
 
 
 class PersonaGenerator:
     """Generates diverse personas for requirements gathering."""
 
-    def __init__(self, llm: ChatOllama, k: int = 5):
+    def __init__(
+        self,
+        llm: ChatOllama,
+        k: Optional[int] = 5,
+        limiter: Optional[ConcurrencyLimiter] = None,
+    ):
         """Initialize the persona generator with an LLM and number of personas."""
         self.llm = llm.with_structured_output(Personas)
-        self.k = k
+        # Constrain the raw model to the same schema so its JSON can be parsed as it streams
+        self.json_llm = llm.bind(format=Personas.model_json_schema())
+        self.k = k or 5
+        self.limiter = limiter or ConcurrencyLimiter()
 
-    def run(self, user_request: str) -> Personas:
-        """Generate personas based on user request."""
-        prompt = ChatPromptTemplate.from_messages(
+    def _create_prompt(
+        self, existing: Optional[list[Persona]] = None, k: Optional[int] = None
+    ) -> ChatPromptTemplate:
+        avoid = (
+            "Do not generate personas similar to these existing ones:\n"
+            + "".join(f"- {p.name}: {p.background}\n" for p in existing)
+            + "\n"
+            if existing
+            else ""
+        )
+        return ChatPromptTemplate.from_messages(
             [
                 (
                     "system",
@@ -26,14 +46,86 @@ class PersonaGenerator:
                 ),
                 (
                     "human",
-                    f"Please generate {self.k} diverse personas for interviews "
+                    f"Please generate {k or self.k} diverse personas for interviews "
                     "related to the following user request.\n\n"
                     "Each persona should include a name and brief background. "
                     "Please ensure diversity in names, gender, occupation, and technical expertise.\n\n"
-                    "User Request: {user_request}",
+                    # Existing personas are literal text, so escape braces for the template
+                    + avoid.replace("{", "{{").replace("}", "}}")
+                    + "User Request: {user_request}",
                 ),
             ]
         )
 
-        chain = prompt | self.llm
-        return chain.invoke({"user_request": user_request})
+    def run(
+        self,
+        user_request: str,
+        existing: Optional[list[Persona]] = None,
+        k: Optional[int] = None,
+    ) -> Personas:
+        """Generate personas based on user request, avoiding any existing ones."""
+        chain = self._create_prompt(existing, k) | self.llm
+        return cast(Personas, chain.invoke({"user_request": user_request}))
+
+    async def arun(
+        self,
+        user_request: str,
+        existing: Optional[list[Persona]] = None,
+        k: Optional[int] = None,
+    ) -> Personas:
+        """Asynchronously generate personas based on user request."""
+        chain = self._create_prompt(existing, k) | self.llm
+        async with self.limiter:
+            result = await chain.ainvoke({"user_request": user_request})
+        return cast(Personas, result)
+
+    def stream(
+        self,
+        user_request: str,
+        existing: Optional[list[Persona]] = None,
+        k: Optional[int] = None,
+    ) -> Iterator[Persona]:
+        """Yield each persona as soon as its JSON object is complete."""
+        chain = self._create_prompt(existing, k) | self.json_llm | JsonOutputParser()
+        emitted = 0
+        partial: Any = None
+        for partial in chain.stream({"user_request": user_request}):
+            personas, emitted = self._complete_personas(partial, emitted)
+            yield from personas
+        # The last object is only known to be complete once the stream ends
+        personas, _ = self._complete_personas(partial, emitted, final=True)
+        yield from personas
+
+    async def astream(
+        self,
+        user_request: str,
+        existing: Optional[list[Persona]] = None,
+        k: Optional[int] = None,
+    ) -> AsyncIterator[Persona]:
+        """Asynchronously yield each persona as soon as its JSON object is complete."""
+        chain = self._create_prompt(existing, k) | self.json_llm | JsonOutputParser()
+        emitted = 0
+        partial: Any = None
+        async with self.limiter:
+            async for partial in chain.astream({"user_request": user_request}):
+                personas, emitted = self._complete_personas(partial, emitted)
+                for persona in personas:
+                    yield persona
+        personas, _ = self._complete_personas(partial, emitted, final=True)
+        for persona in personas:
+            yield persona
+
+    def _complete_personas(
+        self, partial: Any, emitted: int, final: bool = False
+    ) -> tuple[list[Persona], int]:
+        # An entry is complete once the next one has started, or the stream has ended
+        if not isinstance(partial, dict):
+            return [], emitted
+        entries = partial.get("personas") or []
+        end = max(emitted, len(entries) if final else len(entries) - 1)
+        personas = [
+            Persona.model_validate(entry)
+            for entry in entries[emitted:end]
+            if isinstance(entry, dict) and entry.get("name") and entry.get("background")
+        ]
+        return personas, end
@@ -1,49 +1,101 @@
 """Information evaluator module for assessing interview completeness."""
 
+from typing import Optional, cast
+
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_ollama import ChatOllama
 
-from .persona import EvaluationResult, Interview
-from typing import cast
+from llm.cascade import ModelCascade, configurable_max_tokens, structured
+
+from .concurrency import ConcurrencyLimiter
+from .memory import InterviewStore
+from .persona import ConfidentEvaluationResult, EvaluationResult, Interview
 
 
 class InformationEvaluator:
     """Evaluates whether collected information is sufficient for requirements."""
 
-    def __init__(self, llm: ChatOllama):
-        """Initialize the evaluator with an LLM."""
+    def __init__(
+        self,
+        llm: ChatOllama,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        store: Optional[InterviewStore] = None,
+        small_llm: Optional[ChatOllama] = None,
+        confidence_threshold: float = 0.7,
+        max_tokens: int = 256,
+    ):
+        """Initialize the evaluator with an LLM.
+
+        When ``small_llm`` is given it answers first, capped at ``max_tokens``
+        (see ``configurable_max_tokens``), and ``llm`` is only asked when the small answer does not parse or its
+        confidence is below ``confidence_threshold``.
+        """
         self.llm = llm.with_structured_output(EvaluationResult)
+        self.cascade = (
+            ModelCascade(
+                structured(
+                    configurable_max_tokens(small_llm), ConfidentEvaluationResult, max_tokens
+                ),
+                self.llm,
+                accept=lambda r: r.confidence >= confidence_threshold,
+            )
+            if small_llm is not None
+            else None
+        )
+        self.limiter = limiter or ConcurrencyLimiter()
+        # When set, only the interviews the store packs into its budget are sent
+        self.store = store
 
-    def run(self, user_request: str, interviews: list[Interview]) -> EvaluationResult:
-            """Evaluate if interviews provide sufficient information for requirements."""
-            # Define prompt
-            prompt = ChatPromptTemplate.from_messages(
-                [
-                    (
-                        "system",
-                        "You are an expert at evaluating the sufficiency of information for creating comprehensive requirements documents.",
-                    ),
-                    (
-                        "human",
-                        "Based on the following user request and interview results, please determine whether sufficient information has been gathered to create a comprehensive requirements document.\n\n"
-                        "User Request: {user_request}\n\n"
-                        "Interview Results:\n{interview_results}",
+    def _create_prompt(self) -> ChatPromptTemplate:
+        return ChatPromptTemplate.from_messages(
+            [
+                (
+                    "system",
+                    "You are an expert at evaluating the sufficiency of information for creating comprehensive requirements documents.",
+                ),
+                (
+                    "human",
+                    "Based on the following user request and interview results, please determine whether sufficient information has been gathered to create a comprehensive requirements document.\n\n"
+                    "User Request: {user_request}\n\n"
+                    "Interview Results:\n{interview_results}"
+                    + (
+                        "\n\nAlso give your confidence in this judgement as a number from 0 to 1."
+                        if self.cascade is not None
+                        else ""
                     ),
-                ]
-            )
-            # Create chain to evaluate information sufficiency
-            chain = prompt | self.llm
-            # Return evaluation result
-            return cast(
-                EvaluationResult,
-                chain.invoke(
-                    {
-                        "user_request": user_request,
-                        "interview_results": "\n".join(
-                            f"Persona: {i.persona.name} - {i.persona.background}\n"
-                            f"Question: {i.question}\nAnswer: {i.answer}\n"
-                            for i in interviews
-                        ),
-                    }
                 ),
+            ]
+        )
+
+    def _create_inputs(
+        self, user_request: str, interviews: list[Interview]
+    ) -> dict[str, str]:
+        return {
+            "user_request": user_request,
+            "interview_results": "\n".join(i.text for i in interviews),
+        }
+
+    def run(self, user_request: str, interviews: list[Interview]) -> EvaluationResult:
+        """Evaluate if interviews provide sufficient information for requirements."""
+        if self.store is not None:
+            interviews = self.store.select(user_request, interviews)
+        # Create chain to evaluate information sufficiency
+        chain = self._create_prompt() | (self.cascade or self.llm)
+        # Return evaluation result
+        return cast(
+            EvaluationResult,
+            chain.invoke(self._create_inputs(user_request, interviews)),
+        )
+
+    async def arun(
+        self, user_request: str, interviews: list[Interview]
+    ) -> EvaluationResult:
+        """Asynchronously evaluate if interviews provide sufficient information."""
+        if self.store is not None:
+            interviews = await self.store.aselect(user_request, interviews)
+        chain = self._create_prompt() | (self.cascade or self.llm)
+        async with self.limiter:
+            result = await chain.ainvoke(
+                self._create_inputs(user_request, interviews)
             )
+        return cast(EvaluationResult, result)
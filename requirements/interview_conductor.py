@@ -1,20 +1,37 @@
 """Interview conductor module for generating questions and answers from personas."""
 
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Union
+
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable, RunnablePassthrough
 from langchain_ollama import ChatOllama
 
+from .concurrency import ConcurrencyLimiter
 from .persona import Interview, InterviewResult, Persona
 
 
 class InterviewConductor:
     """Conducts interviews with personas to gather requirements."""
 
-    def __init__(self, llm: ChatOllama):
+    def __init__(
+        self,
+        llm: ChatOllama,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        pipelined: bool = False,
+    ):
         self.llm = llm
+        self.limiter = limiter or ConcurrencyLimiter()
+        # When pipelined, each persona's answer starts as soon as its question is ready
+        self.pipelined = pipelined
 
     def run(self, user_request: str, personas: list[Persona]) -> InterviewResult:
         """Run the interview process with given personas and user request."""
+        if self.pipelined:
+            return self._run_pipelined(user_request=user_request, personas=personas)
         # Generate questions
         questions = self._generate_questions(
             user_request=user_request, personas=personas
@@ -28,9 +45,132 @@ class InterviewConductor:
         # Return interview results
         return InterviewResult(interviews=interviews)
 
-    def _generate_questions(
+    async def arun(self, user_request: str, personas: list[Persona]) -> InterviewResult:
+        """Asynchronously run the interview process with given personas."""
+        if self.pipelined:
+            interviews = await asyncio.gather(
+                *(self._ainterview(user_request, persona) for persona in personas)
+            )
+            return InterviewResult(interviews=list(interviews))
+        questions = await self._agenerate_questions(
+            user_request=user_request, personas=personas
+        )
+        answers = await self._agenerate_answers(personas=personas, questions=questions)
+        interviews = self._create_interviews(
+            personas=personas, questions=questions, answers=answers
+        )
+        return InterviewResult(interviews=interviews)
+
+    def stream(self, user_request: str, personas: Iterable[Persona]) -> Iterator[Interview]:
+        """Yield each persona's interview as soon as its question and answer finish.
+
+        ``personas`` may be a lazy stream (e.g. ``PersonaGenerator.stream``): each
+        interview is handed to a thread pool as soon as its persona arrives, so it
+        runs while later personas are still being generated.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.limiter.max_concurrency)
+        pending: set[Future] = set()
+        try:
+            for persona in personas:
+                # Carry priority, tenant and deadline tags into the worker thread
+                pending.add(
+                    pool.submit(copy_context().run, self._interview, user_request, persona)
+                )
+                for future in [f for f in pending if f.done()]:
+                    pending.remove(future)
+                    yield future.result()
+            for future in as_completed(pending):
+                yield future.result()
+        finally:
+            # Drop interviews not yet started if the consumer goes away early or one fails
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def astream(
+        self,
+        user_request: str,
+        personas: Union[Iterable[Persona], AsyncIterable[Persona]],
+    ) -> AsyncIterator[Interview]:
+        """Yield each persona's interview as soon as its question and answer finish.
+
+        ``personas`` may be an async stream (e.g. ``PersonaGenerator.astream``), in
+        which case each interview starts as soon as its persona arrives.
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        tasks: list[asyncio.Task] = []
+        feed_done = object()
+
+        async def interview(persona: Persona) -> None:
+            try:
+                results.put_nowait(await self._ainterview(user_request, persona))
+            except Exception as e:
+                results.put_nowait(e)
+
+        async def feed() -> None:
+            try:
+                if isinstance(personas, AsyncIterable):
+                    async for persona in personas:
+                        tasks.append(asyncio.create_task(interview(persona)))
+                else:
+                    for persona in personas:
+                        tasks.append(asyncio.create_task(interview(persona)))
+            except Exception as e:
+                results.put_nowait(e)
+            results.put_nowait(feed_done)
+
+        feeder = asyncio.create_task(feed())
+        finished = 0
+        is_feeding = True
+        try:
+            while is_feeding or finished < len(tasks):
+                item = await results.get()
+                if item is feed_done:
+                    is_feeding = False
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                finished += 1
+                yield item
+        finally:
+            # Stop the remaining chains if the consumer goes away early or one fails
+            feeder.cancel()
+            for task in tasks:
+                task.cancel()
+
+    def _interview(self, user_request: str, persona: Persona) -> Interview:
+        [question_query] = self._create_question_queries(user_request, [persona])
+        question = self._create_question_chain().invoke(question_query)
+        [answer_query] = self._create_answer_queries([persona], [question])
+        answer = self._create_answer_chain().invoke(answer_query)
+        return Interview(persona=persona, question=question, answer=answer)
+
+    async def _ainterview(self, user_request: str, persona: Persona) -> Interview:
+        [question_query] = self._create_question_queries(user_request, [persona])
+        async with self.limiter:
+            question = await self._create_question_chain().ainvoke(question_query)
+        [answer_query] = self._create_answer_queries([persona], [question])
+        async with self.limiter:
+            answer = await self._create_answer_chain().ainvoke(answer_query)
+        return Interview(persona=persona, question=question, answer=answer)
+
+    def _run_pipelined(
         self, user_request: str, personas: list[Persona]
-    ) -> list[str]:
+    ) -> InterviewResult:
+        # One question -> answer chain per persona, so batch has no barrier between stages
+        interview_chain = RunnablePassthrough.assign(
+            question=self._create_question_chain()
+        ) | RunnablePassthrough.assign(answer=self._create_answer_chain())
+        results = interview_chain.batch(
+            self._create_question_queries(user_request, personas)
+        )
+        return InterviewResult(
+            interviews=self._create_interviews(
+                personas=personas,
+                questions=[result["question"] for result in results],
+                answers=[result["answer"] for result in results],
+            )
+        )
+
+    def _create_question_chain(self) -> Runnable:
         # Define prompt for question generation
         question_prompt = ChatPromptTemplate.from_messages(
             [
@@ -51,23 +191,9 @@ class InterviewConductor:
             ]
         )
         # Create chain for question generation
-        question_chain = question_prompt | self.llm | StrOutputParser()
+        return question_prompt | self.llm | StrOutputParser()
 
-        # Create question queries for each persona
-        question_queries = [
-            {
-                "user_request": user_request,
-                "persona_name": persona.name,
-                "persona_background": persona.background,
-            }
-            for persona in personas
-        ]
-        # Generate questions in batch processing
-        return question_chain.batch(question_queries)
-
-    def _generate_answers(
-        self, personas: list[Persona], questions: list[str]
-    ) -> list[str]:
+    def _create_answer_chain(self) -> Runnable:
         # Define prompt for answer generation
         answer_prompt = ChatPromptTemplate.from_messages(
             [
@@ -80,10 +206,26 @@ class InterviewConductor:
             ]
         )
         # Create chain for answer generation
-        answer_chain = answer_prompt | self.llm | StrOutputParser()
+        return answer_prompt | self.llm | StrOutputParser()
 
+    def _create_question_queries(
+        self, user_request: str, personas: list[Persona]
+    ) -> list[dict[str, str]]:
+        # Create question queries for each persona
+        return [
+            {
+                "user_request": user_request,
+                "persona_name": persona.name,
+                "persona_background": persona.background,
+            }
+            for persona in personas
+        ]
+
+    def _create_answer_queries(
+        self, personas: list[Persona], questions: list[str]
+    ) -> list[dict[str, str]]:
         # Create answer queries for each persona
-        answer_queries = [
+        return [
             {
                 "persona_name": persona.name,
                 "persona_background": persona.background,
@@ -91,8 +233,46 @@ class InterviewConductor:
             }
             for persona, question in zip(personas, questions)
         ]
+
+    def _generate_questions(
+        self, user_request: str, personas: list[Persona]
+    ) -> list[str]:
+        question_chain = self._create_question_chain()
+        # Generate questions in batch processing
+        return question_chain.batch(
+            self._create_question_queries(user_request, personas)
+        )
+
+    def _generate_answers(
+        self, personas: list[Persona], questions: list[str]
+    ) -> list[str]:
+        answer_chain = self._create_answer_chain()
         # Generate answers in batch processing
-        return answer_chain.batch(answer_queries)
+        return answer_chain.batch(self._create_answer_queries(personas, questions))
+
+    async def _agenerate_questions(
+        self, user_request: str, personas: list[Persona]
+    ) -> list[str]:
+        question_chain = self._create_question_chain()
+        return await self._abatch(
+            question_chain, self._create_question_queries(user_request, personas)
+        )
+
+    async def _agenerate_answers(
+        self, personas: list[Persona], questions: list[str]
+    ) -> list[str]:
+        answer_chain = self._create_answer_chain()
+        return await self._abatch(
+            answer_chain, self._create_answer_queries(personas, questions)
+        )
+
+    async def _abatch(self, chain: Runnable, queries: list[dict[str, str]]) -> list[str]:
+        # Each call takes a slot from the shared limiter instead of a per-batch limit
+        async def invoke(query: dict[str, str]) -> str:
+            async with self.limiter:
+                return await chain.ainvoke(query)
+
+        return list(await asyncio.gather(*(invoke(query) for query in queries)))
 
     def _create_interviews(
         self, personas: list[Persona], questions: list[str], answers: list[str]
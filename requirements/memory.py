@@ -0,0 +1,154 @@
+"""Interview store that selects relevant interviews under a token budget."""
+
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .concurrency import ConcurrencyLimiter
+from .persona import Interview
+from .tokens import estimate_tokens
+
+
+class EmbeddingCache:
+    """Normalized embedding vectors cached by text content."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_cached: int = 10_000,
+        limiter: Optional[ConcurrencyLimiter] = None,
+    ):
+        """Initialize the cache with a local embedding model."""
+        self.embeddings = embeddings
+        self.max_cached = max_cached
+        self.limiter = limiter or ConcurrencyLimiter()
+        self._vectors: OrderedDict[str, np.ndarray] = OrderedDict()
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def _normalize(self, vector: list[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        return array / (np.linalg.norm(array) or 1.0)
+
+    def _missing(self, texts: list[str]) -> list[str]:
+        return list(dict.fromkeys(t for t in texts if self._key(t) not in self._vectors))
+
+    def _collect(self, texts: list[str], missing: list[str], vectors: list) -> np.ndarray:
+        found = {self._key(text): self._normalize(v) for text, v in zip(missing, vectors)}
+        rows = []
+        for text in texts:
+            key = self._key(text)
+            rows.append(found[key] if key in found else self._vectors[key])
+        self._vectors.update(found)
+        while len(self._vectors) > self.max_cached:
+            self._vectors.popitem(last=False)
+        return np.stack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        """Return one normalized row per text, embedding only unseen texts."""
+        missing = self._missing(texts)
+        vectors = self.embeddings.embed_documents(missing) if missing else []
+        return self._collect(texts, missing, vectors)
+
+    async def aembed_documents(self, texts: list[str]) -> np.ndarray:
+        """Asynchronously return one normalized row per text."""
+        missing = self._missing(texts)
+        vectors: list = []
+        if missing:
+            async with self.limiter:
+                vectors = await self.embeddings.aembed_documents(missing)
+        return self._collect(texts, missing, vectors)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Return the normalized query vector."""
+        return self._normalize(self.embeddings.embed_query(text))
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        """Asynchronously return the normalized query vector."""
+        async with self.limiter:
+            return self._normalize(await self.embeddings.aembed_query(text))
+
+
+class InterviewStore:
+    """Indexes interviews by embedding and packs the best ones into a prompt budget.
+
+    Vectors are cached by interview content, so each interview is embedded once
+    no matter how many loop iterations or sessions see it. Selection uses
+    maximal marginal relevance: each pick balances relevance to the query
+    against similarity to interviews already picked, and near-duplicates are
+    skipped entirely.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        token_budget: int = 2000,
+        diversity: float = 0.3,
+        duplicate_threshold: float = 0.95,
+        max_cached: int = 10_000,
+        limiter: Optional[ConcurrencyLimiter] = None,
+    ):
+        """Initialize the store with a local embedding model and a token budget."""
+        self.cache = EmbeddingCache(embeddings, max_cached=max_cached, limiter=limiter)
+        self.token_budget = token_budget
+        self.diversity = diversity
+        self.duplicate_threshold = duplicate_threshold
+
+    def select(
+        self, query: str, interviews: list[Interview], token_budget: Optional[int] = None
+    ) -> list[Interview]:
+        """Return the most relevant, non-redundant interviews that fit the budget."""
+        if not interviews:
+            return []
+        texts = [interview.text for interview in interviews]
+        matrix = self.cache.embed_documents(texts)
+        query_vector = self.cache.embed_query(query)
+        return self._pack(query_vector, matrix, interviews, texts, token_budget)
+
+    async def aselect(
+        self, query: str, interviews: list[Interview], token_budget: Optional[int] = None
+    ) -> list[Interview]:
+        """Asynchronously return the interviews that fit the budget."""
+        if not interviews:
+            return []
+        texts = [interview.text for interview in interviews]
+        matrix = await self.cache.aembed_documents(texts)
+        query_vector = await self.cache.aembed_query(query)
+        return self._pack(query_vector, matrix, interviews, texts, token_budget)
+
+    def _pack(
+        self,
+        query: np.ndarray,
+        matrix: np.ndarray,
+        interviews: list[Interview],
+        texts: list[str],
+        token_budget: Optional[int],
+    ) -> list[Interview]:
+        budget = self.token_budget if token_budget is None else token_budget
+        relevance = matrix @ query
+        similarity = matrix @ matrix.T
+        costs = np.array([estimate_tokens(text) for text in texts])
+
+        selected: list[int] = []
+        # Highest similarity of each candidate to anything already selected
+        redundancy = np.full(len(texts), -1.0, dtype=np.float32)
+        available = np.ones(len(texts), dtype=bool)
+        remaining = budget
+        while True:
+            available &= (costs <= remaining) & (redundancy < self.duplicate_threshold)
+            if not available.any():
+                break
+            scores = (1 - self.diversity) * relevance - self.diversity * np.maximum(
+                redundancy, 0.0
+            )
+            best = int(np.argmax(np.where(available, scores, -np.inf)))
+            selected.append(best)
+            available[best] = False
+            remaining -= int(costs[best])
+            redundancy = np.maximum(redundancy, similarity[best])
+        # Keep the original order so the prompt reads chronologically
+        return [interviews[index] for index in sorted(selected)]
@@ -23,6 +23,13 @@ class Interview(BaseModel):
     question: str = Field(..., description="Question to ask the person")
     answer: str = Field(..., description="Answer from the person")
 
+    @property
+    def text(self) -> str:
+        return (
+            f"Persona: {self.persona.name} - {self.persona.background}\n"
+            f"Question: {self.question}\nAnswer: {self.answer}\n"
+        )
+
 
 class InterviewResult(BaseModel):
     """Collection of interview results."""
@@ -35,3 +42,9 @@ class EvaluationResult(BaseModel):
 
     reason: str = Field(..., description="Reason for the evaluation")
     is_sufficient: bool = Field(..., description="Whether the evaluation is sufficient")
+
+
+class ConfidentEvaluationResult(EvaluationResult):
+    """Evaluation result with the model's confidence, used to decide on escalation."""
+
+    confidence: float = Field(..., description="Confidence in the evaluation from 0 to 1")
@@ -0,0 +1,19 @@
+"""Metrics for speculative requirements document generation."""
+
+from pydantic import BaseModel, Field
+
+
+class SpeculationStats(BaseModel):
+    """Counters for drafts started alongside information evaluation."""
+
+    attempts: int = Field(default=0, description="Number of speculative drafts started")
+    hits: int = Field(default=0, description="Drafts committed as the final document")
+    misses: int = Field(default=0, description="Drafts discarded after a failed evaluation")
+    wasted_tokens: int = Field(
+        default=0, description="Estimated tokens generated by discarded drafts"
+    )
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of drafts that were committed."""
+        return self.hits / self.attempts if self.attempts else 0.0
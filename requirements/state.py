@@ -1,5 +1,6 @@
 """State management for interview process."""
 
+import operator
 from typing import Annotated
 
 from pydantic import BaseModel, Field
@@ -15,7 +16,14 @@ class InterviewState(BaseModel):
         list[Persona], Field(default_factory=list, description="List of personas")
     ]
     interviews: Annotated[
-        list[Interview], Field(default_factory=list, description="List of interviews")
+        list[Interview], Field(default_factory=list, description="Interviews of the last round")
+    ]
+    # Filled only when something reads the history (interview store, persona
+    # deduplication, adaptive persona count); the reducer must be the last annotation
+    all_interviews: Annotated[
+        list[Interview],
+        Field(default_factory=list, description="Interviews of every round so far"),
+        operator.add,
     ]
     requirements_doc: str = Field(default="", description="Generated document")
     iteration: int = Field(default=0, description="Iteration number")
@@ -23,3 +31,9 @@ class InterviewState(BaseModel):
         default=False, description="Whether the information is sufficient"
     )
     evaluation_reason: str = Field(default="", description="Reason for evaluation")
+    persona_count: int = Field(
+        default=0, description="Personas to generate next round (0 uses the default)"
+    )
+    information_gain: float = Field(
+        default=1.0, description="Mean novelty of the last round's answers"
+    )
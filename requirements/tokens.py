@@ -0,0 +1,6 @@
+"""Token estimation helpers."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of text (about 4 characters per token)."""
+    return (len(text) + 3) // 4
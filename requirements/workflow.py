@@ -1,68 +1,516 @@
-from typing import Any, Optional
+import asyncio
+import uuid
+from typing import Any, AsyncIterator, Iterator, Optional
 
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain_ollama import ChatOllama
 from langgraph.graph import END, StateGraph
 
+from llm.client import DEFAULT_SMALL_MODEL, get_chat_model, warm_up
+from llm.hedging import with_deadline
+from llm.instrumentation import Instrumentation, get_instrumentation
+from llm.scheduler import Priority, request_context
+from requirements.adaptive import AdaptivePersonaCount
+from requirements.checkpoint import SqliteCheckpointer
+from requirements.concurrency import ConcurrencyLimiter
+from requirements.dedup import PersonaDeduplicator
 from requirements.document_generator import RequirementsDocumentGenerator
 from requirements.generator import PersonaGenerator
 from requirements.information_evaluator import InformationEvaluator
 from requirements.interview_conductor import InterviewConductor
+from requirements.memory import InterviewStore
+from requirements.persona import Persona
+from requirements.speculation import SpeculationStats
 from requirements.state import InterviewState
+from requirements.tokens import estimate_tokens
+
+MAX_ITERATIONS = 5
 
 
 class DocumentationAgent:
-    def __init__(self, llm: ChatOllama, k: Optional[int] = None):
-        self.persona_generator = PersonaGenerator(llm=llm, k=k)
-        self.interview_conductor = InterviewConductor(llm=llm)
-        self.information_evaluator = InformationEvaluator(llm=llm)
-        self.requirements_generator = RequirementsDocumentGenerator(llm=llm)
+    def __init__(
+        self,
+        llm: ChatOllama,
+        k: Optional[int] = None,
+        max_concurrency: int = 4,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        pipelined_interviews: bool = True,
+        stream_personas: bool = False,
+        checkpoint_path: Optional[str] = None,
+        parallel_sections: bool = False,
+        speculative: bool = False,
+        embeddings: Optional[Embeddings] = None,
+        context_token_budget: int = 2000,
+        persona_deduplicator: Optional[PersonaDeduplicator] = None,
+        adaptive_personas: Optional[AdaptivePersonaCount] = None,
+        node_deadlines: Optional[dict[str, float]] = None,
+        small_llm: Optional[ChatOllama] = None,
+        instrumentation: Optional[Instrumentation] = None,
+    ):
+        # 全コンポーネントで1つの上限を共有する（複数エージェント間で共有する場合は limiter を渡す）
+        self.limiter = limiter or ConcurrencyLimiter(max_concurrency)
+        self.persona_generator = PersonaGenerator(llm=llm, k=k, limiter=self.limiter)
+        self.interview_conductor = InterviewConductor(
+            llm=llm, limiter=self.limiter, pipelined=pipelined_interviews
+        )
+        # 埋め込みモデルが渡された場合、評価・生成には予算内で関連度の高いインタビューだけを渡す
+        self.interview_store = (
+            InterviewStore(
+                embeddings, token_budget=context_token_budget, limiter=self.limiter
+            )
+            if embeddings is not None
+            else None
+        )
+        # 小さいモデルが渡された場合、情報の十分性はまずそちらで判定し、確信度が低いときだけ llm に回す
+        self.information_evaluator = InformationEvaluator(
+            llm=llm, limiter=self.limiter, store=self.interview_store, small_llm=small_llm
+        )
+        self.requirements_generator = RequirementsDocumentGenerator(
+            llm=llm,
+            limiter=self.limiter,
+            parallel_sections=parallel_sections,
+            store=self.interview_store,
+        )
+        # ペルソナをストリーミング生成し、生成済みのものから順にインタビューを始める
+        self.stream_personas = stream_personas
+        # 指定時のみ SQLite にチェックポイントを保存し、thread_id 単位で途中から再開できるようにする
+        self.checkpointer = (
+            SqliteCheckpointer(checkpoint_path) if checkpoint_path else None
+        )
+        # 評価と並行して要件定義書の下書きを生成する（非同期実行時のみ）
+        self.speculative = speculative
+        self.speculation_stats = SpeculationStats()
+        # 過去のイテレーションとほぼ同じペルソナをインタビュー前に除外する
+        self.persona_deduplicator = persona_deduplicator
+        # 回答の新規性に応じて次のラウンドのペルソナ数を増減し、頭打ちなら早期終了する
+        self.adaptive_personas = adaptive_personas
+        # 過去ラウンドのインタビューを参照するものがあるときだけ all_interviews に蓄積する
+        self._keeps_history = any(
+            component is not None
+            for component in (self.interview_store, persona_deduplicator, adaptive_personas)
+        )
+        # ノード名 -> 秒。期限を過ぎたLLM呼び出しは DeadlineExceeded で打ち切る
+        self.node_deadlines = node_deadlines or {}
+        # ノードとLLM呼び出しごとの所要時間・キュー待ち・TTFT・トークン数を集計する
+        self.instrumentation = instrumentation or get_instrumentation()
         self.graph = self._create_graph()
 
+    def _node(self, name: str, func: Any, afunc: Any) -> RunnableLambda:
+        # ノードごとの期限内に、そのノードの全LLM呼び出しを終わらせる
+        seconds = self.node_deadlines.get(name)
+        if seconds is None:
+            return RunnableLambda(func, afunc=afunc)
+        return RunnableLambda(
+            with_deadline(seconds)(func), afunc=with_deadline(seconds)(afunc)
+        )
+
     def _create_graph(self) -> StateGraph:
         workflow = StateGraph(InterviewState)
-        workflow.add_node("generate_personas", self._generate_personas)
-        workflow.add_node("conduct_interviews", self._conduct_interviews)
-        workflow.add_node("evaluate_information", self._evaluate_information)
-        workflow.add_node("generate_requirements", self._generate_requirements)
+        # 同期・非同期の両方の実装を持たせ、invoke と ainvoke のどちらでも動かせるようにする
+        if self.stream_personas:
+            # ペルソナ生成とインタビューを1ノードで重ねて実行する
+            workflow.add_node(
+                "generate_personas",
+                self._node(
+                    "generate_personas",
+                    self._generate_and_interview,
+                    self._agenerate_and_interview,
+                ),
+            )
+        else:
+            workflow.add_node(
+                "generate_personas",
+                self._node(
+                    "generate_personas",
+                    self._generate_personas,
+                    self._agenerate_personas,
+                ),
+            )
+            workflow.add_node(
+                "conduct_interviews",
+                self._node(
+                    "conduct_interviews",
+                    self._conduct_interviews,
+                    self._aconduct_interviews,
+                ),
+            )
+        workflow.add_node(
+            "evaluate_information",
+            self._node(
+                "evaluate_information",
+                self._evaluate_information,
+                self._aevaluate_information,
+            ),
+        )
+        workflow.add_node(
+            "generate_requirements",
+            self._node(
+                "generate_requirements",
+                self._generate_requirements,
+                self._agenerate_requirements,
+            ),
+        )
         workflow.set_entry_point("generate_personas")
-        workflow.add_edge("generate_personas", "conduct_interviews")
-        workflow.add_edge("conduct_interviews", "evaluate_information")
+        if self.stream_personas:
+            workflow.add_edge("generate_personas", "evaluate_information")
+        else:
+            workflow.add_edge("generate_personas", "conduct_interviews")
+            workflow.add_edge("conduct_interviews", "evaluate_information")
         workflow.add_conditional_edges(
             "evaluate_information",
-            lambda s: not s.is_information_sufficient and s.iteration < 5,
+            self._needs_more_information,
             {True: "generate_personas", False: "generate_requirements"},
         )
         workflow.add_edge("generate_requirements", END)
-        return workflow.compile()
+        return workflow.compile(checkpointer=self.checkpointer)
+
+    def _needs_more_information(self, state: InterviewState) -> bool:
+        if self.adaptive_personas is not None and self.adaptive_personas.should_stop(
+            state.information_gain
+        ):
+            return False
+        return not state.is_information_sufficient and state.iteration < MAX_ITERATIONS
+
+    def _persona_count(self, state: InterviewState) -> int:
+        return state.persona_count or self.persona_generator.k
+
+    def _gain_update(self, state: InterviewState, gain: float) -> dict[str, Any]:
+        return {
+            "information_gain": gain,
+            "persona_count": self.adaptive_personas.next_k(
+                self._persona_count(state), gain
+            ),
+        }
+
+    def _measure_gain(
+        self, state: InterviewState, interviews: list
+    ) -> dict[str, Any]:
+        if self.adaptive_personas is None:
+            return {}
+        gain = self.adaptive_personas.measure(interviews, state.all_interviews)
+        return self._gain_update(state, gain)
+
+    async def _ameasure_gain(
+        self, state: InterviewState, interviews: list
+    ) -> dict[str, Any]:
+        if self.adaptive_personas is None:
+            return {}
+        gain = await self.adaptive_personas.ameasure(interviews, state.all_interviews)
+        return self._gain_update(state, gain)
 
     def _generate_personas(self, state: InterviewState) -> dict[str, Any]:
-        new_personas = self.persona_generator.run(state.user_request)
-        return {"personas": new_personas.personas, "iteration": state.iteration + 1}
+        new_personas = self.persona_generator.run(
+            state.user_request, k=self._persona_count(state)
+        ).personas
+        if self.persona_deduplicator is not None:
+            new_personas = self._deduplicate(state, new_personas)
+        return {"personas": new_personas, "iteration": state.iteration + 1}
+
+    async def _agenerate_personas(self, state: InterviewState) -> dict[str, Any]:
+        new_personas = (
+            await self.persona_generator.arun(
+                state.user_request, k=self._persona_count(state)
+            )
+        ).personas
+        if self.persona_deduplicator is not None:
+            new_personas = await self._adeduplicate(state, new_personas)
+        return {"personas": new_personas, "iteration": state.iteration + 1}
+
+    def _interviewed_personas(self, state: InterviewState) -> list[Persona]:
+        return [interview.persona for interview in state.all_interviews]
+
+    def _deduplicate(
+        self, state: InterviewState, personas: list[Persona]
+    ) -> list[Persona]:
+        dedup = self.persona_deduplicator
+        existing = self._interviewed_personas(state)
+        accepted = dedup.filter(personas, existing)
+        # 除外した分だけを、既存ペルソナを避けるよう指示して作り直す
+        for _ in range(dedup.max_regenerations):
+            missing = len(personas) - len(accepted)
+            if missing <= 0:
+                break
+            dedup.stats.regenerations += 1
+            retry = self.persona_generator.run(
+                state.user_request, existing + accepted, k=missing
+            ).personas
+            accepted += dedup.filter(retry, existing + accepted)[:missing]
+        return accepted
+
+    async def _adeduplicate(
+        self, state: InterviewState, personas: list[Persona]
+    ) -> list[Persona]:
+        dedup = self.persona_deduplicator
+        existing = self._interviewed_personas(state)
+        accepted = dedup.filter(personas, existing)
+        for _ in range(dedup.max_regenerations):
+            missing = len(personas) - len(accepted)
+            if missing <= 0:
+                break
+            dedup.stats.regenerations += 1
+            retry = (
+                await self.persona_generator.arun(
+                    state.user_request, existing + accepted, k=missing
+                )
+            ).personas
+            accepted += dedup.filter(retry, existing + accepted)[:missing]
+        return accepted
+
+    def _interviews_update(self, interviews: list) -> dict[str, Any]:
+        update: dict[str, Any] = {"interviews": interviews}
+        if self._keeps_history:
+            update["all_interviews"] = interviews
+        return update
+
+    def _context_interviews(self, state: InterviewState) -> list:
+        # ストアがあれば全ラウンドから予算内で選ばせる。なければ直近のラウンドだけを渡し、
+        # プロンプト長をラウンドが進んでも一定に保つ
+        if self.interview_store is not None:
+            return state.all_interviews
+        return state.interviews
 
     def _conduct_interviews(self, state: InterviewState) -> dict[str, Any]:
         interviews = self.interview_conductor.run(
-            state.user_request, state.personas[-5:]
+            state.user_request, state.personas
+        )
+        return {
+            **self._interviews_update(interviews.interviews),
+            **self._measure_gain(state, interviews.interviews),
+        }
+
+    async def _aconduct_interviews(self, state: InterviewState) -> dict[str, Any]:
+        interviews = await self.interview_conductor.arun(
+            state.user_request, state.personas
         )
-        return {"interviews": interviews.interviews}
+        return {
+            **self._interviews_update(interviews.interviews),
+            **(await self._ameasure_gain(state, interviews.interviews)),
+        }
+
+    def _generate_and_interview(self, state: InterviewState) -> dict[str, Any]:
+        personas: list = []
+        existing = self._interviewed_personas(state)
+
+        def persona_stream():
+            for persona in self.persona_generator.stream(
+                state.user_request, k=self._persona_count(state)
+            ):
+                # ストリーミング時は作り直さず、重複をその場で除外するだけにする
+                if self.persona_deduplicator is not None and not (
+                    self.persona_deduplicator.filter([persona], existing + personas)
+                ):
+                    continue
+                personas.append(persona)
+                yield persona
+
+        # 届いたペルソナから順にスレッドプールでインタビューを始める
+        interviews = list(
+            self.interview_conductor.stream(state.user_request, persona_stream())
+        )
+        return {
+            "personas": personas,
+            **self._interviews_update(interviews),
+            "iteration": state.iteration + 1,
+            **self._measure_gain(state, interviews),
+        }
+
+    async def _agenerate_and_interview(self, state: InterviewState) -> dict[str, Any]:
+        personas: list = []
+        existing = self._interviewed_personas(state)
+
+        async def persona_stream():
+            async for persona in self.persona_generator.astream(
+                state.user_request, k=self._persona_count(state)
+            ):
+                # ストリーミング時は作り直さず、重複をその場で除外するだけにする
+                if self.persona_deduplicator is not None and not (
+                    self.persona_deduplicator.filter([persona], existing + personas)
+                ):
+                    continue
+                personas.append(persona)
+                yield persona
+
+        interviews = [
+            interview
+            async for interview in self.interview_conductor.astream(
+                state.user_request, persona_stream()
+            )
+        ]
+        return {
+            "personas": personas,
+            **self._interviews_update(interviews),
+            "iteration": state.iteration + 1,
+            **(await self._ameasure_gain(state, interviews)),
+        }
 
     def _evaluate_information(self, state: InterviewState) -> dict[str, Any]:
         evaluation = self.information_evaluator.run(
-            state.user_request, state.interviews
+            state.user_request, self._context_interviews(state)
+        )
+        return {
+            "is_information_sufficient": evaluation.is_sufficient,
+            "evaluation_reason": evaluation.reason,
+        }
+
+    async def _aevaluate_information(self, state: InterviewState) -> dict[str, Any]:
+        if self.speculative:
+            return await self._aevaluate_speculatively(state)
+        evaluation = await self.information_evaluator.arun(
+            state.user_request, self._context_interviews(state)
         )
         return {
             "is_information_sufficient": evaluation.is_sufficient,
             "evaluation_reason": evaluation.reason,
         }
 
+    async def _aevaluate_speculatively(self, state: InterviewState) -> dict[str, Any]:
+        draft: list[str] = []
+        draft_task = asyncio.create_task(self._adraft_requirements(state, draft))
+        self.speculation_stats.attempts += 1
+        try:
+            evaluation = await self.information_evaluator.arun(
+                state.user_request, self._context_interviews(state)
+            )
+        except BaseException:
+            draft_task.cancel()
+            raise
+        update: dict[str, Any] = {
+            "is_information_sufficient": evaluation.is_sufficient,
+            "evaluation_reason": evaluation.reason,
+        }
+        if self._needs_more_information(state.model_copy(update=update)):
+            # 評価が不合格なら下書きを破棄し、バックエンドのスロットを解放する
+            draft_task.cancel()
+            await asyncio.gather(draft_task, return_exceptions=True)
+            self.speculation_stats.misses += 1
+            self.speculation_stats.wasted_tokens += estimate_tokens("".join(draft))
+            return update
+        try:
+            doc = await draft_task
+        except Exception:
+            # 下書きが失敗しても評価結果は活かし、generate_requirements で改めて生成する
+            self.speculation_stats.misses += 1
+            self.speculation_stats.wasted_tokens += estimate_tokens("".join(draft))
+            return update
+        self.speculation_stats.hits += 1
+        update["requirements_doc"] = doc
+        return update
+
+    async def _adraft_requirements(self, state: InterviewState, draft: list[str]) -> str:
+        # 途中までの出力を draft に貯め、キャンセル時の無駄トークン数を計測できるようにする
+        if self.requirements_generator.parallel_sections:
+            stream = self.requirements_generator.astream_sections(
+                state.user_request, self._context_interviews(state)
+            )
+        else:
+            stream = self.requirements_generator.astream(
+                state.user_request, self._context_interviews(state)
+            )
+        async for chunk in stream:
+            draft.append(chunk)
+        return "".join(draft)
+
     def _generate_requirements(self, state: InterviewState) -> dict[str, Any]:
-        doc = self.requirements_generator.run(state.user_request, state.interviews)
+        if state.requirements_doc:
+            # 投機実行で確定済みの下書きをそのまま使う
+            return {}
+        doc = self.requirements_generator.run(
+            state.user_request, self._context_interviews(state)
+        )
+        return {"requirements_doc": doc}
+
+    async def _agenerate_requirements(self, state: InterviewState) -> dict[str, Any]:
+        if state.requirements_doc:
+            return {}
+        doc = await self.requirements_generator.arun(
+            state.user_request, self._context_interviews(state)
+        )
         return {"requirements_doc": doc}
 
-    def run(self, user_request: str) -> str:
-        initial_state = InterviewState(user_request=user_request)
-        final_state = self.graph.invoke(initial_state)
+    def _create_config(self, thread_id: Optional[str]) -> RunnableConfig:
+        config: RunnableConfig = {"callbacks": [self.instrumentation.handler]}
+        if self.checkpointer is None:
+            return config
+        return {**config, "configurable": {"thread_id": thread_id or str(uuid.uuid4())}}
+
+    def _resume_or_start(
+        self, user_request: str, config: RunnableConfig, snapshot: Any
+    ) -> Optional[InterviewState]:
+        if not snapshot.values:
+            return InterviewState(user_request=user_request)
+        thread_id = config["configurable"]["thread_id"]
+        saved_request = snapshot.values.get("user_request")
+        if saved_request != user_request:
+            raise ValueError(
+                f"thread {thread_id!r} belongs to a different request: {saved_request!r}"
+            )
+        if not snapshot.next:
+            raise ValueError(f"thread {thread_id!r} has already finished; use a new thread_id")
+        # 中断したスレッドには None を渡して最後に完了したノードから再開する
+        return None
+
+    def _graph_input(
+        self, user_request: str, config: RunnableConfig
+    ) -> Optional[InterviewState]:
+        if self.checkpointer is None:
+            return InterviewState(user_request=user_request)
+        return self._resume_or_start(user_request, config, self.graph.get_state(config))
+
+    async def _agraph_input(
+        self, user_request: str, config: RunnableConfig
+    ) -> Optional[InterviewState]:
+        if self.checkpointer is None:
+            return InterviewState(user_request=user_request)
+        return self._resume_or_start(
+            user_request, config, await self.graph.aget_state(config)
+        )
+
+    def _request_context(self, thread_id: Optional[str]):
+        # 要件定義はバッチ扱いにし、セッションごとに公平にスロットを割り当てる
+        return request_context(
+            priority=Priority.BATCH, tenant=thread_id or f"requirements-{uuid.uuid4()}"
+        )
+
+    def run(self, user_request: str, thread_id: Optional[str] = None) -> str:
+        config = self._create_config(thread_id)
+        with self._request_context(thread_id):
+            final_state = self.graph.invoke(
+                self._graph_input(user_request, config), config
+            )
         return final_state["requirements_doc"]
 
+    async def arun(self, user_request: str, thread_id: Optional[str] = None) -> str:
+        config = self._create_config(thread_id)
+        with self._request_context(thread_id):
+            final_state = await self.graph.ainvoke(
+                await self._agraph_input(user_request, config), config
+            )
+        return final_state["requirements_doc"]
+
+    def stream(
+        self, user_request: str, thread_id: Optional[str] = None
+    ) -> Iterator[dict[str, Any]]:
+        # ノードごとの更新差分を完了順に返す
+        config = self._create_config(thread_id)
+        with self._request_context(thread_id):
+            yield from self.graph.stream(
+                self._graph_input(user_request, config), config, stream_mode="updates"
+            )
+
+    async def astream(
+        self, user_request: str, thread_id: Optional[str] = None
+    ) -> AsyncIterator[dict[str, Any]]:
+        # ノードごとの更新差分を完了順に返す
+        config = self._create_config(thread_id)
+        with self._request_context(thread_id):
+            async for update in self.graph.astream(
+                await self._agraph_input(user_request, config),
+                config,
+                stream_mode="updates",
+            ):
+                yield update
+
     def stream_final_output(self, user_request: str):
         # 途中ステップは同期で進める
         state = InterviewState(user_request=user_request)
@@ -78,10 +526,33 @@ class DocumentationAgent:
             yield chunk
             print(chunk)
 
+    async def astream_final_output(self, user_request: str) -> AsyncIterator[str]:
+        # stream_final_output の非同期版
+        personas = (await self.persona_generator.arun(user_request)).personas
+        interviews = (
+            await self.interview_conductor.arun(user_request, personas)
+        ).interviews
+        async for chunk in self.requirements_generator.astream(
+            user_request, interviews
+        ):
+            yield chunk
+
+
+async def _serve_sessions(agent: DocumentationAgent, requests: list[str]) -> list[str]:
+    # 1プロセス・1スレッドで複数セッションを同時に処理する
+    return list(await asyncio.gather(*(agent.arun(r) for r in requests)))
+
 
 if __name__ == "__main__":
-    llm = ChatOllama(model="llama3.1:latest", temperature=0.2)
-    agent = DocumentationAgent(llm=llm)
+    llm = get_chat_model(priority=Priority.BATCH)
+    report = warm_up()
+    print(
+        f"Warm-up: cold={report.cold_first_token_ms:.0f}ms "
+        f"warm={report.warm_first_token_ms:.0f}ms"
+    )
+    agent = DocumentationAgent(
+        llm=llm, small_llm=get_chat_model(DEFAULT_SMALL_MODEL, priority=Priority.BATCH)
+    )
 
     print("=== Simple Run ===")
     print(agent.run("DB that can directly receive open telemetry"))
@@ -91,3 +562,15 @@ if __name__ == "__main__":
         "DB that can directly receive open telemetry"
     ):
         print(chunk, end="", flush=True)
+
+    print("\n=== Concurrent Async Sessions ===")
+    for doc in asyncio.run(
+        _serve_sessions(
+            agent,
+            [
+                "DB that can directly receive open telemetry",
+                "Internal wiki with semantic search",
+            ],
+        )
+    ):
+        print(doc)
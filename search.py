@@ -3,8 +3,8 @@ from langchain_community.document_loaders import GitLoader
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
-from langchain_ollama import ChatOllama
-from langchain_ollama.embeddings import OllamaEmbeddings
+from llm.client import get_chat_model, get_embeddings, warm_up
+from llm.semantic_cache import SemanticCache, semantic_cache_path
 
 
 def file_filter(file_path: str) -> bool:
@@ -21,7 +21,7 @@ loader = GitLoader(
 documents = loader.load()
 print(len(documents))
 
-embeddings = OllamaEmbeddings(model="nomic-embed-text")
+embeddings = get_embeddings()
 db = Chroma.from_documents(documents, embeddings)
 
 prompt = ChatPromptTemplate.from_template(
@@ -34,7 +34,8 @@ prompt = ChatPromptTemplate.from_template(
 )
 
 retriever = db.as_retriever()
-model = ChatOllama(model="llama3.1:latest", temperature=0.2)
+model = get_chat_model()
+warm_up()
 chain = (
     {
         "question": RunnablePassthrough(),
@@ -45,5 +46,9 @@ chain = (
     | StrOutputParser()
 )
 
-output = chain.invoke("What is LangChain?")
+semantic_cache = SemanticCache(embeddings, path=semantic_cache_path("search"))
+
+output = semantic_cache.get_or_compute("What is LangChain?", chain.invoke)
 print(output)
+stats = semantic_cache.stats
+print(f"semantic cache: hits={stats.hits} misses={stats.misses} p50={stats.latency_ms():.1f}ms")
@@ -3,9 +3,9 @@ import pprint
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableParallel
-from langchain_ollama.chat_models import ChatOllama
+from llm.client import get_chat_model
 
-model = ChatOllama(model="llama3.1:latest", temperature=0.2)
+model = get_chat_model()
 output_parser = StrOutputParser()
 
 # White Hat - Facts and Information
@@ -106,5 +106,6 @@ parallel_chain = (
     | output_parser
 )
 
-output = parallel_chain.invoke({"input": "RAGの今後について"})
-pprint.pprint(output)
\ No newline at end of file
+if __name__ == "__main__":
+    output = parallel_chain.invoke({"input": "RAGの今後について"})
+    pprint.pprint(output)